@@ -0,0 +1,17 @@
+"""La app real sobre la base de datos SQLite de BENCH_BD, para servirla con gunicorn.
+
+    BENCH_BD=/tmp/bench.db gunicorn benchmarks.app_sqlite:app -c gunicorn.conf.py
+
+BENCH_REPLICAS (rutas separadas por comas, copias de BENCH_BD) añade réplicas de lectura.
+"""
+import os
+
+from data import database
+from benchmarks.sqlite_bd import ConexionSQLite, replica
+
+RUTA = os.environ["BENCH_BD"]
+database.pool.crear_conexion = lambda: ConexionSQLite(RUTA)
+for ruta_replica in filter(None, os.getenv("BENCH_REPLICAS", "").split(",")):
+    database.enrutador.replicas.append(replica(ruta_replica))
+
+from main import app  # noqa: E402  (después de sustituir la conexión)
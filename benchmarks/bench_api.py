@@ -0,0 +1,91 @@
+"""Coste de leer el catálogo como HTML, como JSON y con If-None-Match.
+
+Un cliente que hace polling pide la misma página una y otra vez: con el ETag
+de versión recibe 304 sin que se pida conexión a la base de datos. También
+compara el codificador json de la biblioteca estándar con orjson.
+
+    python -m benchmarks.bench_api [--juegos 10000] [--peticiones 500] [--limite 100]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.suite import percentil
+
+
+async def medir(cliente, url, peticiones, cabeceras=None):
+    tiempos, bytes_ = [], 0
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        respuesta = await cliente.get(url, headers=cabeceras)
+        tiempos.append(time.perf_counter() - inicio)
+        bytes_ = len(respuesta.content)
+    return respuesta.status_code, tiempos, bytes_
+
+
+async def ejecutar(app, peticiones, limite):
+    import httpx
+    from data.database import pool
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+            etag = (await cliente.get(f"/api/v1/videojuegos?limit={limite}")).headers["etag"]
+            casos = (
+                ("HTML /videojuegos", f"/videojuegos?limit={limite}", None),
+                ("JSON /api/v1/videojuegos", f"/api/v1/videojuegos?limit={limite}", None),
+                ("JSON fields=id,nombre", f"/api/v1/videojuegos?limit={limite}&fields=id,nombre", None),
+                ("JSON If-None-Match", f"/api/v1/videojuegos?limit={limite}", {"If-None-Match": etag}),
+            )
+            for nombre, url, cabeceras in casos:
+                await medir(cliente, url, 20, cabeceras)
+                prestamos = pool.prestamos
+                estado, tiempos, bytes_ = await medir(cliente, url, peticiones, cabeceras)
+                print(f"{nombre:<26} {estado}   p50 {percentil(tiempos, 0.5) * 1000:7.3f} ms   "
+                      f"p95 {percentil(tiempos, 0.95) * 1000:7.3f} ms   {bytes_:>7} bytes   "
+                      f"conexiones {pool.prestamos - prestamos}")
+
+
+def comparar_codificadores(juegos, repeticiones=2000):
+    from services.api import serializar, orjson
+
+    datos = {"videojuegos": [serializar(juego) for juego in juegos]}
+    codificadores = [("json", lambda: json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode())]
+    if orjson is not None:
+        codificadores.append(("orjson", lambda: orjson.dumps(datos)))
+    for nombre, codificar in codificadores:
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            codificar()
+        print(f"codificar {len(juegos)} juegos con {nombre:<6} "
+              f"{(time.perf_counter() - inicio) / repeticiones * 1e6:8.1f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--juegos", type=int, default=10000)
+    parser.add_argument("--peticiones", type=int, default=500)
+    parser.add_argument("--limite", type=int, default=100)
+    args = parser.parse_args()
+
+    from data import database
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "api.db")
+        juegos = sembrar(ruta, args.juegos)
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        import main as aplicacion
+
+        asyncio.run(ejecutar(aplicacion.app, args.peticiones, args.limite))
+        comparar_codificadores(juegos[:args.limite])
+        database.pool.cerrar()
+
+
+if __name__ == "__main__":
+    main()
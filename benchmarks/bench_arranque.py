@@ -0,0 +1,75 @@
+"""Tiempo de arranque en frío hasta la primera petición servida.
+
+Lanza un proceso uvicorn nuevo y mide cuánto tarda en responder, como tras
+reiniciar un contenedor o al escalar:
+
+    sqlite     la app sobre el catálogo SQLite: primera página del catálogo (200)
+    bd caída   la app con DB_HOST apuntando a un puerto cerrado: primer
+               archivo estático (200) y primera página del catálogo (503)
+
+    python -m benchmarks.bench_arranque [repeticiones]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import httpx
+
+from benchmarks.sqlite_bd import sembrar
+
+PUERTO = 8766
+
+
+def primera_respuesta(url, inicio, limite=60):
+    """Segundos desde `inicio` hasta la primera respuesta de url, y su código"""
+    while time.perf_counter() - inicio < limite:
+        try:
+            respuesta = httpx.get(url, timeout=limite)
+            return time.perf_counter() - inicio, respuesta.status_code
+        except httpx.TransportError:
+            time.sleep(0.01)
+    raise RuntimeError(f"{url} no ha respondido en {limite} s")
+
+
+def arrancar(modulo, entorno, rutas):
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", modulo, "--port", str(PUERTO), "--log-level", "warning"],
+        cwd=RAIZ, env=dict(os.environ, **entorno), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        return [primera_respuesta(f"http://127.0.0.1:{PUERTO}{ruta}", inicio) for ruta in rutas]
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "bench.db")
+        sembrar(ruta, 10000)
+        casos = [
+            ("sqlite", "benchmarks.app_sqlite:app", {"BENCH_BD": ruta}, ["/videojuegos"]),
+            ("bd caída", "main:app", {"DB_HOST": "127.0.0.1", "DB_PORT": "9", "ARRANQUE_ESPERA_BD_SEG": "1"},
+             ["/static/nav-xbox.PNG", "/videojuegos"]),
+        ]
+        for nombre, modulo, entorno, rutas in casos:
+            medidas = [arrancar(modulo, entorno, rutas) for _ in range(repeticiones)]
+            for i, ruta_http in enumerate(rutas):
+                tiempos = [medida[i][0] for medida in medidas]
+                codigos = sorted({medida[i][1] for medida in medidas})
+                print(f"{nombre:<10} {ruta_http:<24} {statistics.median(tiempos) * 1000:8.0f} ms "
+                      f"(mín {min(tiempos) * 1000:.0f}, máx {max(tiempos) * 1000:.0f})  HTTP {codigos}")
+
+
+if __name__ == "__main__":
+    main()
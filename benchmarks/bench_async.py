@@ -0,0 +1,83 @@
+"""Peticiones por segundo en /videojuegos con repositorio bloqueante vs. async.
+
+La base de datos SQLite de los benchmarks con latencia fija (cada consulta
+duerme LATENCIA segundos) y CONCURRENCIA peticiones simultáneas contra la app real.
+
+    python -m benchmarks.bench_async
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from data import database
+
+LATENCIA = 0.02
+CONCURRENCIA = 50
+PETICIONES = 400
+JUEGOS = 200
+
+
+class RepositorioBloqueante:
+    """Comportamiento anterior: el método síncrono se llama dentro del event loop"""
+
+    def __init__(self, repositorio):
+        self._repositorio = repositorio
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._repositorio, nombre)
+
+        async def llamada(*args, **kwargs):
+            return metodo(*args, **kwargs)
+
+        return llamada
+
+
+async def medir(app):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        semaforo = asyncio.Semaphore(CONCURRENCIA)
+
+        async def una():
+            async with semaforo:
+                respuesta = await cliente.get("/videojuegos")
+                assert respuesta.status_code == 200
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una() for _ in range(PETICIONES)))
+        return PETICIONES / (time.perf_counter() - inicio)
+
+
+def main():
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "async.db")
+        sembrar(ruta, JUEGOS)
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta, latencia=LATENCIA)
+        database.pool.tamaño = CONCURRENCIA
+
+        import main as aplicacion
+        from data.repositorio_async import RepositorioAsync
+        from data.videojuego_repository import VideojuegoRepository
+
+        # Sin caché de catálogo: se mide solo el coste de bloquear el event loop
+        aplicacion.videojuegos_repo = RepositorioBloqueante(VideojuegoRepository())
+        antes = asyncio.run(medir(aplicacion.app))
+
+        aplicacion.videojuegos_repo = RepositorioAsync(VideojuegoRepository())
+        despues = asyncio.run(medir(aplicacion.app))
+        database.pool.cerrar()
+
+    print(f"Latencia simulada por consulta: {LATENCIA * 1000:.0f} ms, concurrencia {CONCURRENCIA}")
+    print(f"Bloqueante: {antes:8.1f} req/s")
+    print(f"Async:      {despues:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Índice de búsqueda frente a un recorrido tipo LIKE '%term%' sobre 100k títulos.
+
+    python -m benchmarks.bench_busqueda [numero_de_titulos]
+"""
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from domain.model.videojuego import Videojuego
+from services.buscador import IndiceBusqueda, normalizar
+
+PALABRAS = [
+    "leyenda", "guerra", "mundo", "súper", "dragón", "caballeros", "galaxia", "pokémon",
+    "ciudad", "sombras", "espada", "corazón", "batalla", "misión", "reino", "fútbol",
+    "carrera", "isla", "último", "héroes", "zelda", "mario", "halo", "souls", "odisea",
+    "noche", "eterno", "cazador", "invierno", "fuego", "piratas", "estrella", "tiempo",
+]
+GENEROS = ["Acción", "Aventura", "RPG", "Shooter", "Deportes", "Carreras", "Estrategia", "Plataformas"]
+CONSULTAS = ["dra", "leyenda", "pokemon", "super mar", "ultimo heroe", "galax", "FUTBOL", "kari", "zelgor", "misión rei"]
+
+
+SILABAS = ["ka", "ri", "to", "mon", "dra", "zel", "ner", "vo", "lu", "tia", "gor", "sé", "án", "bel", "quin"]
+
+
+def catalogo_sintetico(n, semilla=2026):
+    aleatorio = random.Random(semilla)
+    # Además de palabras comunes, cada título lleva nombres propios inventados
+    inventadas = ["".join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))) for _ in range(20_000)]
+    juegos = []
+    for i in range(1, n + 1):
+        palabras = aleatorio.sample(PALABRAS, aleatorio.randint(1, 2)) + aleatorio.sample(inventadas, 2)
+        aleatorio.shuffle(palabras)
+        titulo = " ".join(palabras).title()
+        juegos.append(Videojuego(i, f"{titulo} {i}", round(aleatorio.uniform(5, 70), 2),
+                                 aleatorio.choice(GENEROS), round(aleatorio.uniform(1, 10), 1)))
+    return juegos
+
+
+def like(juegos, consulta):
+    """Lo que hacía `nombre LIKE '%term%'`: recorrer todos los títulos"""
+    termino = consulta.lower()
+    return sorted((j for j in juegos if termino in j.nombre.lower()), key=lambda j: j.nombre)
+
+
+def medir(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    juegos = catalogo_sintetico(n)
+
+    inicio = time.perf_counter()
+    indice = IndiceBusqueda(juegos)
+    construccion = time.perf_counter() - inicio
+    print(f"{n} títulos, índice construido en {construccion * 1000:.0f} ms")
+    print(f"{'consulta':<16}{'LIKE (ms)':>12}{'índice (ms)':>14}{'LIKE res.':>12}{'índice res.':>14}")
+
+    for consulta in CONSULTAS:
+        t_like, r_like = medir(lambda: like(juegos, consulta))
+        t_indice, r_indice = medir(lambda: indice.buscar(consulta))
+        print(f"{consulta:<16}{t_like * 1000:>12.2f}{t_indice * 1000:>14.2f}{len(r_like):>12}{len(r_indice):>14}")
+
+    t_genero, r_genero = medir(lambda: indice.buscar("dragon", "rpg"))
+    print(f"'dragon' + género RPG: {t_genero * 1000:.2f} ms, {len(r_genero)} resultados")
+    for prefijo in ("d", "dra", "leyenda ka", "zelg"):
+        t_sugerencias, r_sugerencias = medir(lambda: indice.sugerencias(prefijo, 8), repeticiones=50)
+        print(f"Sugerencias {prefijo!r}: {t_sugerencias * 1000:.3f} ms, {len(r_sugerencias)} títulos")
+    print(f"Normalización: {normalizar('Pokémon ÚLTIMO Héroe')!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Propagación de las escrituras de otro worker a través del bus de cambios.
+
+Un segundo repositorio con su propio bus hace de "otro worker" sobre la misma
+base de datos SQLite y edita juegos; se mide cuánto tarda la app en servir el
+precio nuevo (depende de CAMBIOS_INTERVALO_SEG) y cuántos fragmentos
+renderizados sobreviven a cada edición, que antes vaciaba la caché entera.
+
+Antes se comprueba que una lectura que empieza antes de una edición y acaba
+después no deja en la caché el listado anterior a la edición.
+
+    python -m benchmarks.bench_cambios [--ediciones 20] [--intervalo 0.2] [--paginas 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.suite import percentil
+
+
+def lectura_en_vuelo(repositorio, db):
+    """Carga el listado, invalida mientras la carga sigue en curso y comprueba que no se guarda"""
+    from data.cambios_catalogo import Cambio, ACTUALIZAR
+    from data.videojuego_repository import VideojuegoRepository
+
+    clave = ("todos", None, None, None)
+    repositorio.cache.invalidar()
+    cargada, seguir = threading.Event(), threading.Event()
+
+    def cargar():
+        juegos = VideojuegoRepository.get_all(repositorio, db)
+        cargada.set()
+        seguir.wait(5)
+        return juegos
+
+    hilo = threading.Thread(target=repositorio.cache.obtener, args=(clave, cargar))
+    hilo.start()
+    cargada.wait(5)
+    # La escritura de un admin llega mientras la lectura aún no ha guardado su resultado
+    repositorio.aplicar_cambio(Cambio(ACTUALIZAR, 1))
+    seguir.set()
+    hilo.join()
+    encontrado, _ = repositorio.cache.get(clave)
+    assert not encontrado, "una carga anterior a la invalidación quedó en caché"
+    print("lectura en vuelo durante una edición: no se guarda en caché (ok)")
+
+
+async def ejecutar(app, otro, ediciones, paginas):
+    import httpx
+    import main as aplicacion
+    from data.database import pool
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+            with pool.conexion() as db:
+                otro.bus.iniciar(db)
+                lectura_en_vuelo(otro, db)
+            # Llena la caché de fragmentos con las primeras páginas del catálogo
+            cursores, urls, after = [], [], ""
+            for _ in range(paginas):
+                respuesta = (await cliente.get(f"/api/v1/videojuegos?fields=id&after={after}")).json()
+                cursores.append([juego["id"] for juego in respuesta["videojuegos"]])
+                urls.append(f"/videojuegos?after={after}")
+                await cliente.get(urls[-1])
+                after = respuesta["siguiente"]
+
+            retrasos, supervivientes = [], []
+            for i in range(ediciones):
+                videojuego_id = random.choice(random.choice(cursores))
+                # En caché del worker: solo el bus puede hacer que vea el precio nuevo
+                await cliente.get(f"/api/v1/videojuegos/{videojuego_id}?fields=precio")
+                antes = aplicacion.fragmentos.metricas()["entradas"]
+                precio = round(random.uniform(1, 99), 2)
+                with pool.conexion() as db:
+                    juego = otro.get_por_id(db, videojuego_id)
+                    juego.precio = precio
+                    inicio = time.perf_counter()
+                    otro.actualizar_videojuego(db, juego)
+                while True:
+                    respuesta = await cliente.get(f"/api/v1/videojuegos/{videojuego_id}?fields=precio")
+                    if respuesta.json()["precio"] == precio:
+                        break
+                    await asyncio.sleep(0.005)
+                retrasos.append(time.perf_counter() - inicio)
+                supervivientes.append(aplicacion.fragmentos.metricas()["entradas"] / max(antes, 1))
+                # Vuelve a renderizar la página afectada para la siguiente edición
+                for url in urls:
+                    await cliente.get(url)
+
+            print(f"{ediciones} ediciones desde otro worker: visible en p50 {percentil(retrasos, 0.5) * 1000:.0f} ms, "
+                  f"p95 {percentil(retrasos, 0.95) * 1000:.0f} ms, máx {max(retrasos) * 1000:.0f} ms")
+            print(f"fragmentos que siguen en caché tras cada edición: {sum(supervivientes) / len(supervivientes):.0%} "
+                  f"(antes cada escritura vaciaba la caché entera y las de otro worker no se veían hasta el TTL)")
+            print(aplicacion.bus_cambios.metricas())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ediciones", type=int, default=20)
+    parser.add_argument("--intervalo", type=float, default=0.2, help="CAMBIOS_INTERVALO_SEG del worker")
+    parser.add_argument("--paginas", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["CAMBIOS_INTERVALO_SEG"] = str(args.intervalo)
+    from data import database
+    from data.cambios_catalogo import BusBD
+    from data.videojuego_repository_cache import VideojuegoRepositoryCache
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "cambios.db")
+        sembrar(ruta, 2000)
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        import main as aplicacion
+
+        otro = VideojuegoRepositoryCache(bus=BusBD(database.pool))
+        asyncio.run(ejecutar(aplicacion.app, otro, args.ediciones, args.paginas))
+        database.pool.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Bytes enviados y CPU por petición de las páginas HTML según la codificación.
+
+Renderiza las páginas reales (una página completa de juegos) sobre la base de
+datos SQLite de los benchmarks y compara identity, gzip y brotli (si está
+instalado), además de la revalidación con If-None-Match.
+
+    python -m benchmarks.bench_compresion [--peticiones 200]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from data import database
+
+PAGINAS = ("/videojuegos", "/playstation", "/buscar?nombre=mundo")
+JUEGOS = 500
+
+
+async def medir(app, ruta, cabeceras, peticiones):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        # Primera petición fuera de la medida: llena la caché y compila la plantilla
+        await cliente.get(ruta, headers=cabeceras)
+        bytes_enviados = 0
+        cpu = time.process_time()
+        for _ in range(peticiones):
+            respuesta = await cliente.get(ruta, headers=cabeceras)
+            assert respuesta.status_code in (200, 304), respuesta.status_code
+            # httpx descomprime: el tamaño en el cable es el Content-Length
+            bytes_enviados = int(respuesta.headers.get("content-length", 0))
+        return bytes_enviados, (time.process_time() - cpu) / peticiones, respuesta.headers.get("etag")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peticiones", type=int, default=200)
+    peticiones = parser.parse_args().peticiones
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    directorio = tempfile.TemporaryDirectory()
+    ruta_bd = str(Path(directorio.name) / "compresion.db")
+    sembrar(ruta_bd, JUEGOS)
+    database.pool.crear_conexion = lambda: ConexionSQLite(ruta_bd)
+
+    import main as aplicacion
+    from services import compresion
+
+    codificaciones = ["identity", "gzip"] + (["br"] if compresion.brotli is not None else [])
+    print(f"{peticiones} peticiones por caso, umbral {compresion.COMPRESION_MIN_BYTES} bytes, "
+          f"gzip nivel {compresion.NIVEL_GZIP}, brotli {'calidad ' + str(compresion.CALIDAD_BROTLI) if compresion.brotli else 'no instalado'}")
+    print(f"{'página':<24}{'codificación':<14}{'bytes':>9}{'ratio':>8}{'CPU/pet':>11}{'compresión':>13}")
+
+    for ruta in PAGINAS:
+        original = None
+        etag = None
+        for codificacion in codificaciones:
+            antes = compresion.metricas()
+            tamaño, cpu, etag = asyncio.run(
+                medir(aplicacion.app, ruta, {"Accept-Encoding": codificacion}, peticiones)
+            )
+            despues = compresion.metricas()
+            original = original or tamaño
+            segundos = despues["segundos_compresion"] - antes["segundos_compresion"]
+            print(f"{ruta:<24}{codificacion:<14}{tamaño:>9}{tamaño / original:>8.2f}"
+                  f"{cpu * 1000:>9.2f}ms{segundos / (peticiones + 1) * 1000:>11.3f}ms")
+
+        _, cpu, _ = asyncio.run(medir(aplicacion.app, ruta, {"If-None-Match": etag}, peticiones))
+        print(f"{ruta:<24}{'304':<14}{0:>9}{0:>8.2f}{cpu * 1000:>9.2f}ms{0:>11.3f}ms")
+
+    database.pool.cerrar()
+    directorio.cleanup()
+
+
+if __name__ == "__main__":
+    main()
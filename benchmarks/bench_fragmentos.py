@@ -0,0 +1,57 @@
+"""Coste de renderizar la rejilla de tarjetas con y sin la caché de fragmentos.
+
+    python -m benchmarks.bench_fragmentos [--juegos 100] [--repeticiones 200]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.templating import Jinja2Templates
+
+from domain.model.videojuego import Videojuego
+from services.fragmentos import CacheFragmentos
+from services.imagenes import srcset_portada, formatos_disponibles
+from services.assets import manifiesto
+
+DIRECTORIO_PLANTILLAS = Path(__file__).resolve().parent.parent / "templates"
+
+
+def medir(renderizar, repeticiones):
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        renderizar(i)
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--juegos", type=int, default=100, help="juegos por página")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+    por_pagina, repeticiones = args.juegos, args.repeticiones
+
+    templates = Jinja2Templates(directory=str(DIRECTORIO_PLANTILLAS))
+    templates.env.globals["srcset_portada"] = srcset_portada
+    templates.env.globals["formatos_portada"] = formatos_disponibles()
+    manifiesto.refrescar()
+    templates.env.globals["asset_url"] = manifiesto.url
+
+    juegos = [Videojuego(i, f"Juego {i}", 19.99, "Aventura", 8.0, ["Switch"]) for i in range(por_pagina)]
+    clave = (tuple(juego.id for juego in juegos), False, True)
+    fragmentos = CacheFragmentos(templates)
+
+    for plantilla in ("fragmentos/tarjetas.html", "fragmentos/tabla_consola.html"):
+        # Sin caché: cada repetición usa una clave distinta
+        sin_cache = medir(lambda i: fragmentos.renderizar(plantilla, clave + (i,), juegos=juegos,
+                                                         is_admin=False, logueado=True), repeticiones)
+        con_cache = medir(lambda i: fragmentos.renderizar(plantilla, clave, juegos=juegos,
+                                                         is_admin=False, logueado=True), repeticiones)
+        print(f"{plantilla:<32} {por_pagina} juegos   renderizado {sin_cache * 1000:8.3f} ms   "
+              f"caché {con_cache * 1000:8.4f} ms   x{sin_cache / con_cache:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
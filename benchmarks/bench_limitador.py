@@ -0,0 +1,115 @@
+"""Ataque de relleno de credenciales contra /login con y sin limitador.
+
+Unas pocas IPs atacantes prueban contraseñas contra correos reales a
+`--tasa` intentos por segundo (cada intento admitido cuesta una consulta y
+un bcrypt) mientras un usuario
+legítimo entra desde otra IP durante `--segundos`. Se compara la latencia
+del usuario legítimo, cuántos bcrypt se llegan a ejecutar y lo que cuesta
+un 429.
+
+    python -m benchmarks.bench_limitador [--segundos 20] [--tasa 100] [--concurrencia 32] [--rondas-bcrypt 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.suite import percentil
+
+CONTRASEÑA = "bench12345"
+USUARIOS = 50
+IPS_ATACANTES = 4
+
+
+def cliente(app, ip):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(ip, 40000)), base_url="http://bench")
+
+
+async def escenario(app, segundos, tasa, concurrencia):
+    from services.hash_service import servicio_hash
+
+    atacantes = [cliente(app, f"203.0.113.{i + 1}") for i in range(IPS_ATACANTES)]
+    legitimo = cliente(app, "198.51.100.7")
+    tiempos_ataque, tiempos_legitimo, fallos_legitimo, estados = [], [], [], {}
+    bcrypt_antes = servicio_hash.completadas
+    fin = time.perf_counter() + segundos
+    intentos = iter(range(10 ** 9))
+
+    async def atacante(n):
+        while time.perf_counter() < fin:
+            i = next(intentos)
+            inicio = time.perf_counter()
+            respuesta = await atacantes[n % IPS_ATACANTES].post(
+                "/login", data={"correo": f"bench{i % USUARIOS}@test", "contraseña": f"clave{i}"})
+            tiempos_ataque.append((respuesta.status_code, time.perf_counter() - inicio))
+            estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+            # Cada atacante espera su turno: en total `tasa` intentos por segundo como mucho
+            await asyncio.sleep(max(0.0, concurrencia / tasa - (time.perf_counter() - inicio)))
+
+    async def usuario():
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            respuesta = await legitimo.post("/login", data={"correo": "legitimo@test", "contraseña": CONTRASEÑA})
+            tiempos_legitimo.append(time.perf_counter() - inicio)
+            if respuesta.status_code != 303:
+                fallos_legitimo.append(respuesta.status_code)
+            await asyncio.sleep(1)
+
+    await asyncio.gather(usuario(), *(atacante(n) for n in range(concurrencia)))
+    for c in atacantes + [legitimo]:
+        await c.aclose()
+
+    rechazos = [t for estado, t in tiempos_ataque if estado == 429] or [0]
+    print(f"  {len(tiempos_ataque)} intentos en {segundos:.0f} s   respuestas {dict(sorted(estados.items()))}   "
+          f"bcrypt ejecutados {servicio_hash.completadas - bcrypt_antes}")
+    print(f"  429 p50 {percentil(rechazos, 0.5) * 1000:.2f} ms   usuario legítimo p50 "
+          f"{percentil(tiempos_legitimo, 0.5) * 1000:.1f} ms   p95 {percentil(tiempos_legitimo, 0.95) * 1000:.1f} ms "
+          f"({len(tiempos_legitimo)} logins, fallidos {fallos_legitimo})")
+
+
+async def ejecutar(app, segundos, tasa, concurrencia):
+    import main as aplicacion
+    from services.limitador import Limitador, BackendMemoria, LOGIN_MAX_POR_IP, LOGIN_MAX_POR_CORREO
+
+    async with app.router.lifespan_context(app):
+        for nombre, reglas in (("sin limitador", (0, 0)), ("con limitador", (LOGIN_MAX_POR_IP, LOGIN_MAX_POR_CORREO))):
+            # La dependencia de /login lee el limitador global de main en cada petición
+            aplicacion.limitador = Limitador(BackendMemoria(), {"login": reglas, "registro": (0, 0)})
+            print(f"{nombre} (por IP {reglas[0]}, por correo {reglas[1]} cada minuto):")
+            await escenario(app, segundos, tasa, concurrencia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--tasa", type=float, default=100, help="intentos por segundo del ataque")
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--rondas-bcrypt", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rondas_bcrypt)
+    from data import database
+    from services.hash_service import servicio_hash
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    hash_ = servicio_hash.hashear_sync(CONTRASEÑA)
+    usuarios = [(f"Bench {i}", f"bench{i}@test", hash_, 0) for i in range(USUARIOS)]
+    usuarios.append(("Legítimo", "legitimo@test", hash_, 0))
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "limitador.db")
+        sembrar(ruta, 100, usuarios)
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        import main as aplicacion
+
+        asyncio.run(ejecutar(aplicacion.app, args.segundos, args.tasa, args.concurrencia))
+        database.pool.cerrar()
+
+
+if __name__ == "__main__":
+    main()
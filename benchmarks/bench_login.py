@@ -0,0 +1,91 @@
+"""Latencia de /login (p50/p99) bajo logins concurrentes.
+
+Mientras llega la ráfaga de logins se mide también /videojuegos para comprobar
+que el catálogo sigue respondiendo mientras bcrypt trabaja.
+
+    python -m benchmarks.bench_login [--concurrencia 32] [--logins 128]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bcrypt
+import httpx
+
+from data import database
+
+CONTRASEÑA = "secreta123"
+HASH = bcrypt.hashpw(CONTRASEÑA.encode(), bcrypt.gensalt(12)).decode()
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def medir(app, concurrencia, logins):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        semaforo = asyncio.Semaphore(concurrencia)
+        tiempos_login, tiempos_catalogo = [], []
+
+        async def login():
+            async with semaforo:
+                inicio = time.perf_counter()
+                respuesta = await cliente.post("/login", data={"correo": "bench@test", "contraseña": CONTRASEÑA})
+                tiempos_login.append(time.perf_counter() - inicio)
+                assert respuesta.status_code in (303, 503), respuesta.status_code
+
+        async def catalogo():
+            for _ in range(20):
+                inicio = time.perf_counter()
+                await cliente.get("/videojuegos")
+                tiempos_catalogo.append(time.perf_counter() - inicio)
+                await asyncio.sleep(0.01)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(catalogo(), *(login() for _ in range(logins)))
+        total = time.perf_counter() - inicio
+        return total, tiempos_login, tiempos_catalogo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=128)
+    args = parser.parse_args()
+    concurrencia, logins = args.concurrencia, args.logins
+
+    # Todos los logins vienen de la misma IP y el mismo correo: se mide bcrypt, no el limitador
+    os.environ.setdefault("LOGIN_MAX_POR_IP", "0")
+    os.environ.setdefault("LOGIN_MAX_POR_CORREO", "0")
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "login.db")
+        sembrar(ruta, 200, [("Bench", "bench@test", HASH, 0)])
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        database.pool.tamaño = concurrencia + 4
+
+        import main as aplicacion
+        from services.hash_service import servicio_hash
+
+        total, tiempos_login, tiempos_catalogo = asyncio.run(medir(aplicacion.app, concurrencia, logins))
+        database.pool.cerrar()
+    print(f"{logins} logins, concurrencia {concurrencia}, bcrypt {servicio_hash.max_concurrencia} hilos, "
+          f"{servicio_hash.rechazadas} rechazados")
+    print(f"login      p50 {statistics.median(tiempos_login) * 1000:7.1f} ms   "
+          f"p99 {percentil(tiempos_login, 0.99) * 1000:7.1f} ms   {logins / total:6.1f} logins/s")
+    print(f"catálogo   p50 {statistics.median(tiempos_catalogo) * 1000:7.1f} ms   "
+          f"p99 {percentil(tiempos_catalogo, 0.99) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
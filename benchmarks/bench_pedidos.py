@@ -0,0 +1,115 @@
+"""Ráfaga de pagos: muchos usuarios confirman el pedido a la vez, y dos veces.
+
+Cada usuario virtual llena su carrito, abre /pago y envía el formulario dos
+veces seguidas con la misma clave (el doble clic). Se mide la latencia del
+POST /procesar-pago, el tiempo hasta que todos los pedidos quedan pagados
+y se comprueba que cada usuario tiene un único pedido por ronda.
+
+    python -m benchmarks.bench_pedidos [--usuarios 64] [--rondas 3] [--latencia 0.2]
+
+Usa la base de datos SQLite de los benchmarks y la pasarela falsa.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.suite import percentil
+
+CONTRASEÑA = "bench12345"
+
+
+async def ronda(clientes, juegos, numero):
+    """Una ráfaga; devuelve (tiempos de los POST, segundos hasta cerrar todos, ids de pedido por usuario)"""
+    claves = []
+    for i, cliente in enumerate(clientes):
+        for juego in juegos[(i + numero) % len(juegos)::len(juegos) // 2][:2]:
+            await cliente.post("/agregar-carrito", data={"videojuego_id": juego.id})
+        pagina = await cliente.get("/pago")
+        claves.append(re.search(r'name="clave_idempotencia" value="(\w+)"', pagina.text).group(1))
+
+    tiempos = []
+
+    async def confirmar(cliente, clave):
+        inicio = time.perf_counter()
+        respuesta = await cliente.post("/procesar-pago", data={"metodo_pago": "otras", "clave_idempotencia": clave})
+        tiempos.append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 303, f"/procesar-pago: {respuesta.status_code}"
+        return respuesta.headers["location"]
+
+    inicio = time.perf_counter()
+    destinos = await asyncio.gather(*(confirmar(cliente, clave)
+                                      for cliente, clave in zip(clientes, claves) for _ in range(2)))
+    pedidos = set(destinos)
+    pendientes = set(pedidos)
+    while pendientes:
+        await asyncio.sleep(0.02)
+        for destino in list(pendientes):
+            cliente = clientes[destinos.index(destino) // 2]
+            estado = (await cliente.get(f"{destino}/estado")).json()["estado"]
+            if estado != "pendiente":
+                assert estado == "pagado", f"{destino}: {estado}"
+                pendientes.discard(destino)
+    return tiempos, time.perf_counter() - inicio, destinos
+
+
+async def ejecutar(app, juegos, usuarios, rondas):
+    import httpx
+
+    transporte = httpx.ASGITransport(app=app)
+    clientes = [httpx.AsyncClient(transport=transporte, base_url="http://bench") for _ in range(usuarios)]
+    async with app.router.lifespan_context(app):
+        try:
+            for i, cliente in enumerate(clientes):
+                await cliente.post("/login", data={"correo": f"bench{i}@test", "contraseña": CONTRASEÑA})
+            for numero in range(rondas):
+                tiempos, segundos, destinos = await ronda(clientes, juegos, numero)
+                # Los dos envíos de cada usuario acaban en el mismo pedido
+                duplicados = sum(destinos[i] != destinos[i + 1] for i in range(0, len(destinos), 2))
+                print(f"ronda {numero + 1}: {len(tiempos)} POST en ráfaga -> {len(set(destinos))} pedidos "
+                      f"({duplicados} duplicados)   POST p50 {percentil(tiempos, 0.5) * 1000:7.2f} ms   "
+                      f"p95 {percentil(tiempos, 0.95) * 1000:7.2f} ms   p99 {percentil(tiempos, 0.99) * 1000:7.2f} ms   "
+                      f"todos pagados en {segundos:.2f} s")
+        finally:
+            for cliente in clientes:
+                await cliente.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=64)
+    parser.add_argument("--rondas", type=int, default=3)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos que tarda la pasarela falsa")
+    args = parser.parse_args()
+
+    # La configuración se lee al importar los módulos de la app
+    os.environ["PAGO_FALSO_LATENCIA"] = str(args.latencia)
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("LOGIN_MAX_POR_IP", "0")
+    from data import database
+    from services.hash_service import servicio_hash
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    hash_ = servicio_hash.hashear_sync(CONTRASEÑA)
+    usuarios = [(f"Bench {i}", f"bench{i}@test", hash_, 0) for i in range(args.usuarios)]
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "pedidos.db")
+        juegos = sembrar(ruta, 1000, usuarios)
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        import main as aplicacion
+
+        print(f"{args.usuarios} usuarios, pasarela de {args.latencia * 1000:.0f} ms, "
+              f"{aplicacion.procesador_pagos.concurrencia} cobros a la vez, pool de {database.pool.tamaño} conexiones")
+        asyncio.run(ejecutar(aplicacion.app, juegos, args.usuarios, args.rondas))
+        print(aplicacion.procesador_pagos.metricas())
+        database.pool.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Lecturas del catálogo repartidas entre réplicas, leer lo propio y expulsión.
+
+Una base de datos SQLite hace de primario y otras copias suyas de réplicas;
+la "replicación" es copiar el primario sobre ellas con `replicar`, así que
+mientras no se copia las réplicas van con retraso. Fases:
+
+- reparto: páginas del catálogo sin caché; cuántas lecturas va a cada base de datos.
+- leer lo propio: un admin edita un precio y lo vuelve a leer enseguida; la
+  réplica aún tiene el precio antiguo.
+- caída: una réplica deja de aceptar conexiones; las lecturas siguen saliendo bien.
+- retraso: una réplica informa de un retraso mayor que DB_REPLICA_RETRASO_MAX_SEG.
+
+    python -m benchmarks.bench_replicas [--juegos 5000] [--replicas 2] [--paginas 60]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.suite import percentil
+
+CONTRASEÑA = "bench-admin"
+
+
+async def recorrer(cliente, paginas):
+    """Recorre `paginas` páginas del catálogo; devuelve (códigos de estado, tiempos)"""
+    estados, tiempos, after = [], [], ""
+    for _ in range(paginas):
+        inicio = time.perf_counter()
+        respuesta = await cliente.get(f"/api/v1/videojuegos?fields=id&limit=20&after={after}")
+        tiempos.append(time.perf_counter() - inicio)
+        estados.append(respuesta.status_code)
+        after = respuesta.json().get("siguiente") or "" if respuesta.status_code == 200 else ""
+    return estados, tiempos
+
+
+def lecturas(enrutador, pool):
+    return [replica.lecturas for replica in enrutador.replicas], enrutador.lecturas_primario, pool.prestamos
+
+
+def diferencia(antes, despues):
+    replicas = [b - a for a, b in zip(antes[0], despues[0])]
+    return f"réplicas {replicas}, primario {despues[1] - antes[1]} lecturas ({despues[2] - antes[2]} conexiones)"
+
+
+def precio_en(ruta, videojuego_id):
+    conexion = sqlite3.connect(ruta)
+    try:
+        return conexion.execute("SELECT precio FROM videojuegos WHERE id = ?", (videojuego_id,)).fetchone()[0]
+    finally:
+        conexion.close()
+
+
+def host_caido():
+    raise sqlite3.OperationalError("host caído")
+
+
+async def esperar_comprobacion(enrutador):
+    await asyncio.sleep(enrutador.intervalo * 2.5)
+
+
+async def ejecutar(app, ruta, rutas_replicas, paginas):
+    import httpx
+    import main as aplicacion
+    from data import database
+    from benchmarks.sqlite_bd import replicar
+
+    enrutador, pool = database.enrutador, database.pool
+    cache = aplicacion.videojuegos_repo.cache
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente, \
+                httpx.AsyncClient(transport=transporte, base_url="http://bench") as admin:
+            respuesta = await admin.post("/login", data={"correo": "admin@test", "contraseña": CONTRASEÑA})
+            assert respuesta.status_code == 303, f"login del admin: {respuesta.status_code}"
+
+            print("== reparto ==")
+            cache.invalidar()
+            antes = lecturas(enrutador, pool)
+            estados, tiempos = await recorrer(cliente, paginas)
+            print(f"{paginas} páginas sin caché: {diferencia(antes, lecturas(enrutador, pool))}, "
+                  f"p50 {percentil(tiempos, 0.5) * 1000:.1f} ms")
+
+            print("== leer lo propio ==")
+            juego = (await cliente.get("/api/v1/videojuegos/1")).json()
+            precio = round(juego["precio"] + 10, 2)
+            respuesta = await admin.post("/editar-juego", data={
+                "videojuego_id": 1, "nombre": juego["nombre"], "precio": precio,
+                "genero": juego["genero"], "valoracion": juego["valoracion"],
+            })
+            assert respuesta.status_code == 303, f"edición: {respuesta.status_code}"
+            antes = lecturas(enrutador, pool)
+            leido = (await admin.get("/api/v1/videojuegos/1?fields=precio")).json()["precio"]
+            print(f"el admin lee {leido} justo después de guardar {precio} "
+                  f"({diferencia(antes, lecturas(enrutador, pool))}); "
+                  f"las réplicas aún tienen {[precio_en(r, 1) for r in rutas_replicas]}")
+            for ruta_replica in rutas_replicas:
+                replicar(ruta, ruta_replica)
+            await asyncio.sleep(database.DB_LEER_PRIMARIO_SEG)
+
+            print("== caída de una réplica ==")
+            caida = enrutador.replicas[0]
+            crear_conexion = caida.pool.crear_conexion
+            caida.pool.cerrar()
+            caida.pool.crear_conexion = host_caido
+            cache.invalidar()
+            antes = lecturas(enrutador, pool)
+            estados, tiempos = await recorrer(cliente, paginas)
+            print(f"{paginas} páginas: {estados.count(200)} con 200, {diferencia(antes, lecturas(enrutador, pool))}, "
+                  f"p50 {percentil(tiempos, 0.5) * 1000:.1f} ms, máx {max(tiempos) * 1000:.0f} ms "
+                  f"(solo la primera espera los reintentos de conexión)")
+            await esperar_comprobacion(enrutador)
+            print(f"tras la comprobación: {caida.nombre} expulsada={caida.expulsada}")
+            caida.pool.crear_conexion = crear_conexion
+            caida.pool._caida_hasta = 0.0
+            await esperar_comprobacion(enrutador)
+            print(f"conexión restablecida: {caida.nombre} expulsada={caida.expulsada}")
+
+            print("== réplica retrasada ==")
+            retraso_replica = database.retraso_replica
+            database.retraso_replica = lambda conexion: enrutador.retraso_max * 6
+            await esperar_comprobacion(enrutador)
+            cache.invalidar()
+            antes = lecturas(enrutador, pool)
+            await recorrer(cliente, paginas)
+            print(f"todas las réplicas informan de {enrutador.retraso_max * 6:.0f}s de retraso: "
+                  f"{diferencia(antes, lecturas(enrutador, pool))}")
+            database.retraso_replica = retraso_replica
+            await esperar_comprobacion(enrutador)
+            print(f"se ponen al día: disponibles {enrutador.metricas()['disponibles']} de {len(enrutador.replicas)}")
+            print(enrutador.metricas())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--juegos", type=int, default=5000)
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--paginas", type=int, default=60)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_REPLICA_COMPROBAR_SEG", "0.2")
+    os.environ.setdefault("DB_REPLICA_RETRASO_MAX_SEG", "1")
+    os.environ.setdefault("DB_LEER_PRIMARIO_SEG", "1")
+    os.environ.setdefault("CAMBIOS_INTERVALO_SEG", "0.2")
+    from data import database
+    from services.hash_service import servicio_hash
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar, replica
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "primario.db")
+        sembrar(ruta, args.juegos, [("Admin", "admin@test", servicio_hash.hashear_sync(CONTRASEÑA), 1)])
+        rutas_replicas = []
+        for i in range(args.replicas):
+            rutas_replicas.append(str(Path(directorio) / f"replica{i}.db"))
+            shutil.copy(ruta, rutas_replicas[-1])
+            database.enrutador.replicas.append(replica(rutas_replicas[-1], f"replica{i}"))
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        import main as aplicacion
+
+        asyncio.run(ejecutar(aplicacion.app, ruta, rutas_replicas, args.paginas))
+        database.enrutador.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Cómo escala el throughput con el número de workers de gunicorn.
+
+Arranca gunicorn con gunicorn.conf.py sobre un catálogo SQLite sintético para
+cada número de workers y lo carga por HTTP con una mezcla de catálogo, consola
+y búsqueda. El generador de carga corre en la misma máquina y también gasta
+CPU: con pocos núcleos la curva se aplana antes.
+
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--segundos 10] [--concurrencia 32]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import httpx
+
+from benchmarks.sqlite_bd import sembrar
+from benchmarks.suite import percentil
+from data.paginacion import codificar_cursor
+
+PUERTO = 8765
+
+
+def arrancar(workers, ruta):
+    entorno = dict(os.environ, BENCH_BD=ruta, WEB_CONCURRENCY=str(workers), PORT=str(PUERTO))
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "benchmarks.app_sqlite:app", "-c", "gunicorn.conf.py"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    # Listo cuando responde; los workers se calientan antes de aceptar tráfico
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PUERTO}/videojuegos", timeout=2).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proceso.kill()
+    raise RuntimeError("gunicorn no ha arrancado en 60 s")
+
+
+async def cargar(juegos, segundos, concurrencia, semilla=2026):
+    aleatorio = random.Random(semilla)
+    tiempos, errores = [], 0
+
+    def ruta():
+        juego = aleatorio.choice(juegos)
+        return aleatorio.choice([
+            f"/videojuegos?after={codificar_cursor(juego)}",
+            f"/playstation?after={codificar_cursor(juego)}",
+            f"/buscar?nombre={juego.nombre.split()[0][:4]}",
+        ])
+
+    limites = httpx.Limits(max_connections=concurrencia)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PUERTO}", limits=limites, timeout=30) as cliente:
+        fin = time.perf_counter() + segundos
+
+        async def usuario():
+            nonlocal errores
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await cliente.get(ruta())
+                    if respuesta.status_code != 200:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                tiempos.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+        total = time.perf_counter() - inicio
+    return {
+        "workers": None,
+        "peticiones": len(tiempos),
+        "errores": errores,
+        "por_segundo": round(len(tiempos) / total, 2),
+        "p50_ms": round(statistics.median(tiempos) * 1000, 3),
+        "p99_ms": round(percentil(tiempos, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput según el número de workers")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})))
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--tamaño", type=int, default=10000)
+    parser.add_argument("--salida")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "bench.db")
+        juegos = sembrar(ruta, args.tamaño)
+        print(f"{args.tamaño} juegos, {os.cpu_count()} CPUs, concurrencia {args.concurrencia}, {args.segundos:.0f} s por caso")
+        base = None
+        for workers in (int(n) for n in args.workers.split(",")):
+            proceso = arrancar(workers, ruta)
+            try:
+                resultado = asyncio.run(cargar(juegos, args.segundos, args.concurrencia))
+            finally:
+                proceso.send_signal(signal.SIGTERM)
+                proceso.wait(timeout=60)
+            resultado["workers"] = workers
+            base = base or resultado["por_segundo"]
+            print(f"{workers:>3} workers  {resultado['por_segundo']:>9.1f} req/s  (x{resultado['por_segundo'] / base:.2f})  "
+                  f"p50 {resultado['p50_ms']:>8.2f} ms  p99 {resultado['p99_ms']:>8.2f} ms  {resultado['errores']} errores")
+            resultados.append(resultado)
+
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(resultados, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compara dos resultados de benchmarks.suite y marca las regresiones.
+
+    python -m benchmarks.comparar base.json nuevo.json [--umbral 10]
+
+Sale con código 1 si algún flujo empeora más del umbral (en %) en p95 o en
+peticiones por segundo, para poder usarlo en CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def indexar(informe):
+    return {
+        (resultado["tamaño"], flujo): datos
+        for resultado in informe["resultados"]
+        for flujo, datos in resultado["flujos"].items()
+    }
+
+
+def variacion(antes, despues):
+    if not antes:
+        return 0.0
+    return 100 * (despues - antes) / antes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos JSON de benchmarks.suite")
+    parser.add_argument("base")
+    parser.add_argument("nuevo")
+    parser.add_argument("--umbral", type=float, default=10.0, help="% de empeoramiento tolerado")
+    args = parser.parse_args()
+
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    nuevo = json.loads(Path(args.nuevo).read_text(encoding="utf-8"))
+    print(f"base {base.get('commit')} ({base.get('fecha')})  ->  nuevo {nuevo.get('commit')} ({nuevo.get('fecha')})")
+
+    datos_base = indexar(base)
+    regresiones = []
+    print(f"{'tamaño':>8} {'flujo':<10}{'req/s':>18}{'p50 ms':>20}{'p95 ms':>20}{'p99 ms':>20}")
+    for clave, datos in sorted(indexar(nuevo).items()):
+        anterior = datos_base.get(clave)
+        if not anterior or not datos.get("peticiones") or not anterior.get("peticiones"):
+            continue
+        columnas = []
+        for metrica in ("por_segundo", "p50_ms", "p95_ms", "p99_ms"):
+            cambio = variacion(anterior[metrica], datos[metrica])
+            columnas.append(f"{datos[metrica]:>10.2f} ({cambio:+5.0f}%)")
+        print(f"{clave[0]:>8} {clave[1]:<10}" + "".join(f"{c:>20}" for c in columnas))
+
+        if variacion(anterior["p95_ms"], datos["p95_ms"]) > args.umbral:
+            regresiones.append(f"{clave[1]} ({clave[0]} juegos): p95 {anterior['p95_ms']} -> {datos['p95_ms']} ms")
+        if -variacion(anterior["por_segundo"], datos["por_segundo"]) > args.umbral:
+            regresiones.append(f"{clave[1]} ({clave[0]} juegos): {anterior['por_segundo']} -> "
+                               f"{datos['por_segundo']} req/s")
+
+    if regresiones:
+        print(f"\nRegresiones por encima del {args.umbral:.0f}%:")
+        for regresion in regresiones:
+            print(f"  {regresion}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
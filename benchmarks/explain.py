@@ -0,0 +1,191 @@
+"""Comprueba con EXPLAIN que las consultas frecuentes usan índices.
+
+Las consultas no se copian aquí: se ejecutan los métodos reales de los
+repositorios contra una conexión que solo anota el SQL y los parámetros, y
+después se pide el plan de cada uno a la base de datos de verdad.
+
+Se considera recorrido completo:
+- SQLite: "SCAN <tabla>" sin índice, o recorrer un índice entero para
+  después ordenar (SCAN ... USING INDEX junto a TEMP B-TREE FOR ORDER BY).
+- MySQL: type ALL, o type index con "Using filesort".
+Las páginas con cursor deben además buscar por rango (SEARCH / range): si
+recorren el índice entero es que el cursor no se está usando para saltar.
+La tabla consolas tiene cuatro filas y no se comprueba.
+
+    python -m benchmarks.explain            # catálogo SQLite sintético de 10k juegos
+    python -m benchmarks.explain --mysql    # la base de datos configurada (DB_HOST...)
+"""
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.cambios_catalogo import BusBD
+from data.carrito_store import CarritoStoreSQL
+from data.pedido_repository import PedidoRepository
+from data.usuario_repository import UsuarioRepository
+from data.videojuego_repository import VideojuegoRepository
+
+TABLAS = {"videojuegos", "videojuego_consola", "usuarios", "carritos", "pedidos", "pedido_lineas",
+          "cambios_catalogo"}
+
+
+class CursorAnotador:
+    def __init__(self, consultas):
+        self.consultas = consultas
+        self.lastrowid = 0
+
+    def execute(self, sql, params=()):
+        self.consultas.append((" ".join(sql.split()), tuple(params or ())))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return (0,)
+
+    def close(self):
+        pass
+
+
+class ConexionAnotadora:
+    """Conexión falsa que guarda cada consulta que recibe"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def cursor(self, **kwargs):
+        return CursorAnotador(self.consultas)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    @contextmanager
+    def conexion(self):
+        yield self
+
+
+def leer_cambios(db):
+    """Lectura periódica del bus de cambios, ya arrancado y con la versión 500"""
+    bus = BusBD(db)
+    bus._inicio, bus.version = 0, 500
+    bus.leer()
+
+
+def consultas_frecuentes():
+    """[(nombre, sql, params, con_cursor)] de las lecturas que se hacen en cada petición"""
+    VideojuegoRepository._mapa_consolas = {"PlayStation": 1, "Xbox": 2, "Switch": 3, "Steam": 4}
+    videojuegos = VideojuegoRepository()
+    cursor = ("Mon", 500)
+    # (nombre, llamada, con_cursor)
+    llamadas = [
+        ("catalogo primera página", lambda db: videojuegos.get_all(db, limite=25), False),
+        ("catalogo siguiente", lambda db: videojuegos.get_all(db, limite=25, despues=cursor), True),
+        ("catalogo anterior", lambda db: videojuegos.get_all(db, limite=25, antes=cursor), True),
+        ("consola primera página", lambda db: videojuegos.get_por_consola(db, "Xbox", limite=25), False),
+        ("consola siguiente", lambda db: videojuegos.get_por_consola(db, "Xbox", limite=25, despues=cursor), True),
+        ("consola total", lambda db: videojuegos.contar(db, consola="Xbox"), False),
+        ("juego por id", lambda db: videojuegos.get_por_id(db, 42), False),
+        ("juegos del carrito", lambda db: videojuegos.get_por_ids(db, [3, 42, 77]), False),
+        ("usuario por correo", lambda db: UsuarioRepository().get_por_correo(db, "bench0@test"), False),
+        ("carrito", lambda db: CarritoStoreSQL(db).obtener("0" * 32), False),
+        ("pedido por clave", lambda db: PedidoRepository().get_id_por_clave(db, 1, "0" * 32), False),
+        ("pedido", lambda db: PedidoRepository().get_por_id(db, 1), False),
+        ("estado del pedido", lambda db: PedidoRepository().get_estado(db, 1), False),
+        ("pedidos del usuario", lambda db: PedidoRepository().get_por_usuario(db, 1), False),
+        ("cambios del catálogo", leer_cambios, True),
+    ]
+    resultado = []
+    for nombre, llamada, con_cursor in llamadas:
+        db = ConexionAnotadora()
+        llamada(db)
+        # La última consulta es la del método (antes puede cargar el mapa de consolas)
+        sql, params = db.consultas[-1]
+        resultado.append((nombre, sql, params, con_cursor))
+    VideojuegoRepository._mapa_consolas = None
+    return resultado
+
+
+def recorridos_sqlite(conexion, sql, params, con_cursor=False):
+    from benchmarks.sqlite_bd import traducir
+    filas = conexion.execute("EXPLAIN QUERY PLAN " + traducir(sql), params).fetchall()
+    plan = [detalle for _, _, _, detalle in filas]
+    # El orden con TEMP B-TREE pertenece a la misma consulta (mismo padre) que el SCAN
+    ordena = {padre for _, padre, _, detalle in filas if "TEMP B-TREE FOR ORDER BY" in detalle}
+    problemas = []
+    for _, padre, _, detalle in filas:
+        partes = detalle.split()
+        if partes[0] != "SCAN" or partes[1] not in TABLAS and not _alias_de_tabla(sql, partes[1]):
+            continue
+        if "INDEX" not in detalle or padre in ordena or con_cursor:
+            problemas.append(detalle)
+    return plan, problemas
+
+
+def _alias_de_tabla(sql, alias):
+    """True si el alias corresponde a una tabla real (p. ej. 'videojuegos v')"""
+    return any(f"{tabla} {alias} " in sql + " " for tabla in TABLAS)
+
+
+def recorridos_mysql(conexion, sql, params, con_cursor=False):
+    cursor = conexion.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + sql, params)
+        filas = cursor.fetchall()
+    finally:
+        cursor.close()
+    plan = [f"{f['table']}: {f['type']} {f.get('key') or ''} {f.get('Extra') or ''}".strip() for f in filas]
+    problemas = [
+        linea for fila, linea in zip(filas, plan)
+        if fila["table"] in TABLAS or _alias_de_tabla(sql, fila["table"] or "")
+        if fila["type"] == "ALL"
+        or fila["type"] == "index" and (con_cursor or "filesort" in (fila.get("Extra") or ""))
+    ]
+    return plan, problemas
+
+
+def comprobar(explicar, conexion, mostrar=True):
+    """Devuelve {consulta: [recorridos completos]} de las consultas que fallan"""
+    fallos = {}
+    for nombre, sql, params, con_cursor in consultas_frecuentes():
+        plan, problemas = explicar(conexion, sql, params, con_cursor)
+        if mostrar:
+            print(f"{'FALLA' if problemas else 'ok':<6}{nombre}")
+            for linea in plan:
+                print(f"        {linea}")
+        if problemas:
+            fallos[nombre] = problemas
+    return fallos
+
+
+def main(argumentos):
+    if "--mysql" in argumentos:
+        from data.database import crear_conexion_mysql
+        conexion = crear_conexion_mysql()
+        try:
+            fallos = comprobar(recorridos_mysql, conexion)
+        finally:
+            conexion.close()
+    else:
+        import sqlite3
+        from benchmarks.sqlite_bd import sembrar
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = str(Path(directorio) / "explain.db")
+            sembrar(ruta, 10000)
+            conexion = sqlite3.connect(ruta)
+            try:
+                fallos = comprobar(recorridos_sqlite, conexion)
+            finally:
+                conexion.close()
+    if fallos:
+        print(f"\n{len(fallos)} consultas recorren una tabla completa")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
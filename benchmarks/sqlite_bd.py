@@ -0,0 +1,198 @@
+"""Base de datos SQLite que sustituye a MySQL en los benchmarks.
+
+El esquema sale de las migraciones de data/migraciones, traducidas a SQLite,
+así que tiene las mismas tablas e índices que la base de datos real.
+
+Imita lo que los repositorios usan de mysql-connector: parámetros %s,
+cursor(dictionary=True), lastrowid, in_transaction, ping() e is_connected().
+Se enchufa en el pool de la aplicación sin tocar el código de producción:
+
+    database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+
+Otra base de datos SQLite (una copia de la del primario) hace de réplica de
+lectura con `replica(ruta)`; `replicar` la pone al día.
+"""
+import random
+import re
+import sqlite3
+import time
+
+from benchmarks.bench_busqueda import catalogo_sintetico
+from data.migrador import migraciones, sentencias
+
+CONSOLAS = ("PlayStation", "Xbox", "Switch", "Steam")
+
+# DDL de MySQL de data/migraciones que SQLite escribe de otra forma
+_TRADUCCIONES_DDL = (
+    (re.compile(r"\b(?:BIG)?INT AUTO_INCREMENT PRIMARY KEY"), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\)\s*ENGINE=.*$"), ")"),
+    (re.compile(r" ON UPDATE CURRENT_TIMESTAMP"), ""),
+    (re.compile(r"^INSERT IGNORE\b"), "INSERT OR IGNORE"),
+    (re.compile(r"(\w+) \+ INTERVAL (\d+) DAY"), r"datetime(\1, '+\2 days')"),
+)
+# SQLite no admite índices dentro de CREATE TABLE: pasan a CREATE INDEX
+_CLAVE_EN_TABLA = re.compile(r"^\s*(UNIQUE )?KEY (\w+) (\([^)]*\)),?\s*$")
+
+
+def _separar_claves(sentencia):
+    tabla = re.match(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)", sentencia)
+    if tabla is None:
+        return [sentencia]
+    lineas, indices = [], []
+    for linea in sentencia.splitlines():
+        clave = _CLAVE_EN_TABLA.match(linea)
+        if clave:
+            indices.append(f"CREATE {clave.group(1) or ''}INDEX {clave.group(2)} ON {tabla.group(1)} {clave.group(3)}")
+        else:
+            lineas.append(linea)
+    # Si la clave era lo último, la columna anterior se queda con una coma de más
+    return [re.sub(r",(\s*\))$", r"\1", "\n".join(lineas))] + indices
+
+
+def esquema():
+    """Sentencias de las migraciones de data/migraciones traducidas a SQLite"""
+    lista = []
+    for _, _, ruta in migraciones():
+        for sentencia in sentencias(ruta.read_text(encoding="utf-8")):
+            for patron, sustituto in _TRADUCCIONES_DDL:
+                sentencia = patron.sub(sustituto, sentencia)
+            lista += _separar_claves(sentencia)
+    return lista
+
+
+# Sintaxis de MySQL que SQLite escribe de otra forma
+_TRADUCCIONES = (
+    (re.compile(r"ON DUPLICATE KEY UPDATE cantidad = cantidad \+ VALUES\(cantidad\)"),
+     "ON CONFLICT (carrito_id, videojuego_id) DO UPDATE SET cantidad = cantidad + excluded.cantidad"),
+    (re.compile(r"NOW\(\) - INTERVAL %s SECOND"), "datetime('now', '-' || %s || ' seconds')"),
+    (re.compile(r"NOW\(\) \+ INTERVAL %s SECOND"), "datetime('now', '+' || %s || ' seconds')"),
+)
+
+
+def traducir(sql):
+    for patron, sustituto in _TRADUCCIONES:
+        sql = patron.sub(sustituto, sql)
+    return sql.replace("%s", "?")
+
+
+class CursorSQLite:
+    def __init__(self, conexion, dictionary=False, latencia=0.0):
+        self._cursor = conexion.cursor()
+        self.dictionary = dictionary
+        self.latencia = latencia
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        if self.latencia:
+            time.sleep(self.latencia)
+        self._cursor.execute(traducir(sql), tuple(params or ()))
+
+    def executemany(self, sql, filas):
+        self._cursor.executemany(traducir(sql), [tuple(fila) for fila in filas])
+
+    def _fila(self, fila):
+        if fila is None or not self.dictionary:
+            return fila
+        return {columna[0]: valor for columna, valor in zip(self._cursor.description, fila)}
+
+    def fetchone(self):
+        return self._fila(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._fila(fila) for fila in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSQLite:
+    """`latencia`: segundos que duerme cada consulta, como la ida y vuelta a un MySQL remoto"""
+
+    def __init__(self, ruta, latencia=0.0):
+        self.latencia = latencia
+        # Cada conexión del pool se usa desde varios hilos, pero nunca a la vez
+        # PARSE_DECLTYPES: las columnas TIMESTAMP llegan como datetime, igual que con MySQL
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30,
+                                         detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+
+    @property
+    def in_transaction(self):
+        return self._conexion.in_transaction
+
+    def cursor(self, dictionary=False, **kwargs):
+        return CursorSQLite(self._conexion, dictionary, self.latencia)
+
+    def commit(self):
+        self._conexion.commit()
+
+    def rollback(self):
+        self._conexion.rollback()
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self._conexion.execute("SELECT 1")
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conexion.close()
+
+
+def crear_bd(ruta, juegos, usuarios=(), semilla=2026):
+    """Crea el esquema y carga el catálogo [Videojuego] y los usuarios"""
+    aleatorio = random.Random(semilla)
+    conexion = sqlite3.connect(ruta)
+    for sentencia in esquema():
+        conexion.execute(sentencia)
+    conexion.executemany("INSERT OR IGNORE INTO consolas (id, nombre) VALUES (?, ?)",
+                         list(enumerate(CONSOLAS, start=1)))
+    conexion.executemany("INSERT INTO videojuegos (id, nombre, precio, genero, valoracion) VALUES (?, ?, ?, ?, ?)",
+                         [(j.id, j.nombre, j.precio, j.genero, j.valoracion) for j in juegos])
+    enlaces = []
+    for juego in juegos:
+        for consola_id in aleatorio.sample(range(1, len(CONSOLAS) + 1), aleatorio.randint(1, len(CONSOLAS))):
+            enlaces.append((juego.id, consola_id))
+    conexion.executemany("INSERT INTO videojuego_consola (videojuego_id, consola_id) VALUES (?, ?)", enlaces)
+    conexion.executemany("INSERT INTO usuarios (nombre, correo, contraseña, es_admin) VALUES (?, ?, ?, ?)",
+                         list(usuarios))
+    # Estadísticas para el planificador, como las que mantiene InnoDB
+    conexion.execute("ANALYZE")
+    conexion.commit()
+    conexion.close()
+
+
+def sembrar(ruta, n, usuarios=()):
+    """Base de datos con un catálogo sintético de n juegos; devuelve los juegos"""
+    juegos = catalogo_sintetico(n)
+    crear_bd(ruta, juegos, usuarios)
+    return juegos
+
+
+def replica(ruta, nombre=None):
+    """Réplica de lectura sobre la base de datos SQLite de `ruta`"""
+    from data.database import Replica, PoolConexiones, DB_REPLICA_POOL_TIMEOUT
+    return Replica(nombre or ruta, PoolConexiones(lambda: ConexionSQLite(ruta), timeout=DB_REPLICA_POOL_TIMEOUT))
+
+
+def replicar(origen, destino):
+    """Copia la base de datos del primario sobre la réplica (la replicación se pone al día)"""
+    primario = sqlite3.connect(origen)
+    copia = sqlite3.connect(destino)
+    try:
+        primario.backup(copia)
+    finally:
+        copia.close()
+        primario.close()
@@ -0,0 +1,238 @@
+"""Suite de carga contra la app real sobre SQLite con catálogos sintéticos.
+
+Para cada tamaño de catálogo (por defecto 1k, 10k y 100k juegos) crea una
+base de datos nueva, la enchufa en el pool y recorre los flujos:
+
+    catalogo   GET /videojuegos en páginas al azar (cursor)
+    consola    GET /playstation en páginas al azar
+    busqueda   GET /buscar con prefijos de títulos reales
+    login      POST /login
+    carrito    POST /agregar-carrito
+    pago       POST /agregar-carrito + POST /procesar-pago
+
+Cada tamaño se ejecuta en un proceso nuevo para no arrastrar cachés. El
+resultado es un JSON con peticiones por segundo y p50/p95/p99 por flujo que
+se compara entre commits con benchmarks.comparar. Antes de medir se pasa
+benchmarks.explain sobre cada base de datos: si alguna consulta frecuente
+recorre una tabla completa la suite termina con código 1 (salvo con
+--permitir-recorridos), aunque los tiempos parezcan buenos con pocos juegos.
+
+    python -m benchmarks.suite --salida resultados.json
+    python -m benchmarks.suite --tamaños 1000 --peticiones 200 --concurrencia 8
+    python -m benchmarks.comparar base.json resultados.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+FLUJOS = ("catalogo", "consola", "busqueda", "login", "carrito", "pago")
+CONTRASEÑA = "bench12345"
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def resumen(tiempos, errores, segundos):
+    if not tiempos:
+        return {"peticiones": 0, "errores": errores}
+    return {
+        "peticiones": len(tiempos),
+        "errores": errores,
+        "por_segundo": round(len(tiempos) / segundos, 2),
+        "p50_ms": round(statistics.median(tiempos) * 1000, 3),
+        "p95_ms": round(percentil(tiempos, 0.95) * 1000, 3),
+        "p99_ms": round(percentil(tiempos, 0.99) * 1000, 3),
+    }
+
+
+async def ejecutar_flujos(app, juegos, flujos, peticiones, concurrencia, semilla=2026):
+    import httpx
+    from data.paginacion import codificar_cursor
+
+    aleatorio = random.Random(semilla)
+    transporte = httpx.ASGITransport(app=app)
+    clientes = [httpx.AsyncClient(transport=transporte, base_url="http://bench") for _ in range(concurrencia)]
+    # ASGITransport no lanza el lifespan: sin él no arrancaría el procesador de pagos
+    async with app.router.lifespan_context(app):
+        try:
+            # Cada usuario virtual tiene su propia sesión
+            for i, cliente in enumerate(clientes):
+                respuesta = await cliente.post("/login", data={"correo": f"bench{i}@test", "contraseña": CONTRASEÑA})
+                assert respuesta.status_code == 303, f"login de preparación: {respuesta.status_code}"
+
+            def cursor():
+                return codificar_cursor(aleatorio.choice(juegos))
+
+            def termino():
+                return aleatorio.choice(juegos).nombre.split()[0][:4]
+
+            async def catalogo(cliente):
+                return [await cliente.get("/videojuegos", params={"after": cursor()})]
+
+            async def consola(cliente):
+                return [await cliente.get("/playstation", params={"after": cursor()})]
+
+            async def busqueda(cliente):
+                return [await cliente.get("/buscar", params={"nombre": termino()})]
+
+            async def login(cliente):
+                i = clientes.index(cliente)
+                return [await cliente.post("/login", data={"correo": f"bench{i}@test", "contraseña": CONTRASEÑA})]
+
+            async def carrito(cliente):
+                return [await cliente.post("/agregar-carrito", data={"videojuego_id": aleatorio.choice(juegos).id})]
+
+            async def pago(cliente):
+                return [
+                    await cliente.post("/agregar-carrito", data={"videojuego_id": aleatorio.choice(juegos).id}),
+                    await cliente.post("/procesar-pago", data={"metodo_pago": "otras"}),
+                ]
+
+            acciones = {"catalogo": catalogo, "consola": consola, "busqueda": busqueda,
+                        "login": login, "carrito": carrito, "pago": pago}
+            resultados = {}
+            for flujo in flujos:
+                accion = acciones[flujo]
+                tiempos, errores = [], 0
+
+                async def usuario(cliente, n):
+                    nonlocal errores
+                    for _ in range(n):
+                        inicio = time.perf_counter()
+                        respuestas = await accion(cliente)
+                        tiempos.append(time.perf_counter() - inicio)
+                        if any(r.status_code >= 400 for r in respuestas):
+                            errores += 1
+
+                # Calentamiento: llena las cachés como lo haría el tráfico real
+                await asyncio.gather(*(usuario(cliente, 1) for cliente in clientes))
+                tiempos.clear()
+                errores = 0
+
+                por_usuario = max(1, peticiones // concurrencia)
+                inicio = time.perf_counter()
+                await asyncio.gather(*(usuario(cliente, por_usuario) for cliente in clientes))
+                resultados[flujo] = resumen(tiempos, errores, time.perf_counter() - inicio)
+            return resultados
+        finally:
+            for cliente in clientes:
+                await cliente.aclose()
+
+
+def medir_tamaño(tamaño, flujos, peticiones, concurrencia):
+    """Se ejecuta en el proceso hijo: crea la BD, importa la app y recorre los flujos"""
+    # Todos los usuarios virtuales vienen de la misma IP: se mide el login, no el limitador
+    for variable in ("LOGIN_MAX_POR_IP", "LOGIN_MAX_POR_CORREO", "REGISTRO_MAX_POR_IP", "REGISTRO_MAX_POR_CORREO"):
+        os.environ.setdefault(variable, "0")
+    import sqlite3
+    from data import database
+    from services.hash_service import servicio_hash
+    from benchmarks.explain import comprobar, recorridos_sqlite
+    from benchmarks.sqlite_bd import ConexionSQLite, sembrar
+
+    hash_ = servicio_hash.hashear_sync(CONTRASEÑA)
+    usuarios = [(f"Bench {i}", f"bench{i}@test", hash_, 0) for i in range(concurrencia)]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "bench.db")
+        inicio = time.perf_counter()
+        juegos = sembrar(ruta, tamaño, usuarios)
+        segundos_carga = time.perf_counter() - inicio
+        conexion = sqlite3.connect(ruta)
+        try:
+            recorridos = comprobar(recorridos_sqlite, conexion, mostrar=False)
+        finally:
+            conexion.close()
+
+        database.pool.crear_conexion = lambda: ConexionSQLite(ruta)
+        database.pool.tamaño = concurrencia + 4
+        import main as aplicacion
+
+        flujos_resultado = asyncio.run(ejecutar_flujos(aplicacion.app, juegos, flujos, peticiones, concurrencia))
+        database.pool.cerrar()
+    return {"tamaño": tamaño, "segundos_carga": round(segundos_carga, 2), "recorridos_completos": recorridos,
+            "flujos": flujos_resultado}
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamaños", default="1000,10000,100000")
+    parser.add_argument("--flujos", default=",".join(FLUJOS))
+    parser.add_argument("--peticiones", type=int, default=400, help="peticiones medidas por flujo")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--salida", help="archivo JSON (por defecto se escribe en la salida estándar)")
+    parser.add_argument("--permitir-recorridos", action="store_true",
+                        help="no fallar si alguna consulta frecuente recorre una tabla completa")
+    parser.add_argument("--hijo", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    flujos = [flujo for flujo in args.flujos.split(",") if flujo]
+
+    if args.hijo:
+        resultado = medir_tamaño(args.hijo, flujos, args.peticiones, args.concurrencia)
+        print(json.dumps(resultado, ensure_ascii=False))
+        return
+
+    tamaños = []
+    for tamaño in (int(t) for t in args.tamaños.split(",")):
+        print(f"Catálogo de {tamaño} juegos...", file=sys.stderr)
+        proceso = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--hijo", str(tamaño), "--flujos", ",".join(flujos),
+             "--peticiones", str(args.peticiones), "--concurrencia", str(args.concurrencia)],
+            cwd=RAIZ, capture_output=True, text=True, check=True
+        )
+        # La última línea es el JSON; lo anterior son mensajes de la app
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        for flujo, datos in resultado["flujos"].items():
+            print(f"  {flujo:<10} {datos.get('por_segundo', 0):>9.1f} req/s   p50 {datos.get('p50_ms', 0):>8.2f} ms   "
+                  f"p95 {datos.get('p95_ms', 0):>8.2f} ms   p99 {datos.get('p99_ms', 0):>8.2f} ms   "
+                  f"{datos['errores']} errores", file=sys.stderr)
+        for consulta, planes in resultado["recorridos_completos"].items():
+            print(f"  RECORRIDO COMPLETO en {consulta}: {'; '.join(planes)}", file=sys.stderr)
+        tamaños.append(resultado)
+
+    informe = {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "peticiones": args.peticiones,
+        "concurrencia": args.concurrencia,
+        "bcrypt_rondas": int(os.getenv("BCRYPT_ROUNDS", "12")),
+        "resultados": tamaños,
+    }
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        Path(args.salida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    if any(r["recorridos_completos"] for r in tamaños) and not args.permitir_recorridos:
+        print("Hay consultas frecuentes que recorren una tabla completa (python -m benchmarks.explain)",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Caché en memoria con caducidad (TTL) y expulsión LRU al llenarse"""
+
+    def __init__(self, max_entradas=512, ttl=300):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (instante de caducidad, valor)
+        self._lock = threading.Lock()
+        # Aumenta con cada invalidación: una carga que empezó antes no se guarda
+        self.generacion = 0
+
+        # Métricas
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+        self.cargas_descartadas = 0
+
+    def get(self, clave):
+        """Devuelve (encontrado, valor) y marca la entrada como usada recientemente"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                caduca, valor = entrada
+                if caduca > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, valor
+                del self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave, valor, generacion=None):
+        """Guarda el valor; si se pasa la `generacion` en la que empezó a cargarse y
+        desde entonces hubo una invalidación, se descarta (ya puede estar obsoleto)"""
+        with self._lock:
+            if generacion is not None and generacion != self.generacion:
+                self.cargas_descartadas += 1
+                return False
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+            return True
+
+    def obtener(self, clave, cargar):
+        """Valor cacheado o, si no está, el resultado de cargar() (que se guarda)"""
+        encontrado, valor = self.get(clave)
+        if encontrado:
+            return valor
+        generacion = self.generacion
+        valor = cargar()
+        # Los repositorios devuelven [] o None también cuando falla la consulta;
+        # no se guardan para no servir un error durante todo el TTL
+        if valor:
+            self.guardar(clave, valor, generacion)
+        return valor
+
+    def invalidar(self, predicado=None):
+        """Borra todas las entradas, o solo aquellas cuya clave cumpla el predicado"""
+        with self._lock:
+            self.generacion += 1
+            if predicado is None:
+                borradas = len(self._datos)
+                self._datos.clear()
+            else:
+                claves = [clave for clave in self._datos if predicado(clave)]
+                for clave in claves:
+                    del self._datos[clave]
+                borradas = len(claves)
+            self.invalidaciones += borradas
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "invalidaciones": self.invalidaciones,
+                "cargas_descartadas": self.cargas_descartadas,
+            }
@@ -0,0 +1,238 @@
+"""Registro de cambios del catálogo compartido entre workers.
+
+Cada escritura del catálogo publica un Cambio (tipo, juego y consolas) en el
+bus. Los suscriptores de cada worker invalidan solo lo que ese cambio toca:
+las lecturas cacheadas del repositorio, los fragmentos ya renderizados y las
+tarjetas de las páginas abiertas (SSE).
+
+CAMBIOS_TRANSPORTE elige el transporte:
+- "bd" (por defecto): tabla cambios_catalogo. Publicar es un INSERT con la
+  conexión de la escritura; cada worker lee las filas nuevas por clave
+  primaria cada CAMBIOS_INTERVALO_SEG. El id de la fila es la versión del
+  catálogo y es la misma en todos los workers.
+- "local": solo este proceso, para desarrollo con un único worker.
+
+El INSERT va después del commit de la escritura: si el proceso muere entre
+los dos, los demás workers ven el cambio cuando caduca su caché (TTL).
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+
+
+CAMBIOS_TRANSPORTE = os.getenv("CAMBIOS_TRANSPORTE", "bd")
+CAMBIOS_INTERVALO_SEG = float(os.getenv("CAMBIOS_INTERVALO_SEG", "1"))
+# Filas leídas por consulta y cuántos ids por debajo del último se vuelven a
+# leer: con escrituras concurrentes un id menor puede confirmarse más tarde
+CAMBIOS_LOTE = int(os.getenv("CAMBIOS_LOTE", "500"))
+CAMBIOS_SOLAPE = int(os.getenv("CAMBIOS_SOLAPE", "100"))
+# Las filas más antiguas se borran al arrancar cada worker
+CAMBIOS_RETENCION_SEG = int(os.getenv("CAMBIOS_RETENCION_SEG", "86400"))
+
+INSERTAR = "insertar"
+ACTUALIZAR = "actualizar"
+BORRAR = "borrar"
+IMPORTAR = "importar"
+
+
+class Cambio:
+    """Una escritura del catálogo; `videojuego_id` y `consolas` son None si afecta a todo"""
+
+    __slots__ = ("tipo", "videojuego_id", "consolas", "version")
+
+    def __init__(self, tipo, videojuego_id=None, consolas=None, version=None):
+        self.tipo = tipo
+        self.videojuego_id = videojuego_id
+        self.consolas = tuple(consolas) if consolas else None
+        self.version = version
+
+    def a_dict(self):
+        return {
+            "version": self.version,
+            "tipo": self.tipo,
+            "videojuego_id": self.videojuego_id,
+            "consolas": list(self.consolas) if self.consolas else None,
+        }
+
+
+class BusLocal:
+    """Entrega los cambios a los suscriptores de este proceso"""
+
+    def __init__(self):
+        # Último cambio ya aplicado por los suscriptores: una respuesta con esta
+        # versión (ETag de la API) nunca sale de una caché anterior al cambio
+        self.version = 0
+        self._ultimo = 0
+        self._suscriptores = []
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.publicados = 0
+        self.recibidos = 0
+        self.errores = 0
+
+    def suscribir(self, funcion):
+        """`funcion(cambio)` se llama desde el hilo que publica o lee el cambio"""
+        self._suscriptores.append(funcion)
+
+    def _entregar(self, cambio):
+        for funcion in self._suscriptores:
+            try:
+                funcion(cambio)
+            except Exception as e:
+                print(f"Error al aplicar el cambio {cambio.version} del catálogo: {e}")
+        if cambio.version is not None:
+            with self._lock:
+                self.version = max(self.version, cambio.version)
+
+    def publicar(self, db, cambio):
+        with self._lock:
+            self._ultimo += 1
+            cambio.version = self._ultimo
+            self.publicados += 1
+        self._entregar(cambio)
+        return cambio
+
+    def iniciar(self, db):
+        pass
+
+    async def escuchar(self):
+        """Nada que escuchar: todos los cambios salen de este proceso"""
+
+    def purgar(self, db, retencion=CAMBIOS_RETENCION_SEG):
+        return 0
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "publicados": self.publicados,
+                "recibidos": self.recibidos,
+                "errores": self.errores,
+            }
+
+
+class BusBD(BusLocal):
+    """Cambios en la tabla cambios_catalogo, leídos por cada worker en segundo plano"""
+
+    def __init__(self, pool, intervalo=CAMBIOS_INTERVALO_SEG, lote=CAMBIOS_LOTE, solape=CAMBIOS_SOLAPE):
+        super().__init__()
+        self.pool = pool
+        self.intervalo = intervalo
+        self.lote = lote
+        self.solape = solape
+        self._inicio = None  # último id que existía al arrancar: lo anterior ya no afecta a las cachés
+        self._vistos = set()
+        self._orden_vistos = deque()
+
+    def _marcar(self, version):
+        """False si el cambio ya se había aplicado (propio o leído antes)"""
+        if version in self._vistos or version <= self._inicio:
+            return False
+        self._vistos.add(version)
+        self._orden_vistos.append(version)
+        while len(self._orden_vistos) > self.solape + self.lote:
+            self._vistos.discard(self._orden_vistos.popleft())
+        return True
+
+    def publicar(self, db, cambio):
+        consolas = ",".join(cambio.consolas) if cambio.consolas else None
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO cambios_catalogo (tipo, videojuego_id, consolas) VALUES (%s, %s, %s)",
+                (cambio.tipo, cambio.videojuego_id, consolas)
+            )
+            cambio.version = cursor.lastrowid
+            db.commit()
+        except Exception as e:
+            # Este worker lo aplica igual; los demás lo verán al caducar su caché
+            db.rollback()
+            cambio.version = None
+            with self._lock:
+                self.errores += 1
+            print(f"Error al publicar el cambio del catálogo: {e}")
+        finally:
+            cursor.close()
+        with self._lock:
+            if cambio.version is not None and self._inicio is not None:
+                self._marcar(cambio.version)
+            self.publicados += 1
+        self._entregar(cambio)
+        return cambio
+
+    def iniciar(self, db):
+        """Punto de partida de la lectura: se llama antes de calentar las cachés,
+        así un cambio hecho mientras se calientan no se pierde"""
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cambios_catalogo")
+            inicio = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        with self._lock:
+            if self._inicio is None:
+                self._inicio = inicio
+                self.version = max(self.version, inicio)
+
+    def leer(self):
+        """Aplica los cambios nuevos de otros workers; devuelve cuántos"""
+        with self.pool.conexion() as db:
+            if self._inicio is None:
+                self.iniciar(db)
+                return 0
+            cursor = db.cursor()
+            try:
+                cursor.execute(
+                    "SELECT id, tipo, videojuego_id, consolas FROM cambios_catalogo "
+                    "WHERE id > %s ORDER BY id LIMIT %s",
+                    (max(self._inicio, self.version - self.solape), self.lote)
+                )
+                filas = cursor.fetchall()
+            finally:
+                cursor.close()
+
+        nuevos = []
+        with self._lock:
+            for version, tipo, videojuego_id, consolas in filas:
+                if self._marcar(version):
+                    nuevos.append(Cambio(tipo, videojuego_id, consolas.split(",") if consolas else None, version))
+            self.recibidos += len(nuevos)
+        for cambio in nuevos:
+            self._entregar(cambio)
+        return len(nuevos)
+
+    async def escuchar(self):
+        """Lee la tabla cada `intervalo` segundos hasta que se cancela la tarea"""
+        espera = self.intervalo
+        while True:
+            await asyncio.sleep(espera)
+            try:
+                await asyncio.to_thread(self.leer)
+                espera = self.intervalo
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                espera = min(max(espera * 2, 1), 30)
+                print(f"Error al leer los cambios del catálogo: {e}. Reintento en {espera:.0f}s")
+
+    def purgar(self, db, retencion=CAMBIOS_RETENCION_SEG):
+        """Borra los cambios más antiguos que `retencion` segundos"""
+        cursor = db.cursor()
+        try:
+            cursor.execute("DELETE FROM cambios_catalogo WHERE creado < NOW() - INTERVAL %s SECOND", (retencion,))
+            db.commit()
+            return cursor.rowcount
+        except Exception as e:
+            db.rollback()
+            print(f"Error al purgar cambios_catalogo: {e}")
+            return 0
+        finally:
+            cursor.close()
+
+
+def crear_bus(pool, transporte=CAMBIOS_TRANSPORTE):
+    if transporte == "local":
+        return BusLocal()
+    return BusBD(pool)
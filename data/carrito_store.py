@@ -0,0 +1,198 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Backend del carrito: "memoria" (por defecto, un solo worker) o "sql" (varios
+# workers: gunicorn.conf.py lo elige cuando arranca más de uno)
+CARRITO_STORE = os.getenv("CARRITO_STORE", "memoria")
+CARRITO_TTL = float(os.getenv("CARRITO_TTL", str(7 * 24 * 3600)))
+CARRITO_MAX = int(os.getenv("CARRITO_MAX", "100000"))
+# Cada cuánto borra cada worker los carritos caducados de la tabla (backend "sql")
+CARRITO_PURGA_SEG = float(os.getenv("CARRITO_PURGA_SEG", "3600"))
+
+
+class CarritoStore(ABC):
+    """Carritos guardados en el servidor, indexados por el id de carrito de la sesión.
+
+    Solo se guarda {videojuego_id: cantidad}; nombre y precio se consultan al
+    mostrar el carrito, así la cookie de sesión no crece con cada artículo.
+
+    `db` es la conexión que ya tiene la petición, si la tiene: el backend SQL
+    la usa en lugar de pedir otra al pool mientras la petición retiene la suya.
+    """
+
+    @abstractmethod
+    def obtener(self, carrito_id, db=None):
+        """Devuelve {videojuego_id: cantidad}"""
+
+    @abstractmethod
+    def agregar(self, carrito_id, videojuego_id, cantidad=1, db=None):
+        """Suma `cantidad` unidades; devuelve el carrito resultante"""
+
+    @abstractmethod
+    def quitar(self, carrito_id, videojuego_id, db=None):
+        """Quita el artículo; devuelve el carrito resultante"""
+
+    @abstractmethod
+    def vaciar(self, carrito_id, db=None):
+        """Borra el carrito entero"""
+
+    @abstractmethod
+    def purgar(self):
+        """Borra los carritos caducados; devuelve cuántos artículos se borraron"""
+
+
+class CarritoStoreMemoria(CarritoStore):
+    """Carritos en memoria del proceso con caducidad y expulsión LRU"""
+
+    def __init__(self, ttl=CARRITO_TTL, max_carritos=CARRITO_MAX):
+        self.ttl = ttl
+        self.max_carritos = max_carritos
+        self._carritos = OrderedDict()  # carrito_id -> (instante de caducidad, {id: cantidad})
+        self._lock = threading.Lock()
+
+    def _carrito(self, carrito_id, crear=False):
+        entrada = self._carritos.get(carrito_id)
+        if entrada is not None and entrada[0] <= time.monotonic():
+            del self._carritos[carrito_id]
+            entrada = None
+        if entrada is None:
+            if not crear:
+                return None
+            entrada = (0, {})
+        # Cada acceso renueva la caducidad y lo marca como usado recientemente
+        self._carritos[carrito_id] = (time.monotonic() + self.ttl, entrada[1])
+        self._carritos.move_to_end(carrito_id)
+        while len(self._carritos) > self.max_carritos:
+            self._carritos.popitem(last=False)
+        return entrada[1]
+
+    def obtener(self, carrito_id, db=None):
+        with self._lock:
+            return dict(self._carrito(carrito_id) or {})
+
+    def agregar(self, carrito_id, videojuego_id, cantidad=1, db=None):
+        with self._lock:
+            items = self._carrito(carrito_id, crear=True)
+            items[videojuego_id] = items.get(videojuego_id, 0) + cantidad
+            return dict(items)
+
+    def quitar(self, carrito_id, videojuego_id, db=None):
+        with self._lock:
+            items = self._carrito(carrito_id) or {}
+            items.pop(videojuego_id, None)
+            return dict(items)
+
+    def vaciar(self, carrito_id, db=None):
+        with self._lock:
+            self._carritos.pop(carrito_id, None)
+
+    def purgar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            caducados = [carrito_id for carrito_id, (caduca, _) in self._carritos.items() if caduca <= ahora]
+            for carrito_id in caducados:
+                del self._carritos[carrito_id]
+            return len(caducados)
+
+
+class CarritoStoreSQL(CarritoStore):
+    """Carritos en la tabla `carritos`, compartidos entre workers y reinicios.
+
+    Cada escritura renueva la caducidad de todo el carrito (columna `caduca`);
+    leerlo no la renueva, para no escribir en cada página vista. Los caducados
+    dejan de leerse en cuanto caducan y `purgar` los borra de la tabla.
+    """
+
+    def __init__(self, pool, ttl=CARRITO_TTL):
+        self.pool = pool
+        self.ttl = ttl
+
+    @contextmanager
+    def _conexion(self, db):
+        if db is not None:
+            yield db
+        else:
+            with self.pool.conexion() as propia:
+                yield propia
+
+    def obtener(self, carrito_id, db=None):
+        with self._conexion(db) as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute(
+                    """
+                    SELECT videojuego_id, cantidad FROM carritos
+                    WHERE carrito_id = %s AND caduca > CURRENT_TIMESTAMP
+                    """,
+                    (carrito_id,)
+                )
+                return {videojuego_id: cantidad for videojuego_id, cantidad in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+    def agregar(self, carrito_id, videojuego_id, cantidad=1, db=None):
+        with self._conexion(db) as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO carritos (carrito_id, videojuego_id, cantidad)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+                    """,
+                    (carrito_id, videojuego_id, cantidad)
+                )
+                self._renovar(cursor, carrito_id)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Error en CarritoStoreSQL.agregar: {e}")
+            finally:
+                cursor.close()
+        return self.obtener(carrito_id, db)
+
+    def quitar(self, carrito_id, videojuego_id, db=None):
+        self._borrar("DELETE FROM carritos WHERE carrito_id = %s AND videojuego_id = %s",
+                     (carrito_id, videojuego_id), renovar=carrito_id, db=db)
+        return self.obtener(carrito_id, db)
+
+    def vaciar(self, carrito_id, db=None):
+        self._borrar("DELETE FROM carritos WHERE carrito_id = %s", (carrito_id,), db=db)
+
+    def purgar(self):
+        return self._borrar("DELETE FROM carritos WHERE caduca <= CURRENT_TIMESTAMP", ())
+
+    def _renovar(self, cursor, carrito_id):
+        cursor.execute(
+            "UPDATE carritos SET caduca = NOW() + INTERVAL %s SECOND WHERE carrito_id = %s",
+            (int(self.ttl), carrito_id)
+        )
+
+    def _borrar(self, sql, params, renovar=None, db=None):
+        """Ejecuta un DELETE (y renueva el carrito `renovar`); devuelve las filas borradas"""
+        with self._conexion(db) as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute(sql, params)
+                borradas = cursor.rowcount
+                if renovar is not None:
+                    self._renovar(cursor, renovar)
+                db.commit()
+                return borradas
+            except Exception as e:
+                db.rollback()
+                print(f"Error en CarritoStoreSQL: {e}")
+                return 0
+            finally:
+                cursor.close()
+
+
+def crear_carrito_store(pool):
+    if CARRITO_STORE == "sql":
+        return CarritoStoreSQL(pool)
+    return CarritoStoreMemoria()
@@ -1,4 +1,11 @@
-import mysql.connector 
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
 
 
 
@@ -10,14 +17,544 @@ import mysql.connector
 #     user ='root', #USUARIO QUE USAMOS NOSOTROS
 #     password ='root' #CONTRASEÑA CON LA QUE NOS CONECTAMOS
 #     # database='oscar'
-# ) 
-
-database = mysql.connector.connect( # LLAMAMOS AL FUNCION CONNECT PARA CONECTARNOS
-    #host='informatica.iesquevedo.es',
-    host='83.33.148.8',
-    port = 3333,
-    ssl_disabled = True,
-    user ='root', #USUARIO QUE USAMOS NOSOTROS
-    password ='1asir', #CONTRASEÑA CON LA QUE NOS CONECTAMOS
-    database='JeremyEspinoza'
-) 
\ No newline at end of file
+# )
+
+DB_CONFIG = {
+    #"host": 'informatica.iesquevedo.es',
+    "host": os.getenv("DB_HOST", '83.33.148.8'),
+    "port": int(os.getenv("DB_PORT", "3333")),
+    "ssl_disabled": os.getenv("DB_SSL_DISABLED", "1") == "1",
+    "user": os.getenv("DB_USER", 'root'), #USUARIO QUE USAMOS NOSOTROS
+    "password": os.getenv("DB_PASSWORD", '1asir'), #CONTRASEÑA CON LA QUE NOS CONECTAMOS
+    "database": os.getenv("DB_NAME", 'JeremyEspinoza'),
+    # Segundos máximos para abrir la conexión; sin esto un host caído bloquea minutos
+    "connection_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+}
+
+# Intentos al abrir una conexión y espera base entre ellos (crece exponencialmente)
+DB_CONNECT_REINTENTOS = int(os.getenv("DB_CONNECT_REINTENTOS", "3"))
+DB_CONNECT_ESPERA = float(os.getenv("DB_CONNECT_ESPERA", "0.2"))
+# Tras fallar todos los intentos, segundos durante los que se responde 503 sin reintentar
+DB_CAIDA_SEG = float(os.getenv("DB_CAIDA_SEG", "5"))
+
+# Tamaño máximo del pool y segundos que una petición espera por una conexión libre
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Las conexiones que llevan más de estos segundos sin usarse se comprueban con ping
+DB_POOL_PING_SEG = float(os.getenv("DB_POOL_PING_SEG", "30"))
+
+# Réplicas de lectura "host:puerto,host:puerto" (mismo usuario, contraseña y base
+# de datos que el primario). Sin réplicas todo va al primario, como siempre
+DB_REPLICAS = os.getenv("DB_REPLICAS", "")
+# Segundos que espera una lectura por una conexión de réplica antes de ir a otra o al primario
+DB_REPLICA_POOL_TIMEOUT = float(os.getenv("DB_REPLICA_POOL_TIMEOUT", "1"))
+# Una réplica con más retraso que esto deja de recibir lecturas hasta la siguiente comprobación
+DB_REPLICA_RETRASO_MAX_SEG = float(os.getenv("DB_REPLICA_RETRASO_MAX_SEG", "10"))
+DB_REPLICA_COMPROBAR_SEG = float(os.getenv("DB_REPLICA_COMPROBAR_SEG", "5"))
+# Tras una escritura se lee del primario durante estos segundos (leer lo que se acaba
+# de escribir). Nunca menos que el retraso que se tolera a una réplica: hasta
+# entonces puede seguir recibiendo lecturas sin tener la escritura. Por defecto
+# se suma el intervalo de comprobación, en el que el retraso puede crecer sin verse
+DB_LEER_PRIMARIO_SEG = max(
+    float(os.getenv("DB_LEER_PRIMARIO_SEG", str(DB_REPLICA_RETRASO_MAX_SEG + DB_REPLICA_COMPROBAR_SEG))),
+    DB_REPLICA_RETRASO_MAX_SEG,
+)
+
+
+class PoolAgotado(Exception):
+    """No se ha liberado ninguna conexión dentro del tiempo de espera"""
+
+
+class BaseDatosNoDisponible(Exception):
+    """No se ha podido abrir una conexión después de todos los reintentos"""
+
+
+# Errores del cliente de MySQL (CR_*): conexión perdida, servidor que se ha ido,
+# paquetes fuera de orden... Tras uno de ellos la conexión ya no es fiable
+ERRORES_CLIENTE_MYSQL = range(2000, 3000)
+
+
+def conexion_rota(error):
+    """True si `error`, lanzado mientras se usaba una conexión, la deja inservible.
+
+    Los errores de la aplicación (ColaPagosLlena, una validación) y los del
+    servidor (clave duplicada, deadlock) no la estropean: devolver() hace
+    rollback y comprueba que siga conectada antes de volver a prestarla.
+    """
+    if not isinstance(error, Exception):
+        return True  # Interrumpida a mitad de una consulta (cancelación, Ctrl+C)
+    if isinstance(error, (BaseDatosNoDisponible, OSError)):
+        return True
+    return getattr(error, "errno", None) in ERRORES_CLIENTE_MYSQL
+
+
+def crear_conexion_mysql(**cambios):
+    """Abre una conexión nueva con la configuración de la base de datos.
+
+    `cambios` sustituye claves de DB_CONFIG (host y port de una réplica).
+    """
+    # Se importa aquí para que importar la app no cargue el conector
+    import mysql.connector
+    return mysql.connector.connect(**{**DB_CONFIG, **cambios})
+
+
+def conectar_con_reintentos(crear_conexion, reintentos=DB_CONNECT_REINTENTOS, espera=DB_CONNECT_ESPERA):
+    """Llama a crear_conexion con backoff exponencial y jitter entre intentos"""
+    for intento in range(reintentos):
+        try:
+            return crear_conexion()
+        except Exception as e:
+            error = e
+            if intento + 1 < reintentos:
+                time.sleep(espera * 2 ** intento * random.uniform(0.5, 1.5))
+    raise BaseDatosNoDisponible(f"Sin conexión tras {reintentos} intentos: {error}") from error
+
+
+class PoolConexiones:
+    """Pool de conexiones: cada petición toma una conexión y la devuelve al terminar"""
+
+    def __init__(self, crear_conexion=crear_conexion_mysql, tamaño=DB_POOL_SIZE,
+                 timeout=DB_POOL_TIMEOUT, ping_seg=DB_POOL_PING_SEG,
+                 reintentos=DB_CONNECT_REINTENTOS, caida_seg=DB_CAIDA_SEG):
+        self.crear_conexion = crear_conexion
+        self.tamaño = tamaño
+        self.timeout = timeout
+        self.ping_seg = ping_seg
+        self.reintentos = reintentos
+        self.caida_seg = caida_seg
+        self._caida_hasta = 0.0
+        self._libres = []  # (conexion, instante en que se devolvió)
+        self._creadas = 0
+        self._condicion = threading.Condition()
+
+        # Métricas
+        self.en_uso = 0
+        self.esperando = 0
+        self.prestamos = 0
+        self.tiempo_espera_total = 0.0
+        self.tiempo_espera_max = 0.0
+        self.reconexiones = 0
+        self.agotados = 0
+        self.fallos_conexion = 0
+        self.descartadas = 0
+
+    def obtener(self):
+        """Presta una conexión, creando una nueva si el pool aún no está lleno"""
+        inicio = time.perf_counter()
+        limite = inicio + self.timeout
+        with self._condicion:
+            self.esperando += 1
+            try:
+                while not self._libres and self._creadas >= self.tamaño:
+                    restante = limite - time.perf_counter()
+                    if restante <= 0:
+                        self.agotados += 1
+                        raise PoolAgotado(f"Sin conexiones libres tras {self.timeout}s")
+                    self._condicion.wait(restante)
+
+                if self._libres:
+                    conexion, devuelta = self._libres.pop()
+                else:
+                    conexion, devuelta = None, None
+                    self._creadas += 1
+                self.en_uso += 1
+            finally:
+                self.esperando -= 1
+
+            espera = time.perf_counter() - inicio
+            self.prestamos += 1
+            self.tiempo_espera_total += espera
+            self.tiempo_espera_max = max(self.tiempo_espera_max, espera)
+
+        # La conexión (o el ping) se hace fuera del lock para no bloquear al resto
+        try:
+            if conexion is None:
+                conexion = self._conectar()
+            elif time.monotonic() - devuelta > self.ping_seg:
+                conexion = self._comprobar(conexion)
+        except Exception:
+            with self._condicion:
+                self._creadas -= 1
+                self.en_uso -= 1
+                self._condicion.notify()
+            raise
+        return conexion
+
+    def devolver(self, conexion, fallida=False):
+        """Devuelve la conexión al pool cerrando cualquier transacción abierta.
+
+        Se descarta si se rompió mientras se usaba (`fallida`) o si ya no
+        está conectada: como el pool la presta LIFO, volvería a salir enseguida
+        y los repositorios, que se tragan el error, devolverían listas vacías.
+        """
+        if fallida:
+            self._descartar(conexion)
+            return
+        try:
+            # Sin esto la siguiente petición vería la instantánea de la transacción anterior.
+            # El rollback ya va al servidor: solo sin transacción hace falta comprobarla
+            if conexion.in_transaction:
+                conexion.rollback()
+            elif not conexion.is_connected():
+                self._descartar(conexion)
+                return
+        except Exception as e:
+            print(f"Error al devolver conexión: {e}")
+            self._descartar(conexion)
+            return
+
+        with self._condicion:
+            self._libres.append((conexion, time.monotonic()))
+            self.en_uso -= 1
+            self._condicion.notify()
+
+    def _comprobar(self, conexion):
+        """Health check: si la conexión está caída se reemplaza por una nueva"""
+        try:
+            conexion.ping(reconnect=False)
+            return conexion
+        except Exception:
+            self.reconexiones += 1
+            try:
+                conexion.close()
+            except Exception:
+                pass
+            return self._conectar()
+
+    def _conectar(self):
+        """Conexión nueva con reintentos; si la base de datos está caída falla enseguida"""
+        if time.monotonic() < self._caida_hasta:
+            raise BaseDatosNoDisponible("La base de datos no responde")
+        try:
+            conexion = conectar_con_reintentos(self.crear_conexion, self.reintentos)
+        except BaseDatosNoDisponible:
+            self.fallos_conexion += 1
+            self._caida_hasta = time.monotonic() + self.caida_seg
+            raise
+        self._caida_hasta = 0.0
+        return conexion
+
+    def disponible(self):
+        """False mientras dura la espera tras un fallo de conexión"""
+        return time.monotonic() >= self._caida_hasta
+
+    def _descartar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+        with self._condicion:
+            self.descartadas += 1
+            self._creadas -= 1
+            self.en_uso -= 1
+            self._condicion.notify()
+
+    @contextmanager
+    def conexion(self):
+        conexion = self.obtener()
+        try:
+            yield conexion
+        except BaseException as e:
+            self.devolver(conexion, fallida=conexion_rota(e))
+            raise
+        self.devolver(conexion)
+
+    def metricas(self):
+        """Estado actual del pool"""
+        with self._condicion:
+            return {
+                "tamaño": self.tamaño,
+                "creadas": self._creadas,
+                "libres": len(self._libres),
+                "en_uso": self.en_uso,
+                "esperando": self.esperando,
+                "prestamos": self.prestamos,
+                "tiempo_espera_total": self.tiempo_espera_total,
+                "tiempo_espera_max": self.tiempo_espera_max,
+                "reconexiones": self.reconexiones,
+                "agotados": self.agotados,
+                "fallos_conexion": self.fallos_conexion,
+                "descartadas": self.descartadas,
+                "caida": int(not self.disponible()),
+            }
+
+    def reiniciar(self):
+        """Olvida las conexiones heredadas del proceso padre tras un fork.
+
+        No se cierran: el socket es compartido con el padre y cerrarlo desde
+        el hijo cortaría también su conexión. El hijo abre las suyas al pedirlas.
+        """
+        self._condicion = threading.Condition()
+        self._libres = []
+        self._creadas = 0
+        self.en_uso = 0
+        self.esperando = 0
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres"""
+        with self._condicion:
+            libres, self._libres = self._libres, []
+            self._creadas -= len(libres)
+        for conexion, _ in libres:
+            try:
+                conexion.close()
+            except Exception:
+                pass
+
+
+def retraso_replica(conexion):
+    """Segundos que la réplica va por detrás del primario.
+
+    None si el servidor no es una réplica o no deja consultarlo; infinito si la
+    replicación está parada. Si la conexión no responde lanza la excepción.
+    """
+    cursor = conexion.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        # MySQL 8.0.22+ y, si no, la sintaxis antigua (también MariaDB)
+        for sql, columna in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                             ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+            try:
+                cursor.execute(sql)
+                filas = cursor.fetchall()
+            except Exception:
+                continue
+            if not filas:
+                return None
+            columnas = [descripcion[0] for descripcion in cursor.description]
+            if columna not in columnas:
+                continue
+            # Una fila por canal de replicación: cuenta el más retrasado
+            retrasos = [fila[columnas.index(columna)] for fila in filas]
+            return float("inf") if None in retrasos else float(max(retrasos))
+        return None
+    finally:
+        cursor.close()
+
+
+class Replica:
+    """Una réplica de lectura con su propio pool"""
+
+    def __init__(self, nombre, pool):
+        self.nombre = nombre
+        self.pool = pool
+        self.expulsada = False
+        self.retraso = None
+        self.lecturas = 0
+        self.expulsiones = 0
+
+    def disponible(self):
+        """False si la última comprobación falló o si su pool no consigue conectar"""
+        return not self.expulsada and self.pool.disponible()
+
+
+def crear_replicas(direcciones=DB_REPLICAS):
+    """Réplicas de DB_REPLICAS ("host:puerto,host:puerto")"""
+    replicas = []
+    for direccion in filter(None, (d.strip() for d in direcciones.split(","))):
+        host, _, puerto = direccion.partition(":")
+        cambios = {"host": host, "port": int(puerto)} if puerto else {"host": host}
+        replicas.append(Replica(direccion, PoolConexiones(partial(crear_conexion_mysql, **cambios),
+                                                          timeout=DB_REPLICA_POOL_TIMEOUT)))
+    return replicas
+
+
+class SesionBD:
+    """Conexión de una petición: se usa como una conexión del primario.
+
+    Las conexiones se piden la primera vez que hacen falta, así una petición
+    que solo lee el catálogo no ocupa una del primario. Las lecturas que
+    admiten una réplica la piden con `lectura()`.
+    """
+
+    def __init__(self, enrutador, leer_primario=False):
+        self.enrutador = enrutador
+        self.leer_primario = leer_primario
+        self._primario = None
+        self._lectura = None
+        self._replica = None
+
+    @property
+    def con_primario(self):
+        """True si ya tiene su conexión del primario y no esperará al pool por ella"""
+        return self._primario is not None
+
+    @property
+    def primario(self):
+        if self._primario is None:
+            self._primario = self.enrutador.primario.obtener()
+        return self._primario
+
+    def lectura(self):
+        """Conexión para leer el catálogo: una réplica sana o, si no hay, el primario"""
+        if self._lectura is None:
+            prestada = None if self.leer_primario else self.enrutador.prestar_lectura()
+            if prestada is None:
+                self.enrutador.contar_lectura_primario()
+                self._lectura = self.primario
+            else:
+                self._replica, self._lectura = prestada
+        return self._lectura
+
+    def cursor(self, *args, **kwargs):
+        return self.primario.cursor(*args, **kwargs)
+
+    def commit(self):
+        if self._primario is not None:
+            self._primario.commit()
+
+    def rollback(self):
+        if self._primario is not None:
+            self._primario.rollback()
+
+    def cerrar(self, fallida=False):
+        """Devuelve a sus pools las conexiones que se hayan pedido"""
+        if self._replica is not None:
+            self._replica.pool.devolver(self._lectura, fallida)
+        if self._primario is not None:
+            self.enrutador.primario.devolver(self._primario, fallida)
+        self._primario = self._lectura = self._replica = None
+
+
+def conexion_lectura(db):
+    """Conexión para las lecturas del catálogo: la de réplica si `db` es una SesionBD"""
+    lectura = getattr(db, "lectura", None)
+    return lectura() if lectura is not None else db
+
+
+class Enrutador:
+    """Reparte las lecturas del catálogo entre las réplicas; el resto va al primario.
+
+    Se elige la réplica disponible con menos conexiones en uso, empezando cada
+    vez por una distinta para repartir los empates. Una réplica que no conecta
+    se salta mientras su pool la da por caída (DB_CAIDA_SEG); una que no
+    responde o va retrasada más de `retraso_max` se expulsa hasta la siguiente
+    comprobación. Sin réplicas disponibles se lee del primario.
+    """
+
+    def __init__(self, primario, replicas=(), retraso_max=DB_REPLICA_RETRASO_MAX_SEG,
+                 intervalo=DB_REPLICA_COMPROBAR_SEG):
+        self.primario = primario
+        self.replicas = list(replicas)
+        self.retraso_max = retraso_max
+        self.intervalo = intervalo
+        self._turno = itertools.count()
+        self._primario_hasta = 0.0
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.lecturas_primario = 0
+        self.fallos_replica = 0
+
+    def leer_del_primario(self, segundos=DB_LEER_PRIMARIO_SEG):
+        """Todas las lecturas van al primario durante `segundos`.
+
+        Se llama con cada cambio del catálogo: así las cachés que se vacían
+        no se vuelven a llenar desde una réplica que aún no lo tiene.
+        """
+        if self.replicas:
+            with self._lock:
+                self._primario_hasta = max(self._primario_hasta, time.monotonic() + segundos)
+
+    def prestar_lectura(self):
+        """(replica, conexion) de una réplica sana, o None si hay que leer del primario"""
+        if not self.replicas or time.monotonic() < self._primario_hasta:
+            return None
+        inicio = next(self._turno) % len(self.replicas)
+        candidatas = [r for r in self.replicas[inicio:] + self.replicas[:inicio] if r.disponible()]
+        for replica in sorted(candidatas, key=lambda r: r.pool.en_uso):
+            try:
+                conexion = replica.pool.obtener()
+            except (PoolAgotado, BaseDatosNoDisponible) as e:
+                with self._lock:
+                    self.fallos_replica += 1
+                print(f"Réplica {replica.nombre} no disponible: {e}")
+                continue
+            with self._lock:
+                replica.lecturas += 1
+            return replica, conexion
+        return None
+
+    def contar_lectura_primario(self):
+        with self._lock:
+            self.lecturas_primario += 1
+
+    @contextmanager
+    def sesion(self, leer_primario=False):
+        sesion = SesionBD(self, leer_primario)
+        try:
+            yield sesion
+        except BaseException as e:
+            sesion.cerrar(fallida=conexion_rota(e))
+            raise
+        sesion.cerrar()
+
+    def comprobar_replicas(self):
+        """Health check: expulsa las réplicas que no responden o van retrasadas"""
+        for replica in self.replicas:
+            try:
+                with replica.pool.conexion() as conexion:
+                    retraso = retraso_replica(conexion)
+            except PoolAgotado:
+                continue  # Ocupada, no caída: se comprueba en la siguiente vuelta
+            except Exception as e:
+                self._expulsar(replica, None, f"no responde: {e}")
+                continue
+            if retraso is not None and retraso > self.retraso_max:
+                self._expulsar(replica, retraso, f"va {retraso:.0f}s por detrás del primario")
+                continue
+            if replica.expulsada:
+                print(f"Réplica {replica.nombre} readmitida")
+            replica.expulsada = False
+            replica.retraso = retraso
+
+    def _expulsar(self, replica, retraso, motivo):
+        if not replica.expulsada:
+            replica.expulsiones += 1
+            print(f"Réplica {replica.nombre} expulsada: {motivo}")
+        replica.expulsada = True
+        replica.retraso = retraso
+
+    async def vigilar(self):
+        """Comprueba las réplicas cada `intervalo` segundos hasta que se cancela la tarea"""
+        if not self.replicas:
+            return
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await asyncio.to_thread(self.comprobar_replicas)
+
+    def reiniciar(self):
+        """Tras un fork: el primario y cada réplica olvidan las conexiones del padre"""
+        self.primario.reiniciar()
+        for replica in self.replicas:
+            replica.pool.reiniciar()
+
+    def cerrar(self):
+        self.primario.cerrar()
+        for replica in self.replicas:
+            replica.pool.cerrar()
+
+    def metricas(self):
+        with self._lock:
+            valores = {
+                "replicas": len(self.replicas),
+                "disponibles": sum(r.disponible() for r in self.replicas),
+                "lecturas_primario": self.lecturas_primario,
+                "fallos_replica": self.fallos_replica,
+                "leyendo_primario": int(time.monotonic() < self._primario_hasta),
+            }
+            for i, replica in enumerate(self.replicas):
+                valores[f"replica{i}_disponible"] = int(replica.disponible())
+                valores[f"replica{i}_lecturas"] = replica.lecturas
+                valores[f"replica{i}_expulsiones"] = replica.expulsiones
+                valores[f"replica{i}_en_uso"] = replica.pool.en_uso
+                if replica.retraso is not None and replica.retraso != float("inf"):
+                    valores[f"replica{i}_retraso_seg"] = replica.retraso
+            return valores
+
+
+# Las conexiones se abren la primera vez que se piden, no al importar el módulo
+pool = PoolConexiones()
+# Las lecturas del catálogo van a las réplicas de DB_REPLICAS; escrituras y el resto, a `pool`
+enrutador = Enrutador(pool, crear_replicas())
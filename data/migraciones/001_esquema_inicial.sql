@@ -0,0 +1,34 @@
+-- Tablas del catálogo y de usuarios.
+-- IF NOT EXISTS: en la base de datos que ya existía esta migración solo se registra.
+
+CREATE TABLE IF NOT EXISTS consolas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(50) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS videojuegos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    precio DECIMAL(10, 2) NOT NULL,
+    genero VARCHAR(100),
+    valoracion DECIMAL(3, 1)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS videojuego_consola (
+    videojuego_id INT NOT NULL,
+    consola_id INT NOT NULL,
+    PRIMARY KEY (videojuego_id, consola_id),
+    FOREIGN KEY (videojuego_id) REFERENCES videojuegos (id) ON DELETE CASCADE,
+    FOREIGN KEY (consola_id) REFERENCES consolas (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    correo VARCHAR(255) NOT NULL,
+    contraseña VARCHAR(255) NOT NULL,
+    es_admin TINYINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO consolas (id, nombre) VALUES
+    (1, 'PlayStation'), (2, 'Xbox'), (3, 'Switch'), (4, 'Steam');
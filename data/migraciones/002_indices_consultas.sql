@@ -0,0 +1,16 @@
+-- Índices de las consultas más frecuentes.
+
+-- Filtro por consola: WHERE c.nombre = %s
+CREATE UNIQUE INDEX idx_consolas_nombre ON consolas (nombre);
+
+-- Listados de una consola: de consola_id a sus juegos. El sentido contrario
+-- (videojuego_id, consola_id) ya lo cubre la clave primaria
+CREATE INDEX idx_videojuego_consola_consola ON videojuego_consola (consola_id, videojuego_id);
+
+-- Paginación por (nombre, id): InnoDB añade el id a cada índice secundario
+CREATE INDEX idx_videojuegos_nombre ON videojuegos (nombre);
+
+-- Login y registro buscan por correo; además impide correos duplicados.
+-- Si ya hay correos repetidos falla (error 1062) y el migrador lo indica; se
+-- ven con: SELECT correo, COUNT(*) FROM usuarios GROUP BY correo HAVING COUNT(*) > 1
+CREATE UNIQUE INDEX idx_usuarios_correo ON usuarios (correo);
@@ -0,0 +1,9 @@
+-- Carritos del servidor (CARRITO_STORE=sql).
+
+CREATE TABLE IF NOT EXISTS carritos (
+    carrito_id CHAR(32) NOT NULL,
+    videojuego_id INT NOT NULL,
+    cantidad INT NOT NULL DEFAULT 1,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (carrito_id, videojuego_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
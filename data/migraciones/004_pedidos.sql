@@ -0,0 +1,29 @@
+-- Pedidos y sus líneas (precio y nombre copiados en el momento de la compra).
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    -- Clave de idempotencia del formulario de pago: un reintento no crea otro pedido
+    clave_idempotencia VARCHAR(64) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+    metodo_pago VARCHAR(20) NOT NULL,
+    total DECIMAL(10, 2) NOT NULL,
+    referencia_pago VARCHAR(64),
+    error VARCHAR(255),
+    creado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY idx_pedidos_clave (usuario_id, clave_idempotencia),
+    -- Pedidos pendientes que quedaron a medias al reiniciar
+    KEY idx_pedidos_estado (estado, creado),
+    FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS pedido_lineas (
+    pedido_id INT NOT NULL,
+    videojuego_id INT NOT NULL,
+    nombre VARCHAR(255) NOT NULL,
+    precio DECIMAL(10, 2) NOT NULL,
+    cantidad INT NOT NULL,
+    PRIMARY KEY (pedido_id, videojuego_id),
+    FOREIGN KEY (pedido_id) REFERENCES pedidos (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,13 @@
+-- Cambios del catálogo: cada escritura añade una fila y cada worker lee las
+-- nuevas por clave primaria para invalidar sus cachés. El id es la versión.
+
+CREATE TABLE IF NOT EXISTS cambios_catalogo (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(20) NOT NULL,
+    -- NULL si el cambio afecta a todo el catálogo (importación)
+    videojuego_id INT,
+    consolas VARCHAR(255),
+    creado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- Purga de las filas antiguas al arrancar
+    KEY idx_cambios_creado (creado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,8 @@
+-- Worker que tiene el cobro de un pedido pendiente en su cola y último latido
+-- con el que lo renovó. Un pendiente sin latido reciente es de un worker que
+-- ya no existe (su cobro se perdió) y se puede cerrar como fallido.
+-- Dos ALTER en lugar de uno: así también lo aplica el SQLite de los benchmarks.
+
+ALTER TABLE pedidos ADD COLUMN propietario CHAR(32) NULL;
+
+ALTER TABLE pedidos ADD COLUMN latido TIMESTAMP NULL;
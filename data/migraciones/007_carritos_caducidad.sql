@@ -0,0 +1,10 @@
+-- Caducidad de los carritos del servidor: cada escritura la renueva para todo
+-- el carrito, las lecturas ignoran los caducados y CarritoStoreSQL.purgar los
+-- borra. Los carritos que ya existían caducan a los 7 días de su último cambio
+-- (el CARRITO_TTL por defecto).
+
+ALTER TABLE carritos ADD COLUMN caduca TIMESTAMP NULL;
+
+UPDATE carritos SET caduca = actualizado + INTERVAL 7 DAY WHERE caduca IS NULL;
+
+CREATE INDEX idx_carritos_caduca ON carritos (caduca);
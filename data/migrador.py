@@ -0,0 +1,124 @@
+"""Migraciones versionadas del esquema (data/migraciones/NNN_nombre.sql).
+
+Cada archivo se aplica una sola vez y queda registrado en schema_version.
+Los errores de "ya existe" (tabla, índice o columna) se ignoran, así la
+primera ejecución sobre la base de datos que ya estaba en producción
+registra el esquema inicial sin fallar.
+
+    python -m data.migrador            # aplica las pendientes
+    python -m data.migrador --estado   # lista aplicadas y pendientes
+
+La imagen de Docker lo ejecuta antes de arrancar gunicorn: los carritos
+(CARRITO_STORE=sql), los pedidos y el bus de cambios necesitan sus tablas.
+Si varios contenedores arrancan a la vez, un bloqueo con nombre de MySQL
+hace que las migraciones se apliquen de una en una.
+
+En MySQL cada sentencia DDL hace commit implícito: si una migración falla a
+mitad, las sentencias anteriores quedan aplicadas y la versión no se
+registra; al corregirla se puede volver a lanzar.
+"""
+import re
+import sys
+from pathlib import Path
+
+DIRECTORIO_MIGRACIONES = Path(__file__).resolve().parent / "migraciones"
+
+# Códigos de MySQL: la tabla ya existe, el índice ya existe, la columna ya existe
+ERRORES_YA_EXISTE = {1050, 1061, 1060}
+# Entrada duplicada: un índice UNIQUE sobre datos que ya tienen repetidos
+ERROR_DUPLICADO = 1062
+BLOQUEO_MIGRADOR = "schema_version"
+BLOQUEO_ESPERA_SEG = 300
+
+SQL_TABLA_VERSIONES = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def migraciones(directorio=DIRECTORIO_MIGRACIONES):
+    """[(version, nombre, ruta)] ordenadas por versión"""
+    lista = []
+    for ruta in directorio.glob("*.sql"):
+        coincidencia = re.match(r"(\d+)_(.+)\.sql$", ruta.name)
+        if coincidencia:
+            lista.append((int(coincidencia.group(1)), coincidencia.group(2), ruta))
+    return sorted(lista)
+
+
+def sentencias(texto):
+    """Separa un archivo SQL en sentencias (sin comentarios de línea)"""
+    sin_comentarios = "\n".join(linea for linea in texto.splitlines() if not linea.strip().startswith("--"))
+    return [sentencia.strip() for sentencia in sin_comentarios.split(";") if sentencia.strip()]
+
+
+def aplicadas(db):
+    cursor = db.cursor()
+    try:
+        cursor.execute(SQL_TABLA_VERSIONES)
+        cursor.execute("SELECT version FROM schema_version")
+        return {fila[0] for fila in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def aplicar(db, directorio=DIRECTORIO_MIGRACIONES):
+    """Aplica las migraciones pendientes; devuelve las versiones aplicadas"""
+    hechas = aplicadas(db)
+    nuevas = []
+    for version, nombre, ruta in migraciones(directorio):
+        if version in hechas:
+            continue
+        cursor = db.cursor()
+        try:
+            for sentencia in sentencias(ruta.read_text(encoding="utf-8")):
+                try:
+                    cursor.execute(sentencia)
+                except Exception as e:
+                    if getattr(e, "errno", None) == ERROR_DUPLICADO:
+                        raise RuntimeError(
+                            f"no se puede crear un índice único porque hay filas repetidas ({e.msg}). "
+                            f"Elimina o corrige los duplicados y vuelve a ejecutar el migrador"
+                        ) from e
+                    if getattr(e, "errno", None) not in ERRORES_YA_EXISTE:
+                        raise
+                    print(f"  {ruta.name}: ya existía ({e.msg})")
+            cursor.execute("INSERT INTO schema_version (version, nombre) VALUES (%s, %s)", (version, nombre))
+            db.commit()
+            print(f"Aplicada {ruta.name}")
+            nuevas.append(version)
+        except Exception as e:
+            db.rollback()
+            print(f"Error en la migración {ruta.name}: {e}")
+            raise
+        finally:
+            cursor.close()
+    return nuevas
+
+
+def main(argumentos):
+    from data.database import crear_conexion_mysql, conectar_con_reintentos
+
+    db = conectar_con_reintentos(crear_conexion_mysql)
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (BLOQUEO_MIGRADOR, BLOQUEO_ESPERA_SEG))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Otro migrador no ha terminado tras {BLOQUEO_ESPERA_SEG}s")
+        if "--estado" in argumentos:
+            hechas = aplicadas(db)
+            for version, nombre, _ in migraciones():
+                print(f"{version:03d} {nombre:<30} {'aplicada' if version in hechas else 'pendiente'}")
+            return
+        if not aplicar(db):
+            print("El esquema ya está al día")
+    finally:
+        cursor.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,80 @@
+import base64
+import json
+
+
+# Tamaño de página por defecto y máximo permitido en las rutas
+LIMITE_PAGINA = 24
+LIMITE_MAXIMO = 100
+
+
+def codificar_cursor(juego):
+    """Cursor opaco a partir de un Videojuego: (nombre, id)"""
+    texto = json.dumps([juego.nombre, juego.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+class CursorNoValido(Exception):
+    """El cursor de ?after= o ?before= no es uno de los que genera codificar_cursor"""
+
+
+def decodificar_cursor(cursor):
+    """(nombre, id) a partir de un cursor, o None si está vacío; CursorNoValido si no es válido"""
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        nombre, videojuego_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return str(nombre), int(videojuego_id)
+    # OverflowError: un id como 1e400 llega como infinito
+    except (ValueError, TypeError, OverflowError):
+        raise CursorNoValido(f"Cursor de paginación no válido: {cursor[:40]}") from None
+
+
+def recortar(filas, limite=None, despues=None, antes=None):
+    """Aplica un cursor a una lista ya ordenada en memoria (p. ej. por relevancia).
+
+    El cursor se localiza por id, así vale para cualquier orden; devuelve lo
+    mismo que los listados del repositorio para poder usar construir_pagina.
+    """
+    cursor = despues or antes
+    if cursor:
+        posicion = next((i for i, juego in enumerate(filas) if juego.id == cursor[1]), None)
+        if posicion is None:
+            filas = []
+        elif despues:
+            filas = filas[posicion + 1:]
+        else:
+            filas = filas[:posicion]
+    if not limite:
+        return list(filas)
+    return filas[-limite:] if antes else filas[:limite]
+
+
+class Pagina:
+    """Una página de un listado con los cursores para ir a la siguiente y la anterior"""
+
+    def __init__(self, juegos, limite, total, siguiente=None, anterior=None):
+        self.juegos = juegos
+        self.limite = limite
+        self.total = total
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+
+def construir_pagina(filas, limite, despues, antes, total):
+    """Recorta las filas pedidas (limite + 1) y calcula los cursores.
+
+    La fila extra solo sirve para saber si hay más juegos en la dirección en
+    la que se ha paginado.
+    """
+    if antes:
+        hay_mas = len(filas) > limite
+        juegos = filas[1:] if hay_mas else filas
+        anterior = codificar_cursor(juegos[0]) if hay_mas and juegos else None
+        siguiente = codificar_cursor(juegos[-1]) if juegos else None
+    else:
+        hay_mas = len(filas) > limite
+        juegos = filas[:limite]
+        siguiente = codificar_cursor(juegos[-1]) if hay_mas else None
+        anterior = codificar_cursor(juegos[0]) if despues and juegos else None
+    return Pagina(juegos, limite, total, siguiente, anterior)
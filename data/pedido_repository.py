@@ -0,0 +1,167 @@
+from domain.model.pedido import Pedido, LineaPedido, PENDIENTE, FALLIDO
+
+
+class PedidoRepository:
+
+    def get_id_por_clave(self, db, usuario_id, clave):
+        """Id del pedido creado con esa clave de idempotencia, o None"""
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "SELECT id FROM pedidos WHERE usuario_id = %s AND clave_idempotencia = %s",
+                (usuario_id, clave)
+            )
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+        finally:
+            cursor.close()
+
+    def crear_pedido(self, db, usuario_id, clave, metodo_pago, lineas, propietario=None):
+        """Guarda el pedido y sus líneas [LineaPedido] en una sola transacción.
+
+        `propietario` es el worker que encola el cobro (ver renovar_latido).
+        Devuelve (pedido_id, creado). Si ya hay un pedido con esa clave (dos
+        envíos a la vez) devuelve el existente con creado=False.
+        """
+        total = sum(linea.subtotal for linea in lineas)
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                """
+                INSERT INTO pedidos (usuario_id, clave_idempotencia, estado, metodo_pago, total,
+                                     propietario, latido)
+                VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                """,
+                (usuario_id, clave, PENDIENTE, metodo_pago, total, propietario)
+            )
+            pedido_id = cursor.lastrowid
+            cursor.executemany(
+                """
+                INSERT INTO pedido_lineas (pedido_id, videojuego_id, nombre, precio, cantidad)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                [(pedido_id, l.videojuego_id, l.nombre, l.precio, l.cantidad) for l in lineas]
+            )
+            db.commit()
+            return pedido_id, True
+        except Exception as e:
+            db.rollback()
+            # El índice único de la clave decide cuál de dos envíos simultáneos gana
+            existente = self.get_id_por_clave(db, usuario_id, clave)
+            if existente is not None:
+                return existente, False
+            print(f"Error en crear_pedido: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def get_por_id(self, db, pedido_id):
+        """Pedido con sus líneas en una consulta, o None"""
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT p.id, p.usuario_id, p.estado, p.metodo_pago, p.total, p.referencia_pago,
+                       p.error, p.creado, l.videojuego_id, l.nombre, l.precio, l.cantidad
+                FROM pedidos p
+                LEFT JOIN pedido_lineas l ON l.pedido_id = p.id
+                WHERE p.id = %s
+                ORDER BY l.nombre
+                """,
+                (pedido_id,)
+            )
+            filas = cursor.fetchall()
+            if not filas:
+                return None
+            pedido = Pedido(*filas[0][:8])
+            pedido.lineas = [LineaPedido(*fila[8:]) for fila in filas if fila[8] is not None]
+            return pedido
+        finally:
+            cursor.close()
+
+    def get_estado(self, db, pedido_id):
+        """(usuario_id, estado, referencia_pago) para sondear sin leer las líneas"""
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT usuario_id, estado, referencia_pago FROM pedidos WHERE id = %s", (pedido_id,))
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def get_por_usuario(self, db, usuario_id, limite=50):
+        """Últimos pedidos del usuario (sin líneas), del más reciente al más antiguo"""
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT id, usuario_id, estado, metodo_pago, total, referencia_pago, error, creado
+                FROM pedidos
+                WHERE usuario_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+                """,
+                (usuario_id, limite)
+            )
+            return [Pedido(*fila) for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def actualizar_estado(self, db, pedido_id, estado, referencia_pago=None, error=None):
+        """Cierra un pedido pendiente; un pedido ya cerrado no cambia"""
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                """
+                UPDATE pedidos
+                SET estado = %s, referencia_pago = %s, error = %s, actualizado = CURRENT_TIMESTAMP
+                WHERE id = %s AND estado = %s
+                """,
+                (estado, referencia_pago, error, pedido_id, PENDIENTE)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error en actualizar_estado: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def renovar_latido(self, db, propietario):
+        """El worker `propietario` sigue vivo con estos pedidos pendientes en su cola"""
+        cursor = db.cursor()
+        try:
+            cursor.execute(
+                "UPDATE pedidos SET latido = CURRENT_TIMESTAMP WHERE estado = %s AND propietario = %s",
+                (PENDIENTE, propietario)
+            )
+            db.commit()
+            return cursor.rowcount
+        except Exception as e:
+            db.rollback()
+            print(f"Error en renovar_latido: {e}")
+            return 0
+        finally:
+            cursor.close()
+
+    def cerrar_interrumpidos(self, db, segundos):
+        """Marca como fallidos los pendientes sin latido en `segundos`: el worker que
+        tenía su cobro en la cola ya no existe. Los de workers vivos no se tocan"""
+        cursor = db.cursor()
+        try:
+            # Sin latido: pedidos de antes de la migración 006
+            cursor.execute(
+                """
+                UPDATE pedidos
+                SET estado = %s, error = %s, actualizado = CURRENT_TIMESTAMP
+                WHERE estado = %s AND COALESCE(latido, creado) < NOW() - INTERVAL %s SECOND
+                """,
+                (FALLIDO, "Pago interrumpido", PENDIENTE, int(segundos))
+            )
+            db.commit()
+            return cursor.rowcount
+        except Exception as e:
+            db.rollback()
+            print(f"Error en cerrar_interrumpidos: {e}")
+            return 0
+        finally:
+            cursor.close()
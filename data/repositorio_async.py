@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data.database import DB_POOL_SIZE, SesionBD
+from services.metricas import metricas
+
+
+# Hilos dedicados a consultas; por defecto uno por conexión del pool
+DB_THREADS = int(os.getenv("DB_THREADS", str(DB_POOL_SIZE)))
+
+executor_bd = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="bd")
+# Llamadas cuya sesión aún tiene que pedir su conexión al pool. Si esperasen en
+# executor_bd ocuparían los hilos que necesitan las peticiones que ya tienen
+# conexión para terminar y devolverla, y con una ráfaga el pool se agotaría
+executor_espera = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="bd-espera")
+
+
+def _sin_conexion(args, kwargs):
+    """True si la llamada recibe una SesionBD que aún no tiene conexión del primario"""
+    db = kwargs.get("db", args[0] if args else None)
+    return isinstance(db, SesionBD) and not db.con_primario
+
+
+class RepositorioAsync:
+    """Envuelve un repositorio síncrono para poder usar sus métodos con await.
+
+    Cada llamada se ejecuta en un pool de hilos acotado, así una consulta lenta
+    no bloquea el event loop y el worker sigue atendiendo otras peticiones.
+    """
+
+    def __init__(self, repositorio, executor=executor_bd, registro=metricas, executor_espera=executor_espera):
+        self._repositorio = repositorio
+        self._executor = executor
+        self._executor_espera = executor_espera
+        self._registro = registro
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._repositorio, nombre)
+        if nombre.startswith("_") or not callable(metodo):
+            return metodo
+
+        repositorio = type(self._repositorio).__name__
+
+        def medida(*args, **kwargs):
+            # Se mide dentro del hilo: sin la espera en la cola del executor
+            inicio = time.perf_counter()
+            resultado = metodo(*args, **kwargs)
+            self._registro.observar_consulta(repositorio, nombre, time.perf_counter() - inicio, resultado)
+            return resultado
+
+        @functools.wraps(metodo)
+        async def llamada(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            executor = self._executor_espera if _sin_conexion(args, kwargs) else self._executor
+            return await loop.run_in_executor(
+                executor, functools.partial(medida, *args, **kwargs)
+            )
+
+        # Se guarda para no crear la corrutina envoltorio en cada acceso
+        setattr(self, nombre, llamada)
+        return llamada
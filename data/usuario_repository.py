@@ -1,16 +1,18 @@
-import bcrypt
 from domain.model.usuario import Usuario
+from services.hash_service import servicio_hash
 
 class UsuarioRepository:
+
+    def __init__(self, servicio=servicio_hash):
+        self.servicio_hash = servicio
     
     def _hashear_contraseña(self, contraseña):
         """Cifra la contraseña con bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(contraseña.encode(), salt).decode()
+        return self.servicio_hash.hashear_sync(contraseña)
     
     def _verificar_contraseña(self, contraseña, hash_guardado):
         """Verifica si la contraseña coincide con el hash"""
-        return bcrypt.checkpw(contraseña.encode(), hash_guardado.encode())
+        return self.servicio_hash.verificar_sync(contraseña, hash_guardado)
     
     def get_all(self, db):
         cursor = db.cursor(dictionary=True)
@@ -26,9 +28,11 @@ class UsuarioRepository:
         cursor.close()
         return usuario
     
-    def insertar_usuario(self, db, usuario: Usuario):
+    def insertar_usuario(self, db, usuario: Usuario, contraseña_cifrada=None):
+        """Inserta un usuario; si no se pasa el hash ya calculado se cifra aquí"""
         cursor = db.cursor()
-        contraseña_cifrada = self._hashear_contraseña(usuario.contraseña)
+        if contraseña_cifrada is None:
+            contraseña_cifrada = self._hashear_contraseña(usuario.contraseña)
         cursor.execute(
             "INSERT INTO usuarios (nombre, correo, contraseña) VALUES (%s, %s, %s)",
             (usuario.nombre, usuario.correo, contraseña_cifrada)
@@ -36,6 +40,16 @@ class UsuarioRepository:
         db.commit()
         cursor.close()
     
+    def actualizar_contraseña(self, db, usuario_id, contraseña_cifrada):
+        """Sustituye el hash guardado (rehash al cambiar el factor de trabajo)"""
+        cursor = db.cursor()
+        cursor.execute(
+            "UPDATE usuarios SET contraseña = %s WHERE id = %s",
+            (contraseña_cifrada, usuario_id)
+        )
+        db.commit()
+        cursor.close()
+    
     def verificar_credenciales(self, db, correo, contraseña):
         cursor = db.cursor(dictionary=True)
         cursor.execute(
@@ -46,5 +60,7 @@ class UsuarioRepository:
         cursor.close()
         
         if usuario and self._verificar_contraseña(contraseña, usuario["contraseña"]):
+            if self.servicio_hash.necesita_rehash(usuario["contraseña"]):
+                self.actualizar_contraseña(db, usuario["id"], self._hashear_contraseña(contraseña))
             return usuario
         return None
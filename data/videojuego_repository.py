@@ -1,20 +1,102 @@
+from data.database import conexion_lectura
+from domain.model.videojuego import Videojuego
+
+
 class VideojuegoRepository:
-    
-    def get_all(self, db):
-        """Obtiene todos los videojuegos"""
+
+    # La tabla consolas prácticamente no cambia: su mapa nombre -> id se carga una vez
+    _mapa_consolas = None
+
+    def _get_mapa_consolas(self, cursor, consolas=()):
+        """Mapa nombre -> id de consolas; se recarga si falta alguna de las pedidas"""
+        mapa = VideojuegoRepository._mapa_consolas
+        if mapa is None or any(consola not in mapa for consola in consolas):
+            cursor.execute("SELECT id, nombre FROM consolas")
+            mapa = {nombre: consola_id for consola_id, nombre in cursor.fetchall()}
+            VideojuegoRepository._mapa_consolas = mapa
+        return mapa
+
+    def _nombres_consolas(self, cursor, consola_ids):
+        """Mapa id -> nombre de consolas; se recarga si falta alguno de los ids"""
+        mapa = self._get_mapa_consolas(cursor)
+        nombres = {consola_id: nombre for nombre, consola_id in mapa.items()}
+        if any(consola_id not in nombres for consola_id in consola_ids):
+            VideojuegoRepository._mapa_consolas = None
+            nombres = {consola_id: nombre for nombre, consola_id in self._get_mapa_consolas(cursor).items()}
+        return nombres
+
+    def _con_consolas(self, cursor, sql, params, orden="p.nombre, p.id"):
+        """Videojuegos que devuelve `sql` (columnas de videojuegos v) con sus consolas.
+
+        La tabla de enlace se une a los juegos ya elegidos por `sql`, así todo
+        sale en una consulta: una fila por juego y consola, seguidas por el
+        orden, que aquí se agrupan en un solo Videojuego.
+        """
+        cursor.execute(f"""
+            SELECT p.id, p.nombre, p.precio, p.genero, p.valoracion, vc.consola_id
+            FROM ({sql}) p
+            LEFT JOIN videojuego_consola vc ON vc.videojuego_id = p.id
+            ORDER BY {orden}, vc.consola_id
+        """, params)
+        filas = cursor.fetchall()
+        nombres = self._nombres_consolas(cursor, {fila[5] for fila in filas if fila[5] is not None})
+        juegos = []
+        for videojuego_id, nombre, precio, genero, valoracion, consola_id in filas:
+            if not juegos or juegos[-1].id != videojuego_id:
+                juegos.append(Videojuego(videojuego_id, nombre, precio, genero, valoracion))
+            if consola_id in nombres:
+                juegos[-1].consolas.append(nombres[consola_id])
+        return juegos
+
+    def _enlazar_consolas(self, cursor, enlaces):
+        """Inserta todas las filas (videojuego_id, nombre_consola) con un solo executemany"""
+        mapa = self._get_mapa_consolas(cursor, {consola for _, consola in enlaces})
+        filas = [(videojuego_id, mapa[consola]) for videojuego_id, consola in enlaces if consola in mapa]
+        if filas:
+            sql_relacion = """
+                INSERT INTO videojuego_consola (videojuego_id, consola_id)
+                VALUES (%s, %s)
+            """
+            cursor.executemany(sql_relacion, filas)
+
+    def _filtro_keyset(self, despues=None, antes=None):
+        """Condición y orden para paginar por (nombre, id) sin OFFSET.
+
+        El primer término (nombre >= / <=) es un rango sobre idx_videojuegos_nombre:
+        con solo el OR el optimizador no puede usar el índice y recorre la tabla.
+        """
+        if despues:
+            return ("v.nombre >= %s AND (v.nombre > %s OR v.id > %s)",
+                    [despues[0], despues[0], despues[1]], "v.nombre, v.id")
+        if antes:
+            # Hacia atrás se recorre en orden inverso y luego se da la vuelta
+            return ("v.nombre <= %s AND (v.nombre < %s OR v.id < %s)",
+                    [antes[0], antes[0], antes[1]], "v.nombre DESC, v.id DESC")
+        return "1=1", [], "v.nombre, v.id"
+
+    def _paginar(self, cursor, sql, params, orden, limite, antes):
+        sql += f" ORDER BY {orden}"
+        if limite:
+            sql += " LIMIT %s"
+            params = params + [limite]
+        juegos = self._con_consolas(cursor, sql, params, orden.replace("v.", "p."))
+        if antes:
+            juegos.reverse()
+        return juegos
+
+    def get_all(self, db, limite=None, despues=None, antes=None):
+        """Obtiene todos los videojuegos (o una página si se indica límite)"""
+        cursor = conexion_lectura(db).cursor()
         try:
-            cursor = db.cursor()
-            sql = """
-                SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion,
-                       GROUP_CONCAT(c.nombre) as consolas
+            condicion, params, orden = self._filtro_keyset(despues, antes)
+            # Primero la página de juegos (recorriendo el índice de nombre) y
+            # después sus consolas; unirlas antes obligaría a leer toda la tabla
+            sql = f"""
+                SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion
                 FROM videojuegos v
-                LEFT JOIN videojuego_consola vc ON v.id = vc.videojuego_id
-                LEFT JOIN consolas c ON vc.consola_id = c.id
-                GROUP BY v.id, v.nombre, v.precio, v.genero, v.valoracion
+                WHERE {condicion}
             """
-            cursor.execute(sql)
-            juegos = cursor.fetchall()
-            return juegos
+            return self._paginar(cursor, sql, params, orden, limite, antes)
         except Exception as e:
             print(f"Error en get_all: {e}")
             return []
@@ -22,21 +104,25 @@ class VideojuegoRepository:
             cursor.close()
 
     
-    def get_por_consola(self, db, nombre_consola):
+    def get_por_consola(self, db, nombre_consola, limite=None, despues=None, antes=None):
         """Obtiene videojuegos por consola específica"""
+        cursor = conexion_lectura(db).cursor()
         try:
-            cursor = db.cursor()
-            sql = """
+            consola_id = self._get_mapa_consolas(cursor, [nombre_consola]).get(nombre_consola)
+            if consola_id is None:
+                return []
+            condicion, params, orden = self._filtro_keyset(despues, antes)
+            # Se recorre videojuegos en orden de nombre y se comprueba la consola
+            # por clave primaria: para en cuanto completa la página
+            sql = f"""
                 SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion
                 FROM videojuegos v
-                INNER JOIN videojuego_consola vc ON v.id = vc.videojuego_id
-                INNER JOIN consolas c ON vc.consola_id = c.id
-                WHERE c.nombre = %s
-                ORDER BY v.nombre
+                WHERE {condicion} AND EXISTS (
+                    SELECT 1 FROM videojuego_consola vc
+                    WHERE vc.videojuego_id = v.id AND vc.consola_id = %s
+                )
             """
-            cursor.execute(sql, (nombre_consola,))
-            juegos = cursor.fetchall()
-            return juegos
+            return self._paginar(cursor, sql, params + [consola_id], orden, limite, antes)
         except Exception as e:
             print(f"Error en get_por_consola: {e}")
             return []
@@ -44,25 +130,73 @@ class VideojuegoRepository:
             cursor.close()
 
     
+    def contar(self, db, consola=None, nombre="", genero=""):
+        """Número de videojuegos de un listado (para mostrar el total paginado)"""
+        cursor = conexion_lectura(db).cursor()
+        try:
+            if consola:
+                sql = """
+                    SELECT COUNT(*)
+                    FROM videojuego_consola vc
+                    INNER JOIN consolas c ON vc.consola_id = c.id
+                    WHERE c.nombre = %s
+                """
+                params = [consola]
+            else:
+                sql = "SELECT COUNT(*) FROM videojuegos v WHERE 1=1"
+                params = []
+                if nombre:
+                    sql += " AND v.nombre LIKE %s"
+                    params.append(f"%{nombre}%")
+                if genero:
+                    sql += " AND v.genero = %s"
+                    params.append(genero)
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Error en contar: {e}")
+            return 0
+        finally:
+            cursor.close()
+
+    
     def get_por_id(self, db, videojuego_id):
         """Obtiene un videojuego por ID"""
+        cursor = conexion_lectura(db).cursor()
         try:
-            cursor = db.cursor()
-            sql = "SELECT id, nombre, precio, genero, valoracion FROM videojuegos WHERE id = %s"
-            cursor.execute(sql, (videojuego_id,))
-            juego = cursor.fetchone()
-            return juego
+            sql = "SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion FROM videojuegos v WHERE v.id = %s"
+            juegos = self._con_consolas(cursor, sql, [videojuego_id], "p.id")
+            return juegos[0] if juegos else None
         except Exception as e:
             print(f"Error en get_por_id: {e}")
             return None
         finally:
             cursor.close()
 
+    def get_por_ids(self, db, videojuego_ids):
+        """Videojuegos con esos ids (los que existan), ordenados por id"""
+        if not videojuego_ids:
+            return []
+        cursor = conexion_lectura(db).cursor()
+        try:
+            marcadores = ", ".join(["%s"] * len(videojuego_ids))
+            sql = f"""
+                SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion
+                FROM videojuegos v
+                WHERE v.id IN ({marcadores})
+            """
+            return self._con_consolas(cursor, sql, list(videojuego_ids), "p.id")
+        except Exception as e:
+            print(f"Error en get_por_ids: {e}")
+            return []
+        finally:
+            cursor.close()
+
     
     def insertar_videojuego(self, db, videojuego, consola):
-        """Inserta un nuevo videojuego"""
+        """Inserta un nuevo videojuego; devuelve su id (None si falla)"""
+        cursor = db.cursor()
         try:
-            cursor = db.cursor()
             
             # Insertar el videojuego
             sql = """
@@ -75,33 +209,23 @@ class VideojuegoRepository:
             # Obtener el ID del videojuego insertado
             videojuego_id = cursor.lastrowid
             
-            # Obtener el ID de la consola
-            sql_consola = "SELECT id FROM consolas WHERE nombre = %s"
-            cursor.execute(sql_consola, (consola,))
-            resultado = cursor.fetchone()
-            
-            if resultado:
-                consola_id = resultado[0]
-                
-                # Insertar en la tabla videojuego_consola
-                sql_relacion = """
-                    INSERT INTO videojuego_consola (videojuego_id, consola_id)
-                    VALUES (%s, %s)
-                """
-                cursor.execute(sql_relacion, (videojuego_id, consola_id))
+            # Relacionarlo con su consola
+            self._enlazar_consolas(cursor, [(videojuego_id, consola)])
             
             db.commit()
+            return videojuego_id
         except Exception as e:
             db.rollback()
             print(f"Error en insertar_videojuego: {e}")
+            return None
         finally:
             cursor.close()
 
     
     def insertar_videojuego_multiples_consolas(self, db, videojuego, consolas):
-        """Inserta un nuevo videojuego con múltiples consolas"""
+        """Inserta un nuevo videojuego con múltiples consolas; devuelve su id (None si falla)"""
+        cursor = db.cursor()
         try:
-            cursor = db.cursor()
             
             # Insertar el videojuego
             sql = """
@@ -114,34 +238,58 @@ class VideojuegoRepository:
             # Obtener el ID del videojuego insertado
             videojuego_id = cursor.lastrowid
             
-            # Insertar en la tabla videojuego_consola para cada consola
-            for consola in consolas:
-                sql_consola = "SELECT id FROM consolas WHERE nombre = %s"
-                cursor.execute(sql_consola, (consola,))
-                resultado = cursor.fetchone()
-                
-                if resultado:
-                    consola_id = resultado[0]
-                    
-                    # Insertar en la tabla videojuego_consola
-                    sql_relacion = """
-                        INSERT INTO videojuego_consola (videojuego_id, consola_id)
-                        VALUES (%s, %s)
-                    """
-                    cursor.execute(sql_relacion, (videojuego_id, consola_id))
+            # Insertar en la tabla videojuego_consola todas las consolas a la vez
+            self._enlazar_consolas(cursor, [(videojuego_id, consola) for consola in consolas])
             
             db.commit()
+            return videojuego_id
         except Exception as e:
             db.rollback()
             print(f"Error en insertar_videojuego_multiples_consolas: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    
+    def importar_videojuegos(self, db, juegos, tamaño_lote=500):
+        """Importa muchos videojuegos [(Videojuego, [consolas]), ...] por lotes.
+
+        Cada lote es una sola transacción y sus relaciones con consolas se
+        escriben con un único executemany. Devuelve cuántos juegos se guardaron;
+        si un lote falla se deshace y se detiene la importación.
+        """
+        importados = 0
+        cursor = db.cursor()
+        try:
+            sql = """
+                INSERT INTO videojuegos (nombre, precio, genero, valoracion)
+                VALUES (%s, %s, %s, %s)
+            """
+            for inicio in range(0, len(juegos), tamaño_lote):
+                lote = juegos[inicio:inicio + tamaño_lote]
+                enlaces = []
+                try:
+                    for videojuego, consolas in lote:
+                        cursor.execute(sql, (videojuego.nombre, videojuego.precio,
+                                             videojuego.genero, videojuego.valoracion))
+                        videojuego_id = cursor.lastrowid
+                        enlaces.extend((videojuego_id, consola) for consola in consolas)
+                    self._enlazar_consolas(cursor, enlaces)
+                    db.commit()
+                    importados += len(lote)
+                except Exception as e:
+                    db.rollback()
+                    print(f"Error en importar_videojuegos (lote desde la fila {inicio + 1}): {e}")
+                    break
         finally:
             cursor.close()
+        return importados
 
     
     def borrar_videojuego(self, db, videojuego_id):
-        """Borra un videojuego"""
+        """Borra un videojuego; True si se guardó"""
+        cursor = db.cursor()
         try:
-            cursor = db.cursor()
             
             # Borrar las relaciones
             sql_relaciones = "DELETE FROM videojuego_consola WHERE videojuego_id = %s"
@@ -152,17 +300,19 @@ class VideojuegoRepository:
             cursor.execute(sql, (videojuego_id,))
             
             db.commit()
+            return True
         except Exception as e:
             db.rollback()
             print(f"Error en borrar_videojuego: {e}")
+            return False
         finally:
             cursor.close()
 
     
     def actualizar_videojuego(self, db, videojuego):
-        """Actualiza un videojuego"""
+        """Actualiza un videojuego; True si se guardó"""
+        cursor = db.cursor()
         try:
-            cursor = db.cursor()
             sql = """
                 UPDATE videojuegos 
                 SET nombre = %s, precio = %s, genero = %s, valoracion = %s
@@ -171,32 +321,31 @@ class VideojuegoRepository:
             cursor.execute(sql, (videojuego.nombre, videojuego.precio, 
                                 videojuego.genero, videojuego.valoracion, videojuego.id))
             db.commit()
+            return True
         except Exception as e:
             db.rollback()
             print(f"Error en actualizar_videojuego: {e}")
+            return False
         finally:
             cursor.close()
 
     
-    def buscar_videojuegos(self, db, nombre="", genero=""):
+    def buscar_videojuegos(self, db, nombre="", genero="", limite=None, despues=None, antes=None):
         """Busca videojuegos por nombre y/o género"""
+        cursor = conexion_lectura(db).cursor()
         try:
-            cursor = db.cursor()
-            sql = "SELECT id, nombre, precio, genero, valoracion FROM videojuegos WHERE 1=1"
-            params = []
+            condicion, params, orden = self._filtro_keyset(despues, antes)
+            sql = f"SELECT v.id, v.nombre, v.precio, v.genero, v.valoracion FROM videojuegos v WHERE {condicion}"
             
             if nombre:
-                sql += " AND nombre LIKE %s"
+                sql += " AND v.nombre LIKE %s"
                 params.append(f"%{nombre}%")
             
             if genero:
-                sql += " AND genero = %s"
+                sql += " AND v.genero = %s"
                 params.append(genero)
             
-            sql += " ORDER BY nombre"
-            cursor.execute(sql, params)
-            juegos = cursor.fetchall()
-            return juegos
+            return self._paginar(cursor, sql, params, orden, limite, antes)
         except Exception as e:
             print(f"Error en buscar_videojuegos: {e}")
             return []
@@ -205,8 +354,8 @@ class VideojuegoRepository:
     
     def get_consolas_por_videojuego(self, db, videojuego_id):
         """Obtiene las consolas de un videojuego específico"""
+        cursor = conexion_lectura(db).cursor()
         try:
-            cursor = db.cursor()
             sql = """
                 SELECT c.nombre
                 FROM consolas c
@@ -224,32 +373,22 @@ class VideojuegoRepository:
 
     
     def actualizar_consolas_videojuego(self, db, videojuego_id, nuevas_consolas):
-        """Actualiza las consolas de un videojuego"""
+        """Actualiza las consolas de un videojuego; True si se guardó"""
+        cursor = db.cursor()
         try:
-            cursor = db.cursor()
             
             # Borrar las consolas actuales
             sql_delete = "DELETE FROM videojuego_consola WHERE videojuego_id = %s"
             cursor.execute(sql_delete, (videojuego_id,))
             
             # Insertar las nuevas consolas
-            for consola in nuevas_consolas:
-                sql_consola = "SELECT id FROM consolas WHERE nombre = %s"
-                cursor.execute(sql_consola, (consola,))
-                resultado = cursor.fetchone()
-                
-                if resultado:
-                    consola_id = resultado[0]
-                    
-                    sql_insert = """
-                        INSERT INTO videojuego_consola (videojuego_id, consola_id)
-                        VALUES (%s, %s)
-                    """
-                    cursor.execute(sql_insert, (videojuego_id, consola_id))
+            self._enlazar_consolas(cursor, [(videojuego_id, consola) for consola in nuevas_consolas])
             
             db.commit()
+            return True
         except Exception as e:
             db.rollback()
             print(f"Error en actualizar_consolas_videojuego: {e}")
+            return False
         finally:
             cursor.close()
\ No newline at end of file
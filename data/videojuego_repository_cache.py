@@ -0,0 +1,167 @@
+import os
+import threading
+
+from data.cache import CacheLRU
+from data.cambios_catalogo import BusLocal, Cambio, INSERTAR, ACTUALIZAR, BORRAR, IMPORTAR
+from data.paginacion import recortar
+from data.videojuego_repository import VideojuegoRepository
+from services.buscador import IndiceBusqueda
+
+
+CATALOGO_CACHE_TTL = float(os.getenv("CATALOGO_CACHE_TTL", "300"))
+CATALOGO_CACHE_MAX = int(os.getenv("CATALOGO_CACHE_MAX", "512"))
+
+# Claves cuyo contenido es una lista de juegos (afectadas por cualquier escritura)
+LISTADOS = ("todos", "buscar", "contar")
+
+
+class VideojuegoRepositoryCache(VideojuegoRepository):
+    """VideojuegoRepository con caché de lecturas e invalidación en cada escritura.
+
+    Las lecturas se guardan por clave (listado completo, consola, id, búsqueda).
+    Los métodos de escritura llaman al repositorio y publican el cambio en el
+    bus; cada worker (también este) lo recibe, invalida las claves afectadas e
+    incrementa `version`, que identifica el estado del catálogo en el worker.
+
+    Las búsquedas no usan LIKE: se resuelven con un índice en memoria que se
+    reconstruye la primera vez que se busca después de un cambio de versión.
+    """
+
+    def __init__(self, cache=None, bus=None):
+        self.cache = cache or CacheLRU(max_entradas=CATALOGO_CACHE_MAX, ttl=CATALOGO_CACHE_TTL)
+        self.version = 0
+        self.indice = None
+        self._lock = threading.Lock()
+        self._lock_indice = threading.Lock()
+        self.bus = bus or BusLocal()
+        self.bus.suscribir(self.aplicar_cambio)
+
+    def _invalidar(self, consolas=None, videojuego_id=None):
+        """Invalida los listados, las consolas indicadas (o todas) y el juego indicado"""
+        def afectada(clave):
+            tipo = clave[0]
+            if tipo in LISTADOS:
+                return True
+            if tipo == "consola":
+                return consolas is None or clave[1] in consolas
+            if tipo in ("id", "consolas_de"):
+                return videojuego_id is None or clave[1] == videojuego_id
+            return False
+
+        self.cache.invalidar(afectada)
+        with self._lock:
+            self.version += 1
+
+    def aplicar_cambio(self, cambio):
+        """Suscriptor del bus: escrituras de este worker y de los demás"""
+        self._invalidar(consolas=cambio.consolas, videojuego_id=cambio.videojuego_id)
+
+    # ===== LECTURAS =====
+
+    def get_all(self, db, limite=None, despues=None, antes=None):
+        cargar = super().get_all
+        return self.cache.obtener(("todos", limite, despues, antes),
+                                  lambda: cargar(db, limite, despues, antes))
+
+    def get_por_consola(self, db, nombre_consola, limite=None, despues=None, antes=None):
+        cargar = super().get_por_consola
+        return self.cache.obtener(("consola", nombre_consola, limite, despues, antes),
+                                  lambda: cargar(db, nombre_consola, limite, despues, antes))
+
+    def contar(self, db, consola=None, nombre="", genero=""):
+        if not consola and (nombre or genero):
+            return len(self._resultados_busqueda(db, nombre, genero))
+        cargar = super().contar
+        return self.cache.obtener(("contar", consola, nombre, genero),
+                                  lambda: cargar(db, consola, nombre, genero))
+
+    def get_por_id(self, db, videojuego_id):
+        cargar = super().get_por_id
+        return self.cache.obtener(("id", videojuego_id), lambda: cargar(db, videojuego_id))
+
+    def get_por_ids(self, db, videojuego_ids):
+        """Los que ya estén en caché por id; el resto se carga en una sola consulta"""
+        juegos, faltan = [], []
+        for videojuego_id in videojuego_ids:
+            encontrado, juego = self.cache.get(("id", videojuego_id))
+            if encontrado:
+                juegos.append(juego)
+            else:
+                faltan.append(videojuego_id)
+        generacion = self.cache.generacion
+        for juego in super().get_por_ids(db, faltan):
+            self.cache.guardar(("id", juego.id), juego, generacion)
+            juegos.append(juego)
+        return sorted(juegos, key=lambda juego: juego.id)
+
+    def _indice(self, db):
+        """Índice de búsqueda de la versión actual del catálogo"""
+        with self._lock_indice:
+            version = self.version
+            if self.indice is None or self.indice.version != version:
+                juegos = self.get_all(db)
+                if not juegos:
+                    # Catálogo vacío o error de BD: no se guarda, se reintenta en la siguiente
+                    return IndiceBusqueda([], version)
+                self.indice = IndiceBusqueda(juegos, version)
+            return self.indice
+
+    def _resultados_busqueda(self, db, nombre, genero):
+        return self.cache.obtener(("buscar", nombre, genero),
+                                  lambda: self._indice(db).buscar(nombre, genero))
+
+    def buscar_videojuegos(self, db, nombre="", genero="", limite=None, despues=None, antes=None):
+        """Busca por prefijo, sin distinguir tildes ni mayúsculas, ordenado por relevancia"""
+        return recortar(self._resultados_busqueda(db, nombre, genero), limite, despues, antes)
+
+    def generos(self, db):
+        return self._indice(db).generos()
+
+    def sugerencias(self, db, prefijo, limite=8):
+        """Autocompletado desde el índice en memoria, sin consultar MySQL"""
+        return self._indice(db).sugerencias(prefijo, limite)
+
+    def get_consolas_por_videojuego(self, db, videojuego_id):
+        cargar = super().get_consolas_por_videojuego
+        return self.cache.obtener(("consolas_de", videojuego_id), lambda: cargar(db, videojuego_id))
+
+    # ===== ESCRITURAS =====
+    # Solo se publica si la escritura se guardó: el repositorio se traga los errores
+    # y devuelve None/False, y entonces no hay nada que invalidar ni que anunciar
+
+    def insertar_videojuego(self, db, videojuego, consola):
+        videojuego_id = super().insertar_videojuego(db, videojuego, consola)
+        if videojuego_id is not None:
+            self.bus.publicar(db, Cambio(INSERTAR, videojuego_id, (consola,)))
+        return videojuego_id
+
+    def insertar_videojuego_multiples_consolas(self, db, videojuego, consolas):
+        videojuego_id = super().insertar_videojuego_multiples_consolas(db, videojuego, consolas)
+        if videojuego_id is not None:
+            self.bus.publicar(db, Cambio(INSERTAR, videojuego_id, consolas))
+        return videojuego_id
+
+    def importar_videojuegos(self, db, juegos, tamaño_lote=500):
+        importados = super().importar_videojuegos(db, juegos, tamaño_lote)
+        # Los lotes anteriores a un error ya están guardados
+        if importados:
+            self.bus.publicar(db, Cambio(IMPORTAR))
+        return importados
+
+    def borrar_videojuego(self, db, videojuego_id):
+        guardado = super().borrar_videojuego(db, videojuego_id)
+        if guardado:
+            self.bus.publicar(db, Cambio(BORRAR, videojuego_id))
+        return guardado
+
+    def actualizar_videojuego(self, db, videojuego):
+        guardado = super().actualizar_videojuego(db, videojuego)
+        if guardado:
+            self.bus.publicar(db, Cambio(ACTUALIZAR, videojuego.id))
+        return guardado
+
+    def actualizar_consolas_videojuego(self, db, videojuego_id, nuevas_consolas):
+        guardado = super().actualizar_consolas_videojuego(db, videojuego_id, nuevas_consolas)
+        if guardado:
+            self.bus.publicar(db, Cambio(ACTUALIZAR, videojuego_id))
+        return guardado
@@ -0,0 +1,35 @@
+# Estados de un pedido: se crea pendiente y la pasarela lo cierra
+PENDIENTE = "pendiente"
+PAGADO = "pagado"
+RECHAZADO = "rechazado"
+FALLIDO = "fallido"
+
+
+class LineaPedido:
+    def __init__(self, videojuego_id, nombre, precio, cantidad):
+        self.videojuego_id = videojuego_id
+        self.nombre = nombre
+        self.precio = precio
+        self.cantidad = cantidad
+
+    @property
+    def subtotal(self):
+        return self.precio * self.cantidad
+
+
+class Pedido:
+    def __init__(self, id, usuario_id, estado, metodo_pago, total, referencia_pago=None, error=None,
+                 creado=None, lineas=None):
+        self.id = id
+        self.usuario_id = usuario_id
+        self.estado = estado
+        self.metodo_pago = metodo_pago
+        self.total = total
+        self.referencia_pago = referencia_pago
+        self.error = error
+        self.creado = creado
+        self.lineas = lineas if lineas is not None else []
+
+    @property
+    def terminado(self):
+        return self.estado != PENDIENTE
@@ -1,7 +1,19 @@
 class Videojuego:
-    def __init__(self, id, nombre, precio, genero, valoracion):
+    """Videojuego del catálogo con los nombres de sus consolas.
+
+    Es también el modelo de lectura de los listados: con __slots__ cada
+    instancia ocupa menos que un dict y las páginas cacheadas se notan.
+    """
+
+    __slots__ = ("id", "nombre", "precio", "genero", "valoracion", "consolas")
+
+    def __init__(self, id, nombre, precio, genero, valoracion, consolas=None):
         self.id = id
         self.nombre = nombre
         self.precio = precio
         self.genero = genero
         self.valoracion = valoracion
+        self.consolas = consolas if consolas is not None else []
+
+    def __repr__(self):
+        return f"Videojuego({self.id!r}, {self.nombre!r}, consolas={self.consolas!r})"
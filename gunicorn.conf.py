@@ -0,0 +1,46 @@
+"""Configuración de producción: gunicorn con workers de uvicorn.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Un worker por núcleo (WEB_CONCURRENCY para cambiarlo). Cada worker importa la
+app por su cuenta y abre su propio pool de conexiones (los carritos van a la
+base de datos, CARRITO_STORE=sql, en cuanto hay más de un worker); antes de aceptar
+tráfico ejecuta el calentamiento del lifespan (plantillas, mapa de consolas y
+caché del catálogo).
+
+Recarga sin cortar peticiones: kill -HUP <pid del master>. Los workers nuevos
+arrancan (y se calientan) antes de que los antiguos terminen lo que tienen
+en curso.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Con carritos en memoria cada worker tendría los suyos y el carrito dependería
+# del worker que responde: con varios workers se guardan en la base de datos
+if workers > 1:
+    if os.getenv("CARRITO_STORE", "sql") != "sql":
+        raise RuntimeError(f"CARRITO_STORE={os.environ['CARRITO_STORE']} no se comparte entre "
+                           f"{workers} workers; usa CARRITO_STORE=sql o WEB_CONCURRENCY=1")
+    os.environ["CARRITO_STORE"] = "sql"
+
+# Segundos para que un worker termine sus peticiones al recargar o parar
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+# Con preload la app se importa una vez en el master (arranque más rápido, menos
+# memoria), pero -HUP ya no recarga el código. Por defecto se importa en cada worker
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG")  # "-" para la salida estándar
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Con preload el worker hereda los pools del master (primario y réplicas): que abra conexiones propias
+    from data.database import enrutador
+    enrutador.reiniciar()
@@ -1,34 +1,360 @@
 from typing import Optional
-from fastapi import FastAPI, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Request, Form, UploadFile, File, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from data.database import database
-from data.videojuego_repository import VideojuegoRepository
+from data.database import pool, enrutador, PoolAgotado, BaseDatosNoDisponible, DB_LEER_PRIMARIO_SEG
+from data.videojuego_repository_cache import VideojuegoRepositoryCache
 from data.usuario_repository import UsuarioRepository
+from data.repositorio_async import RepositorioAsync
+from data.carrito_store import CARRITO_PURGA_SEG, crear_carrito_store
+from data.pedido_repository import PedidoRepository
+from data.cambios_catalogo import crear_bus
+from data.paginacion import LIMITE_PAGINA, LIMITE_MAXIMO, CursorNoValido, decodificar_cursor, construir_pagina
+from services.hash_service import servicio_hash, ColaHashLlena
+from services.pagos import ProcesadorPagos, crear_pasarela, ColaPagosLlena
+from services.limitador import limitador, LimiteSuperado
+from services.importador import leer_catalogo, CONSOLAS_VALIDAS
+from services.portadas import guardar_portada, PortadaNoValida, LimiteSubidaMiddleware
+from services.imagenes import generar_derivados, srcset_portada, formatos_disponibles
+from services.assets import manifiesto, CACHE_INMUTABLE
+from services.fragmentos import CacheFragmentos
+from services.difusor import DifusorCambios
+from services.metricas import metricas, MetricasMiddleware, PlantillasMedidas
+from services import compresion
+from services.api import (RespuestaJSON, NoModificado, CamposNoValidos, elegir_campos, serializar,
+                          serializar_pagina, etag_catalogo, cabeceras as cabeceras_api)
 from domain.model.videojuego import Videojuego
 from domain.model.usuario import Usuario
+from domain.model.pedido import LineaPedido
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from pathlib import Path
-from datetime import datetime
+import asyncio
+import mimetypes
+import os
+import time
+import uuid
 
 # Obtener el directorio actual del script
 BASE_DIR = Path(__file__).resolve().parent
 
 # Crear la aplicación FastAPI
-app = FastAPI(title="GameAtlas", description="Plataforma de Videojuegos")
-
+# Segundos que el arranque espera a la base de datos antes de aceptar tráfico
+ARRANQUE_ESPERA_BD_SEG = float(os.getenv("ARRANQUE_ESPERA_BD_SEG", "5"))
+# Cada worker renueva cada PEDIDO_LATIDO_SEG el latido de los pedidos que tiene en
+# su cola de cobros; un pendiente sin latido en PEDIDO_INTERRUMPIDO_SEG es de un
+# worker que ya no existe, perdió su cobro y se da por fallido
+PEDIDO_LATIDO_SEG = float(os.getenv("PEDIDO_LATIDO_SEG", "60"))
+PEDIDO_INTERRUMPIDO_SEG = int(os.getenv("PEDIDO_INTERRUMPIDO_SEG", "900"))
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    """Calienta las cachés antes de aceptar peticiones y cierra el pool al parar.
+
+    La base de datos no se toca al importar: la primera conexión se abre aquí
+    (o con la primera petición) y, si no responde, el worker arranca igual.
+    """
+    tarea = await calentar()
+    procesador_pagos.arrancar()
+    difusor.arrancar()
+    tarea_cambios = asyncio.create_task(bus_cambios.escuchar())
+    tarea_replicas = asyncio.create_task(enrutador.vigilar())
+    tarea_pedidos = asyncio.create_task(vigilar_pedidos())
+    tarea_carritos = asyncio.create_task(purgar_carritos())
+    yield
+    tarea.cancel()
+    tarea_cambios.cancel()
+    tarea_replicas.cancel()
+    await procesador_pagos.detener()
+    tarea_pedidos.cancel()
+    tarea_carritos.cancel()
+    enrutador.cerrar()
+
+
+app = FastAPI(title="GameAtlas", description="Plataforma de Videojuegos", lifespan=ciclo_de_vida)
+
+# Las portadas demasiado grandes se rechazan antes de recibir el formulario entero
+app.add_middleware(LimiteSubidaMiddleware, rutas=("/agregar-juego", "/editar-juego"))
 # Añadir middleware de sesiones
 app.add_middleware(SessionMiddleware, secret_key="tu-clave-secreta-super-segura-12345")
+# Compresión y ETag de las páginas HTML (por fuera de la sesión para ver su Set-Cookie)
+app.add_middleware(compresion.CompresionHTMLMiddleware)
+# Latencia por ruta: el más externo, para contar también la compresión
+app.add_middleware(MetricasMiddleware)
 
 # Configurar las plantillas
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates = PlantillasMedidas(directory=str(BASE_DIR / "templates"))
+templates.env.globals["srcset_portada"] = srcset_portada
+templates.env.globals["formatos_portada"] = formatos_disponibles()
+templates.env.globals["asset_url"] = manifiesto.url
+# Rejilla de tarjetas y tablas de consola ya renderizadas, por versión del catálogo
+fragmentos = CacheFragmentos(templates)
 
 # Configurar archivos estáticos (CSS, JS, imágenes)
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
-def get_db():
-    return database
+# Cambios del catálogo compartidos entre workers: cada escritura se publica
+# y cada worker invalida lo que le afecta
+bus_cambios = crear_bus(pool)
+# Lo que se vacía por un cambio se vuelve a llenar desde el primario, no desde
+# una réplica que quizá aún no lo tiene. Se suscribe antes que las cachés: así
+# las lecturas ya van al primario cuando estas invalidan
+bus_cambios.suscribir(lambda cambio: enrutador.leer_del_primario())
+
+# Repositorios compartidos; sus métodos se ejecutan fuera del event loop.
+# El de videojuegos cachea el catálogo y lo invalida con cada cambio del bus
+videojuegos_repo = RepositorioAsync(VideojuegoRepositoryCache(bus=bus_cambios))
+usuarios_repo = RepositorioAsync(UsuarioRepository())
+# Carritos en el servidor: la cookie de sesión solo lleva su id
+carritos = RepositorioAsync(crear_carrito_store(pool))
+pedidos_repo = RepositorioAsync(PedidoRepository())
+
+
+def guardar_cobro(pedido_id, estado, referencia, error):
+    """Resultado de la pasarela; se llama desde el hilo del cobro"""
+    with pool.conexion() as db:
+        pedidos_repo._repositorio.actualizar_estado(db, pedido_id, estado, referencia, error)
+
+
+# Los cobros se hacen en segundo plano: /procesar-pago solo guarda y encola
+procesador_pagos = ProcesadorPagos(crear_pasarela(), guardar_cobro)
+
+# Los fragmentos ya renderizados y las páginas abiertas (SSE) también siguen el bus
+difusor = DifusorCambios()
+bus_cambios.suscribir(fragmentos.aplicar_cambio)
+bus_cambios.suscribir(difusor.notificar)
+# Una portada nueva o resubida en otro worker llega con su cambio del catálogo
+bus_cambios.suscribir(lambda cambio: manifiesto.refrescar())
+
+# Estado que se publica en /metrics junto a los histogramas
+metricas.fuente("pool", pool.metricas)
+metricas.fuente("replicas", enrutador.metricas)
+metricas.fuente("cache_catalogo", videojuegos_repo.cache.metricas)
+metricas.fuente("cache_fragmentos", fragmentos.metricas)
+metricas.fuente("bcrypt", servicio_hash.metricas)
+metricas.fuente("compresion", compresion.metricas)
+metricas.fuente("pagos", procesador_pagos.metricas)
+metricas.fuente("limitador", limitador.metricas)
+metricas.fuente("cambios_catalogo", bus_cambios.metricas)
+metricas.fuente("sse", difusor.metricas)
+
+
+def calentar_catalogo():
+    """Mapa de consolas, primeras páginas de cada listado e índice de búsqueda"""
+    repositorio = videojuegos_repo._repositorio
+    with pool.conexion() as db:
+        # Antes de llenar las cachés: los cambios de otros workers desde aquí se aplican
+        bus_cambios.iniciar(db)
+        bus_cambios.purgar(db)
+        cursor = db.cursor()
+        try:
+            repositorio._get_mapa_consolas(cursor)
+        finally:
+            cursor.close()
+        # Mismas claves que pide cargar_pagina para la primera página
+        repositorio.get_all(db, limite=LIMITE_PAGINA + 1)
+        repositorio.contar(db)
+        for consola in CONSOLAS_VALIDAS:
+            repositorio.get_por_consola(db, consola, limite=LIMITE_PAGINA + 1)
+            repositorio.contar(db, consola=consola)
+        repositorio.generos(db)
+
+
+def mantener_pedidos():
+    """Renueva el latido de los pedidos que este worker tiene en la cola y cierra
+    los pendientes que nadie renueva (su worker murió con el cobro encolado)"""
+    repositorio = pedidos_repo._repositorio
+    with pool.conexion() as db:
+        if procesador_pagos.en_curso:
+            repositorio.renovar_latido(db, procesador_pagos.propietario)
+        cerrados = repositorio.cerrar_interrumpidos(db, PEDIDO_INTERRUMPIDO_SEG)
+    if cerrados:
+        print(f"{cerrados} pedidos interrumpidos marcados como fallidos")
+
+
+async def vigilar_pedidos():
+    """mantener_pedidos cada PEDIDO_LATIDO_SEG segundos hasta que se cancela la tarea"""
+    while True:
+        try:
+            await run_in_threadpool(mantener_pedidos)
+        except Exception as e:
+            print(f"Error al mantener los pedidos pendientes: {e}")
+        await asyncio.sleep(PEDIDO_LATIDO_SEG)
+
+
+async def purgar_carritos():
+    """Borra los carritos caducados cada CARRITO_PURGA_SEG segundos hasta que se cancela la tarea"""
+    while True:
+        try:
+            borrados = await carritos.purgar()
+            if borrados:
+                print(f"{borrados} artículos de carritos caducados borrados")
+        except Exception as e:
+            print(f"Error al purgar los carritos caducados: {e}")
+        await asyncio.sleep(CARRITO_PURGA_SEG)
+
+
+async def calentar_catalogo_con_reintentos():
+    """Reintenta el calentamiento con backoff hasta que la base de datos responda"""
+    espera = 1
+    while True:
+        try:
+            await run_in_threadpool(calentar_catalogo)
+            return
+        except Exception as e:
+            print(f"Error al calentar el catálogo: {e}. Reintento en {espera}s")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 60)
+
+
+async def calentar():
+    """Compila las plantillas, calcula el manifiesto de static/ y llena las cachés del catálogo del worker.
+
+    Espera a la base de datos como mucho ARRANQUE_ESPERA_BD_SEG; si no está
+    lista el worker empieza a servir (las rutas de BD responden 503) y el
+    catálogo se sigue calentando en segundo plano. Devuelve esa tarea.
+    """
+    inicio = time.perf_counter()
+    for nombre in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(nombre)
+    # Hashes de static/: después asset_url() no toca el disco
+    await run_in_threadpool(manifiesto.refrescar)
+    tarea = asyncio.create_task(calentar_catalogo_con_reintentos())
+    try:
+        await asyncio.wait_for(asyncio.shield(tarea), ARRANQUE_ESPERA_BD_SEG)
+    except asyncio.TimeoutError:
+        print("La base de datos no está lista; el catálogo se calentará en segundo plano")
+    print(f"Worker listo en {time.perf_counter() - inicio:.2f}s")
+    return tarea
+
+
+def get_db(request: Request):
+    """Dependencia: sesión de base de datos de la petición.
+
+    Las lecturas del catálogo van a una réplica, salvo si esta sesión ha
+    escrito hace menos de DB_LEER_PRIMARIO_SEG: así ve lo que acaba de
+    guardar aunque la réplica vaya con retraso.
+    """
+    hasta = request.session.get("leer_primario_hasta")
+    if hasta is not None and hasta < time.time():
+        del request.session["leer_primario_hasta"]
+        hasta = None
+    with enrutador.sesion(leer_primario=hasta is not None) as db:
+        yield db
+
+
+def get_db_escritura(request: Request):
+    """Dependencia de las rutas que escriben el catálogo: todo va al primario
+    y las siguientes peticiones de la sesión también leen de él un rato"""
+    request.session["leer_primario_hasta"] = time.time() + DB_LEER_PRIMARIO_SEG
+    with enrutador.sesion(leer_primario=True) as db:
+        yield db
+
+
+@app.exception_handler(BaseDatosNoDisponible)
+async def base_datos_no_disponible(request: Request, exc: BaseDatosNoDisponible):
+    """Base de datos caída: 503 inmediato, el resto de la app sigue funcionando"""
+    return HTMLResponse("El catálogo no está disponible en este momento, inténtalo en unos segundos",
+                        status_code=503, headers={"Retry-After": str(int(pool.caida_seg))})
+
+
+@app.exception_handler(PoolAgotado)
+async def pool_agotado(request: Request, exc: PoolAgotado):
+    """Si no quedan conexiones libres respondemos 503 en lugar de un error 500"""
+    return HTMLResponse("Servidor ocupado, inténtalo de nuevo en unos segundos", status_code=503)
+
+
+@app.exception_handler(LimiteSuperado)
+async def limite_superado(request: Request, exc: LimiteSuperado):
+    """Demasiados intentos de acceso: 429 sin tocar la base de datos ni bcrypt"""
+    return HTMLResponse("Demasiados intentos, espera un momento antes de volver a probar", status_code=429,
+                        headers={"Retry-After": str(max(1, round(exc.espera)))})
+
+
+@app.exception_handler(ColaPagosLlena)
+async def cola_pagos_llena(request: Request, exc: ColaPagosLlena):
+    """Demasiados cobros pendientes: se rechaza antes de crear el pedido"""
+    return HTMLResponse("Estamos recibiendo muchos pedidos, inténtalo de nuevo en unos segundos", status_code=503,
+                        headers={"Retry-After": "5"})
+
+
+@app.exception_handler(ColaHashLlena)
+async def cola_hash_llena(request: Request, exc: ColaHashLlena):
+    """Demasiados logins/registros a la vez: se rechaza antes de encolar más bcrypt"""
+    return HTMLResponse("Demasiadas peticiones de acceso, inténtalo de nuevo en unos segundos", status_code=503)
+
+
+@app.exception_handler(NoModificado)
+async def no_modificado(request: Request, exc: NoModificado):
+    """El cliente de la API ya tiene esta versión del catálogo"""
+    return Response(status_code=304, headers={**cabeceras_api(exc.etag), "Vary": "Accept-Encoding"})
+
+
+@app.exception_handler(CamposNoValidos)
+async def campos_no_validos(request: Request, exc: CamposNoValidos):
+    return RespuestaJSON({"error": str(exc)}, status_code=400)
+
+
+@app.exception_handler(CursorNoValido)
+async def cursor_no_valido(request: Request, exc: CursorNoValido):
+    """?after= o ?before= manipulado: 400 (en JSON si se pidió a la API)"""
+    if request.url.path.startswith("/api/"):
+        return RespuestaJSON({"error": str(exc)}, status_code=400)
+    return HTMLResponse("El enlace de paginación no es válido", status_code=400)
+
+
+def renderizar_juegos(request, plantilla, juegos):
+    """Fragmento con los juegos de la página, sacado de la caché si ya se renderizó.
+
+    Solo varía con los juegos mostrados, el rol de admin y si hay sesión, así
+    que la clave son los ids de la página y esos dos indicadores.
+    """
+    is_admin = request.session.get("es_admin") == 1
+    logueado = bool(request.session.get("usuario_id"))
+    clave = (tuple(juego.id for juego in juegos), is_admin, logueado)
+    return fragmentos.renderizar(
+        f"fragmentos/{plantilla}.html", clave,
+        juegos=juegos, is_admin=is_admin, logueado=logueado
+    )
+
+
+async def cargar_pagina(listar, contar, limit, after, before):
+    """Pide al repositorio una página por cursor (nombre, id) y el total del listado"""
+    limite = max(1, min(limit, LIMITE_MAXIMO))
+    despues = decodificar_cursor(after)
+    antes = None if despues else decodificar_cursor(before)
+    filas = await listar(limite=limite + 1, despues=despues, antes=antes)
+    total = await contar()
+    return construir_pagina(filas, limite, despues, antes, total)
+
+
+@app.get("/assets/{version}/{nombre:path}")
+async def servir_asset(request: Request, version: str, nombre: str):
+    """Archivo estático con el hash del contenido en la URL: caché inmutable y ETag fuerte"""
+    actual = await run_in_threadpool(manifiesto.hash, nombre)
+    if actual is None:
+        return Response(status_code=404)
+    if actual != version:
+        # El archivo ha cambiado desde que se generó la URL: se manda a la nueva
+        return RedirectResponse(manifiesto.url(nombre), status_code=307)
+    
+    etag = f'"{actual}"'
+    cabeceras = {"Cache-Control": CACHE_INMUTABLE, "ETag": etag, "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=cabeceras)
+    
+    ruta, codificacion = manifiesto.precomprimido(manifiesto.ruta(nombre), request.headers.get("accept-encoding", ""))
+    if codificacion:
+        cabeceras["Content-Encoding"] = codificacion
+    return FileResponse(ruta, headers=cabeceras, media_type=mimetypes.guess_type(nombre)[0])
+
+
+@app.get("/metrics")
+async def exportar_metricas():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metricas.exportar(), media_type="text/plain; version=0.0.4")
 
 
 # ===== RUTAS DE AUTENTICACIÓN =====
@@ -39,20 +365,40 @@ async def form_login(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 
+def ip_cliente(request: Request):
+    """IP del cliente (uvicorn ya aplica X-Forwarded-For de los proxies de confianza)"""
+    return request.client.host if request.client else ""
+
+
+async def limitar_login(request: Request, correo: str = Form(...)):
+    """Dependencia: va antes de get_db, así un 429 no ocupa una conexión del pool"""
+    await limitador.admitir("login", ip_cliente(request), correo)
+
+
+async def limitar_registro(request: Request, correo: str = Form(...)):
+    await limitador.admitir("registro", ip_cliente(request), correo)
+
+
 @app.post("/login")
-async def login(request: Request, correo: str = Form(...), contraseña: str = Form(...)):
+async def login(request: Request, correo: str = Form(...), contraseña: str = Form(...),
+                limite=Depends(limitar_login), db=Depends(get_db)):
     """Procesa el login"""
-    repo = UsuarioRepository()
-    db = get_db()
-    
-    usuario = repo.verificar_credenciales(db, correo, contraseña)
+    usuario = await usuarios_repo.get_por_correo(db, correo)
     
-    if usuario:
+    # bcrypt se ejecuta en su propio pool de hilos, nunca en el event loop
+    if usuario and await servicio_hash.verificar(contraseña, usuario["contraseña"]):
+        # Si el hash se hizo con un factor de trabajo antiguo se rehace ahora
+        if servicio_hash.necesita_rehash(usuario["contraseña"]):
+            nuevo_hash = await servicio_hash.hashear(contraseña)
+            await usuarios_repo.actualizar_contraseña(db, usuario["id"], nuevo_hash)
+        
         # Guardar usuario en sesión
         request.session["usuario_id"] = usuario["id"]
         request.session["usuario_nombre"] = usuario["nombre"]
         request.session["usuario_correo"] = usuario["correo"]
         request.session["es_admin"] = usuario.get("es_admin", 0)
+        # Los intentos fallidos de este correo no cuentan contra su dueño
+        await limitador.olvidar("login", correo)
         return RedirectResponse("/", status_code=303)
     else:
         return templates.TemplateResponse("login.html", {
@@ -73,12 +419,11 @@ async def registro(
     nombre: str = Form(...),
     correo: str = Form(...),
     contraseña: str = Form(...),
-    contraseña_confirmacion: str = Form(...)
+    contraseña_confirmacion: str = Form(...),
+    limite=Depends(limitar_registro),
+    db=Depends(get_db)
 ):
     """Procesa el registro de nuevo usuario"""
-    repo = UsuarioRepository()
-    db = get_db()
-    
     # Validar que las contraseñas coincidan
     if contraseña != contraseña_confirmacion:
         return templates.TemplateResponse("registro.html", {
@@ -87,7 +432,7 @@ async def registro(
         })
     
     # Validar que el correo no esté registrado
-    usuario_existente = repo.get_por_correo(db, correo)
+    usuario_existente = await usuarios_repo.get_por_correo(db, correo)
     if usuario_existente:
         return templates.TemplateResponse("registro.html", {
             "request": request,
@@ -96,15 +441,23 @@ async def registro(
     
     # Crear nuevo usuario
     nuevo_usuario = Usuario(None, nombre, correo, contraseña)
-    repo.insertar_usuario(db, nuevo_usuario)
+    contraseña_cifrada = await servicio_hash.hashear(contraseña)
+    await usuarios_repo.insertar_usuario(db, nuevo_usuario, contraseña_cifrada)
     
     return RedirectResponse("/login?mensaje=Registro exitoso. Por favor inicia sesión", status_code=303)
 
 
 @app.get("/logout")
-async def logout(request: Request):
-    """Cierra la sesión del usuario"""
+async def logout(request: Request, db=Depends(get_db)):
+    """Cierra la sesión del usuario; vaciar el carrito no impide salir si la BD falla"""
+    carrito_id = request.session.get("carrito_id")
     request.session.clear()
+    if carrito_id:
+        try:
+            await carritos.vaciar(carrito_id, db=db)
+        except Exception as e:
+            # Sin la sesión nadie vuelve a ese carrito; la purga lo borrará al caducar
+            print(f"Error al vaciar el carrito al cerrar sesión: {e}")
     return RedirectResponse("/", status_code=303)
 
 
@@ -115,54 +468,180 @@ async def inicio(request: Request):
 
 
 @app.get("/videojuegos")
-async def videojuegos(request: Request):
+async def videojuegos(request: Request, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                      db=Depends(get_db)):
     """Página principal de videojuegos"""
-    repo = VideojuegoRepository()
-    juegos = repo.get_all(get_db())
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_all(db, **kw),
+        lambda: videojuegos_repo.contar(db),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse("videojuegos.html", {
         "request": request,
-        "juegos": juegos,
+        "juegos": pagina.juegos,
+        "tarjetas": renderizar_juegos(request, "tarjetas", pagina.juegos),
+        "pagina": pagina,
         "is_admin": is_admin
     })
 
 
 @app.get("/buscar")
-async def buscar(request: Request, nombre: str = ""):
-    """Busca videojuegos por nombre"""
-    repo = VideojuegoRepository()
-    juegos = repo.buscar_videojuegos(get_db(), nombre, "")
+async def buscar(request: Request, nombre: str = "", genero: str = "", limit: int = LIMITE_PAGINA,
+                 after: str = "", before: str = "", db=Depends(get_db)):
+    """Busca videojuegos por nombre (prefijos, sin tildes) y opcionalmente por género"""
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.buscar_videojuegos(db, nombre, genero, **kw),
+        lambda: videojuegos_repo.contar(db, nombre=nombre, genero=genero),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse("videojuegos.html", {
         "request": request,
-        "juegos": juegos,
+        "juegos": pagina.juegos,
+        "tarjetas": renderizar_juegos(request, "tarjetas", pagina.juegos),
+        "pagina": pagina,
         "busqueda": True,
         "nombre_busqueda": nombre,
+        "genero_busqueda": genero,
+        "generos": await videojuegos_repo.generos(db),
         "is_admin": is_admin
     })
 
 
+@app.get("/api/buscar/sugerencias")
+async def sugerencias_busqueda(q: str = "", n: int = 8, db=Depends(get_db)):
+    """Sugerencias para el buscador mientras se escribe (JSON: id y nombre)"""
+    juegos = await videojuegos_repo.sugerencias(db, q, max(1, min(n, 20)))
+    return JSONResponse([{"id": juego.id, "nombre": juego.nombre} for juego in juegos])
+
+
+# ===== API JSON (v1) =====
+
+def campos_api(fields: str = ""):
+    """Dependencia: campos pedidos con ?fields=id,nombre,... (400 si alguno no existe)"""
+    return elegir_campos(fields)
+
+
+def etag_api(request: Request):
+    """Dependencia: ETag de la versión del catálogo.
+
+    Va antes de get_db: si coincide con If-None-Match se responde 304 sin
+    pedir conexión ni leer la caché.
+    """
+    etag = etag_catalogo(bus_cambios.version)
+    if compresion.coincide_etag(request.headers.get("if-none-match", ""), etag):
+        raise NoModificado(etag)
+    return etag
+
+
+def consola_valida(nombre):
+    return next((consola for consola in CONSOLAS_VALIDAS if consola.lower() == nombre.lower()), None)
+
+
+@app.get("/api/v1/videojuegos")
+async def api_videojuegos(limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                          campos=Depends(campos_api), etag=Depends(etag_api), db=Depends(get_db)):
+    """Catálogo paginado por cursor: ?limit=&after=&before=&fields="""
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_all(db, **kw),
+        lambda: videojuegos_repo.contar(db),
+        limit, after, before
+    )
+    return RespuestaJSON(serializar_pagina(pagina, campos), headers=cabeceras_api(etag))
+
+
+@app.get("/api/v1/videojuegos/{videojuego_id}")
+async def api_videojuego(videojuego_id: int, campos=Depends(campos_api), etag=Depends(etag_api),
+                         db=Depends(get_db)):
+    juego = await videojuegos_repo.get_por_id(db, videojuego_id)
+    if juego is None:
+        return RespuestaJSON({"error": "Videojuego no encontrado"}, status_code=404)
+    return RespuestaJSON(serializar(juego, campos), headers=cabeceras_api(etag))
+
+
+@app.get("/api/v1/consolas/{nombre}/videojuegos")
+async def api_videojuegos_consola(nombre: str, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                                  campos=Depends(campos_api), etag=Depends(etag_api), db=Depends(get_db)):
+    consola = consola_valida(nombre)
+    if consola is None:
+        return RespuestaJSON({"error": f"Consola no válida. Disponibles: {', '.join(CONSOLAS_VALIDAS)}"},
+                             status_code=404)
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_por_consola(db, consola, **kw),
+        lambda: videojuegos_repo.contar(db, consola=consola),
+        limit, after, before
+    )
+    return RespuestaJSON(serializar_pagina(pagina, campos), headers=cabeceras_api(etag))
+
+
+@app.get("/api/v1/buscar")
+async def api_buscar(nombre: str = "", genero: str = "", limit: int = LIMITE_PAGINA, after: str = "",
+                     before: str = "", campos=Depends(campos_api), etag=Depends(etag_api), db=Depends(get_db)):
+    """Misma búsqueda que /buscar (prefijos, sin tildes), ordenada por relevancia"""
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.buscar_videojuegos(db, nombre, genero, **kw),
+        lambda: videojuegos_repo.contar(db, nombre=nombre, genero=genero),
+        limit, after, before
+    )
+    return RespuestaJSON(serializar_pagina(pagina, campos), headers=cabeceras_api(etag))
+
+
+@app.get("/api/v1/cambios")
+async def api_cambios(request: Request):
+    """Cambios del catálogo en directo (text/event-stream) para refrescar las tarjetas abiertas"""
+    if difusor.lleno():
+        return Response(status_code=503, headers={"Retry-After": "30"})
+    flujo = difusor.eventos(bus_cambios.version, request.headers.get("last-event-id"))
+    return StreamingResponse(flujo, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/fragmentos/{plantilla}/{videojuego_id}")
+async def fragmento_videojuego(request: Request, plantilla: str, videojuego_id: int, db=Depends(get_db)):
+    """La tarjeta (o fila de tabla) de un solo juego; la pide la página al recibir un cambio"""
+    if plantilla not in ("tarjetas", "tabla_consola"):
+        return HTMLResponse("", status_code=404)
+    juego = await videojuegos_repo.get_por_id(db, videojuego_id)
+    if juego is None:
+        return HTMLResponse("", status_code=404)
+    return HTMLResponse(renderizar_juegos(request, plantilla, [juego]))
+
+
+# ===== PÁGINAS DE CONSOLAS =====
+
 @app.get("/playstation", response_class=HTMLResponse)
-async def listar_playstation(request: Request):
+async def listar_playstation(request: Request, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                             db=Depends(get_db)):
     """Página de PlayStation"""
-    repo = VideojuegoRepository()
-    juegos = repo.get_por_consola(get_db(), "PlayStation")
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_por_consola(db, "PlayStation", **kw),
+        lambda: videojuegos_repo.contar(db, consola="PlayStation"),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse(
         "playstation.html",
-        {"request": request, "juegos": juegos, "is_admin": is_admin}
+        {"request": request, "juegos": pagina.juegos, "pagina": pagina, "is_admin": is_admin,
+         "tabla": renderizar_juegos(request, "tabla_consola", pagina.juegos)}
     )
 
 
 @app.get("/xbox")
-async def form_insertar(request: Request):
+async def form_insertar(request: Request, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                        db=Depends(get_db)):
     """Página de Xbox"""
-    repo = VideojuegoRepository()
-    juegos = repo.get_por_consola(get_db(), "Xbox")
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_por_consola(db, "Xbox", **kw),
+        lambda: videojuegos_repo.contar(db, consola="Xbox"),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse("xbox.html", {
         "request": request,
-        "juegos": juegos,
+        "juegos": pagina.juegos,
+        "tabla": renderizar_juegos(request, "tabla_consola", pagina.juegos),
+        "pagina": pagina,
         "is_admin": is_admin
     })
 
@@ -173,18 +652,31 @@ async def insertar_videojuego(
     precio: float = Form(...),
     genero: str = Form(...),
     consola: str = Form(...),
-    valoracion: float = Form(...)
+    valoracion: float = Form(...),
+    db=Depends(get_db_escritura)
 ):
     """Inserta un nuevo videojuego"""
-    repo = VideojuegoRepository()
-    db = get_db()
     nuevo = Videojuego(None, nombre, precio, genero, valoracion)
-    repo.insertar_videojuego(db, nuevo, consola)
+    await videojuegos_repo.insertar_videojuego(db, nuevo, consola)
     return RedirectResponse("/xbox")
 
 
 # ===== RUTAS PARA AGREGAR JUEGOS (ADMIN) =====
 
+async def generar_miniaturas(file_path):
+    """Genera las miniaturas WebP/AVIF de una portada recién subida sin bloquear el event loop"""
+    try:
+        derivados = await run_in_threadpool(generar_derivados, file_path)
+    except Exception as e:
+        # Sin miniaturas las plantillas siguen usando el PNG original
+        print(f"Error al generar miniaturas de {file_path.name}: {e}")
+        derivados = []
+    
+    # Nuevas URLs con hash para la portada y sus miniaturas
+    nombres = [file_path.name] + [f"derivados/{ruta.name}" for ruta in derivados]
+    await run_in_threadpool(manifiesto.actualizar, *nombres)
+
+
 @app.get("/agregar-juego")
 async def form_agregar_juego(request: Request):
     """Formulario para agregar un nuevo videojuego (Solo Admin)"""
@@ -202,7 +694,8 @@ async def agregar_juego(
     genero: str = Form(...),
     valoracion: float = Form(...),
     consolas: list = Form(...),
-    portada: UploadFile = File(...)
+    portada: UploadFile = File(...),
+    db=Depends(get_db_escritura)
 ):
     """Agrega un nuevo videojuego a la base de datos (Solo Admin)"""
     if request.session.get("es_admin") != 1:
@@ -212,76 +705,85 @@ async def agregar_juego(
     if not consolas:
         return RedirectResponse("/agregar-juego", status_code=303)
     
-    # Validar que el archivo sea PNG
-    if not portada.filename.lower().endswith('.png'):
-        return RedirectResponse("/agregar-juego", status_code=303)
-    
     # Validar que el nombre del archivo sea exactamente como el nombre del juego (incluyendo .PNG)
     nombre_esperado = f"{nombre}.PNG"
-    if portada.filename != nombre_esperado:
+    if portada.filename != nombre_esperado or Path(nombre_esperado).name != nombre_esperado:
         # Si no coincide exactamente, redirigir con error
         return RedirectResponse("/agregar-juego", status_code=303)
     
-    # Guardar el archivo en la carpeta static
+    # Guardar el archivo en la carpeta static (se comprueba que el contenido sea PNG)
     try:
         file_path = BASE_DIR / "static" / portada.filename
-        with open(file_path, "wb") as f:
-            contenido = await portada.read()
-            f.write(contenido)
-    except Exception as e:
+        escritos, segundos = await guardar_portada(portada, file_path)
+        print(f"Portada guardada: {portada.filename} ({escritos} bytes en {segundos * 1000:.1f} ms)")
+        await generar_miniaturas(file_path)
+    except (PortadaNoValida, OSError) as e:
         print(f"Error al guardar archivo: {e}")
         return RedirectResponse("/agregar-juego", status_code=303)
     
     # Guardar el juego en la base de datos con todas las consolas
-    repo = VideojuegoRepository()
-    db = get_db()
     nuevo_juego = Videojuego(None, nombre, precio, genero, valoracion)
-    repo.insertar_videojuego_multiples_consolas(db, nuevo_juego, consolas)
+    await videojuegos_repo.insertar_videojuego_multiples_consolas(db, nuevo_juego, consolas)
     
     return RedirectResponse("/videojuegos", status_code=303)    
 
 
+@app.get("/importar-catalogo")
+async def form_importar_catalogo(request: Request):
+    """Formulario de importación masiva (Solo Admin)"""
+    if request.session.get("es_admin") != 1:
+        return RedirectResponse("/login", status_code=303)
+    
+    return templates.TemplateResponse("importarcatalogo.html", {"request": request})
+
+
+@app.post("/importar-catalogo")
+async def importar_catalogo(request: Request, archivo: UploadFile = File(...), db=Depends(get_db_escritura)):
+    """Importa muchos videojuegos desde un CSV o JSON en transacciones por lotes (Solo Admin)"""
+    if request.session.get("es_admin") != 1:
+        return RedirectResponse("/login", status_code=303)
+    
+    try:
+        juegos = leer_catalogo(archivo.filename or "", await archivo.read())
+    except (ValueError, UnicodeDecodeError) as e:
+        return templates.TemplateResponse("importarcatalogo.html", {"request": request, "error": str(e)})
+    
+    importados = await videojuegos_repo.importar_videojuegos(db, juegos)
+    contexto = {"request": request, "mensaje": f"Se han importado {importados} de {len(juegos)} videojuegos"}
+    if importados < len(juegos):
+        contexto["error"] = "La importación se detuvo por un error; el último lote se ha deshecho"
+    return templates.TemplateResponse("importarcatalogo.html", contexto)
+
+
 # ===== RUTAS PARA BORRAR Y EDITAR JUEGOS (ADMIN) =====
 
 @app.post("/borrar-juego")
-async def borrar_juego(request: Request, videojuego_id: int = Form(...)):
+async def borrar_juego(request: Request, videojuego_id: int = Form(...), db=Depends(get_db_escritura)):
     """Borra un videojuego (Solo Admin)"""
     if request.session.get("es_admin") != 1:
         return RedirectResponse("/login", status_code=303)
     
-    repo = VideojuegoRepository()
-    db = get_db()
-    repo.borrar_videojuego(db, videojuego_id)
+    await videojuegos_repo.borrar_videojuego(db, videojuego_id)
     
     return RedirectResponse("/videojuegos", status_code=303)
 
 
 @app.get("/editar-juego/{videojuego_id}")
-async def form_editar_juego(request: Request, videojuego_id: int):
+async def form_editar_juego(request: Request, videojuego_id: int, db=Depends(get_db)):
     """Formulario para editar un videojuego (Solo Admin)"""
     if request.session.get("es_admin") != 1:
         return RedirectResponse("/login", status_code=303)
     
-    repo = VideojuegoRepository()
-    db = get_db()
-    juego = repo.get_por_id(db, videojuego_id)
+    juego = await videojuegos_repo.get_por_id(db, videojuego_id)
     
     if not juego:
         return RedirectResponse("/videojuegos", status_code=303)
     
-    # Obtener las consolas actuales del juego
-    consolas_actuales = repo.get_consolas_por_videojuego(db, videojuego_id)
-    
+    # get_por_id ya trae las consolas del juego
     return templates.TemplateResponse("editarjuego.html", {
         "request": request,
-        "juego": {
-            "id": juego[0],
-            "nombre": juego[1],
-            "precio": juego[2],
-            "genero": juego[3],
-            "valoracion": juego[4]
-        },
-        "consolas_actuales": consolas_actuales
+        "juego": juego,
+        "consolas_actuales": juego.consolas
     })
 
 
@@ -294,7 +796,8 @@ async def editar_juego(
     genero: str = Form(...),
     valoracion: float = Form(...),
     consolas: list = Form(None),
-    portada: UploadFile = File(None)
+    portada: UploadFile = File(None),
+    db=Depends(get_db_escritura)
 ):
     """Actualiza un videojuego en la base de datos (Solo Admin)"""
     if request.session.get("es_admin") != 1:
@@ -302,72 +805,74 @@ async def editar_juego(
     
     # Si se proporciona un archivo de portada, validar y guardar
     if portada and portada.filename:
-        # Validar que el archivo sea PNG
-        if not portada.filename.lower().endswith('.png'):
-            return RedirectResponse(f"/editar-juego/{videojuego_id}", status_code=303)
-        
         # Validar que el nombre del archivo sea exactamente como el nombre del juego (incluyendo .PNG)
         nombre_esperado = f"{nombre}.PNG"
-        if portada.filename != nombre_esperado:
+        if portada.filename != nombre_esperado or Path(nombre_esperado).name != nombre_esperado:
             return RedirectResponse(f"/editar-juego/{videojuego_id}", status_code=303)
         
-        # Guardar el archivo en la carpeta static
+        # Guardar el archivo en la carpeta static (se comprueba que el contenido sea PNG)
         try:
             file_path = BASE_DIR / "static" / portada.filename
-            with open(file_path, "wb") as f:
-                contenido = await portada.read()
-                f.write(contenido)
-        except Exception as e:
+            escritos, segundos = await guardar_portada(portada, file_path)
+            print(f"Portada guardada: {portada.filename} ({escritos} bytes en {segundos * 1000:.1f} ms)")
+            await generar_miniaturas(file_path)
+        except (PortadaNoValida, OSError) as e:
             print(f"Error al guardar archivo: {e}")
             return RedirectResponse(f"/editar-juego/{videojuego_id}", status_code=303)
     
     # Actualizar el juego en la base de datos
-    repo = VideojuegoRepository()
-    db = get_db()
     juego_actualizado = Videojuego(videojuego_id, nombre, precio, genero, valoracion)
-    repo.actualizar_videojuego(db, juego_actualizado)
+    await videojuegos_repo.actualizar_videojuego(db, juego_actualizado)
     
     # Actualizar las consolas si se proporcionaron
     if consolas:
-        repo.actualizar_consolas_videojuego(db, videojuego_id, consolas)
+        await videojuegos_repo.actualizar_consolas_videojuego(db, videojuego_id, consolas)
     
     return RedirectResponse("/videojuegos", status_code=303)
 
 
 @app.get("/steam")
-async def form_borrar(request: Request):
+async def form_borrar(request: Request, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                      db=Depends(get_db)):
     """Página para Steam"""
-    repo = VideojuegoRepository()
-    db = get_db()
-    juegos = repo.get_por_consola(db, "Steam")
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_por_consola(db, "Steam", **kw),
+        lambda: videojuegos_repo.contar(db, consola="Steam"),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse("steam.html", {
         "request": request,
-        "juegos": juegos,
+        "juegos": pagina.juegos,
+        "tabla": renderizar_juegos(request, "tabla_consola", pagina.juegos),
+        "pagina": pagina,
         "is_admin": is_admin
     })
 
 
 @app.post("/steam")
-async def borrar_videojuego(id: int = Form(...)):
+async def borrar_videojuego(id: int = Form(...), db=Depends(get_db_escritura)):
     """Borra un videojuego"""
-    repo = VideojuegoRepository()
-    db = get_db()
-    repo.borrar_videojuego(db, id)
+    await videojuegos_repo.borrar_videojuego(db, id)
     return RedirectResponse("/steam", status_code=303)
 
 
 
 @app.get("/switch")
-async def actualizar_videojuego_form(request: Request):
+async def actualizar_videojuego_form(request: Request, limit: int = LIMITE_PAGINA, after: str = "", before: str = "",
+                                     db=Depends(get_db)):
     """Página de Switch"""
-    repo = VideojuegoRepository()
-    db = get_db()
-    juegos = repo.get_por_consola(db, "Switch")
+    pagina = await cargar_pagina(
+        lambda **kw: videojuegos_repo.get_por_consola(db, "Switch", **kw),
+        lambda: videojuegos_repo.contar(db, consola="Switch"),
+        limit, after, before
+    )
     is_admin = request.session.get("es_admin") == 1
     return templates.TemplateResponse("switch.html", {
         "request": request,
-        "juegos": juegos,
+        "juegos": pagina.juegos,
+        "tabla": renderizar_juegos(request, "tabla_consola", pagina.juegos),
+        "pagina": pagina,
         "is_admin": is_admin
     })
 
@@ -377,60 +882,71 @@ async def actualizar_videojuego(
     nombre: str = Form(...),
     precio: float = Form(...),
     genero: str = Form(...),
-    valoracion: float = Form(...)
+    valoracion: float = Form(...),
+    db=Depends(get_db_escritura)
 ):
     """Actualiza un videojuego"""
-    repo = VideojuegoRepository()
-    db = get_db()
     actualizado = Videojuego(id, nombre, precio, genero, valoracion)
-    repo.actualizar_videojuego(db, actualizado)
+    await videojuegos_repo.actualizar_videojuego(db, actualizado)
     return RedirectResponse("/switch", status_code=303)
 
 
 # ===== RUTAS DEL CARRITO =====
 
+def get_carrito_id(request: Request):
+    """Id del carrito de la sesión; es lo único del carrito que viaja en la cookie"""
+    if "carrito_id" not in request.session:
+        request.session["carrito_id"] = uuid.uuid4().hex
+    return request.session["carrito_id"]
+
+
+async def cargar_carrito(request: Request, db):
+    """Líneas del carrito con nombre y precio actuales (todos los juegos en una consulta)"""
+    items = await carritos.obtener(get_carrito_id(request), db=db)
+    carrito = []
+    for juego in await videojuegos_repo.get_por_ids(db, list(items)):
+        cantidad = items[juego.id]
+        carrito.append({
+            "id": juego.id,
+            "nombre": juego.nombre,
+            "precio": float(juego.precio),
+            "genero": juego.genero,
+            "valoracion": float(juego.valoracion),
+            "cantidad": cantidad,
+            "subtotal": float(juego.precio) * cantidad
+        })
+    total = sum(item["subtotal"] for item in carrito)
+    return carrito, total
+
+
 @app.post("/agregar-carrito")
-async def agregar_carrito(request: Request, videojuego_id: int = Form(...)):
+async def agregar_carrito(request: Request, videojuego_id: int = Form(...), db=Depends(get_db)):
     """Agrega un videojuego al carrito"""
     # Verificar que esté logueado
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
     
-    # Obtener datos del videojuego
-    repo = VideojuegoRepository()
-    juego = repo.get_por_id(get_db(), videojuego_id)
+    # Comprobar que el videojuego existe
+    juego = await videojuegos_repo.get_por_id(db, videojuego_id)
     
     if not juego:
         return RedirectResponse("/videojuegos", status_code=303)
     
-    # Inicializar carrito si no existe
-    if "carrito" not in request.session:
-        request.session["carrito"] = []
-    
-    # Agregar al carrito
-    request.session["carrito"].append({
-        "id": juego[0],
-        "nombre": juego[1],
-        "precio": float(juego[2]),
-        "genero": juego[3],
-        "valoracion": float(juego[4])
-    })
-    
-    # Actualizar contador
-    request.session["carrito_count"] = len(request.session["carrito"])
+    # Agregar al carrito del servidor y actualizar contador
+    items = await carritos.agregar(get_carrito_id(request), juego.id, db=db)
+    request.session["carrito_count"] = sum(items.values())
     
     return RedirectResponse("/videojuegos", status_code=303)
 
 
 @app.get("/carrito")
-async def ver_carrito(request: Request):
+async def ver_carrito(request: Request, db=Depends(get_db)):
     """Muestra el carrito de compras"""
     # Verificar que esté logueado
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
     
-    carrito = request.session.get("carrito", [])
-    total = sum(item["precio"] for item in carrito)
+    carrito, total = await cargar_carrito(request, db)
     
     return templates.TemplateResponse("carrito.html", {
         "request": request,
@@ -440,52 +956,48 @@ async def ver_carrito(request: Request):
 
 
 @app.post("/eliminar-carrito")
-async def eliminar_carrito(request: Request, indice: int = Form(...)):
-    """Elimina un item del carrito"""
+async def eliminar_carrito(request: Request, videojuego_id: int = Form(...), db=Depends(get_db)):
+    """Elimina un juego del carrito"""
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
     
-    carrito = request.session.get("carrito", [])
-    
-    if 0 <= indice < len(carrito):
-        carrito.pop(indice)
-        request.session["carrito"] = carrito
-        request.session["carrito_count"] = len(carrito)
+    items = await carritos.quitar(get_carrito_id(request), videojuego_id, db=db)
+    request.session["carrito_count"] = sum(items.values())
     
     return RedirectResponse("/carrito", status_code=303)
 
 
 @app.get("/limpiar-carrito")
-async def limpiar_carrito(request: Request):
+async def limpiar_carrito(request: Request, db=Depends(get_db)):
     """Limpia todo el carrito"""
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
     
-    request.session["carrito"] = []
+    await carritos.vaciar(get_carrito_id(request), db=db)
     request.session["carrito_count"] = 0
     
     return RedirectResponse("/carrito", status_code=303)
 
 
 @app.get("/pago")
-async def formulario_pago(request: Request):
+async def formulario_pago(request: Request, db=Depends(get_db)):
     """Muestra el formulario de pago"""
     # Verificar que esté logueado
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
     
-    carrito = request.session.get("carrito", [])
+    carrito, total = await cargar_carrito(request, db)
     
     # Verificar que haya items en el carrito
     if not carrito:
         return RedirectResponse("/carrito", status_code=303)
     
-    total = sum(item["precio"] for item in carrito)
-    
+    # Un envío repetido del formulario (doble clic, recarga) lleva la misma clave
     return templates.TemplateResponse("pago.html", {
         "request": request,
         "carrito": carrito,
-        "total": total
+        "total": total,
+        "clave_idempotencia": uuid.uuid4().hex
     })
 
 
@@ -496,31 +1008,98 @@ async def procesar_pago(
     nombre_titular: str = Form(None),
     numero_tarjeta: str = Form(None),
     fecha_expiracion: str = Form(None),
-    cvv: str = Form(None)
+    cvv: str = Form(None),
+    clave_idempotencia: str = Form(""),
+    db=Depends(get_db)
 ):
-    """Procesa el pago"""
+    """Guarda el pedido y encola el cobro; responde enseguida con la página del pedido"""
     # Verificar que esté logueado
     if not request.session.get("usuario_id"):
         return RedirectResponse("/login", status_code=303)
-    
-    carrito = request.session.get("carrito", [])
-    
-    # Verificar que haya items en el carrito
-    if not carrito:
-        return RedirectResponse("/carrito", status_code=303)
-    
-    # Limpiar el carrito después del pago exitoso
-    request.session["carrito"] = []
-    request.session["carrito_count"] = 0
-    
-    return templates.TemplateResponse("pago_exitoso.html", {
+    usuario_id = request.session["usuario_id"]
+
+    # Los clientes de la API pueden mandar la clave en la cabecera Idempotency-Key
+    clave = (request.headers.get("Idempotency-Key") or clave_idempotencia or uuid.uuid4().hex)[:64]
+
+    # Si la clave ya tiene pedido es un reintento: se vuelve al pedido sin cobrar otra vez
+    pedido_id = await pedidos_repo.get_id_por_clave(db, usuario_id, clave)
+    if pedido_id is None:
+        carrito, total = await cargar_carrito(request, db)
+
+        # Verificar que haya items en el carrito
+        if not carrito:
+            return RedirectResponse("/carrito", status_code=303)
+        if procesador_pagos.lleno():
+            raise ColaPagosLlena()
+
+        lineas = [LineaPedido(item["id"], item["nombre"], item["precio"], item["cantidad"]) for item in carrito]
+        pedido_id, creado = await pedidos_repo.crear_pedido(db, usuario_id, clave, metodo_pago, lineas,
+                                                            procesador_pagos.propietario)
+        if creado:
+            # Los datos de la tarjeta solo viajan a la pasarela, no se guardan
+            procesador_pagos.encolar(pedido_id, total, metodo_pago, {
+                "nombre_titular": nombre_titular,
+                "numero_tarjeta": numero_tarjeta,
+                "fecha_expiracion": fecha_expiracion,
+                "cvv": cvv
+            })
+            # Limpiar el carrito una vez guardado el pedido
+            await carritos.vaciar(get_carrito_id(request), db=db)
+            request.session["carrito_count"] = 0
+
+    return RedirectResponse(f"/pedidos/{pedido_id}", status_code=303)
+
+
+# ===== RUTAS DE PEDIDOS =====
+
+async def pedido_del_usuario(request: Request, db, pedido_id):
+    """El pedido si existe y es del usuario de la sesión; si no, None"""
+    pedido = await pedidos_repo.get_por_id(db, pedido_id)
+    if not pedido or pedido.usuario_id != request.session.get("usuario_id"):
+        return None
+    return pedido
+
+
+@app.get("/pedidos")
+async def ver_pedidos(request: Request, db=Depends(get_db)):
+    """Historial de pedidos del usuario"""
+    if not request.session.get("usuario_id"):
+        return RedirectResponse("/login", status_code=303)
+
+    pedidos = await pedidos_repo.get_por_usuario(db, request.session["usuario_id"])
+    return templates.TemplateResponse("pedidos.html", {"request": request, "pedidos": pedidos})
+
+
+@app.get("/pedidos/{pedido_id}")
+async def ver_pedido(request: Request, pedido_id: int, db=Depends(get_db)):
+    """Detalle y estado de un pedido; mientras está pendiente la página consulta el estado"""
+    if not request.session.get("usuario_id"):
+        return RedirectResponse("/login", status_code=303)
+
+    pedido = await pedido_del_usuario(request, db, pedido_id)
+    if not pedido:
+        return RedirectResponse("/pedidos", status_code=303)
+
+    return templates.TemplateResponse("pedido.html", {
         "request": request,
-        "metodo_pago": metodo_pago,
-        "usuario_nombre": request.session.get("usuario_nombre"),
-        "fecha_pago": datetime.now().strftime("%d/%m/%Y %H:%M")
+        "pedido": pedido,
+        "usuario_nombre": request.session.get("usuario_nombre")
     })
 
 
+@app.get("/pedidos/{pedido_id}/estado")
+async def estado_pedido(request: Request, pedido_id: int, db=Depends(get_db)):
+    """Estado del pedido en JSON, para sondear sin leer sus líneas"""
+    fila = await pedidos_repo.get_estado(db, pedido_id)
+    if not fila or fila[0] != request.session.get("usuario_id"):
+        return JSONResponse({"error": "Pedido no encontrado"}, status_code=404)
+
+    _, estado, referencia = fila
+    return JSONResponse({"id": pedido_id, "estado": estado, "referencia": referencia},
+                        headers={"Cache-Control": "no-store"})
+
+
 if __name__ == "__main__":
+    # Modo desarrollo; en producción: gunicorn main:app -c gunicorn.conf.py
     import uvicorn
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
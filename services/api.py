@@ -0,0 +1,100 @@
+"""Serialización de la API JSON del catálogo (/api/v1).
+
+Las respuestas se codifican con orjson si está instalado y si no con el json
+de la biblioteca estándar en su forma compacta. Cada respuesta lleva un ETag
+débil que sale de la versión del catálogo y no del cuerpo: se puede comparar
+con If-None-Match antes de pedir conexión a la base de datos.
+
+La versión es la del bus de cambios: con el transporte "bd" es el id de la
+última fila de cambios_catalogo, la misma en todos los workers y tras un
+reinicio, así un cliente que va cambiando de worker sigue recibiendo 304.
+El ETag lleva además la franja de CATALOGO_CACHE_TTL segundos, para los
+cambios que no pasan por el bus (un worker que cae entre el commit y la
+publicación, SQL hecho a mano) y para el transporte "local", cuyo contador
+vuelve a 0 al reiniciar: un 304 nunca se sirve más tiempo del que la caché
+tarda en recargar.
+"""
+import json
+import time
+from decimal import Decimal
+
+from starlette.responses import Response
+
+from data.videojuego_repository_cache import CATALOGO_CACHE_TTL
+from domain.model.videojuego import Videojuego
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa json, más lento al serializar
+    orjson = None
+
+
+CAMPOS = Videojuego.__slots__
+
+
+class CamposNoValidos(Exception):
+    """`fields` pide campos que los videojuegos no tienen"""
+
+
+class NoModificado(Exception):
+    """El cliente ya tiene la versión actual (If-None-Match)"""
+
+    def __init__(self, etag):
+        super().__init__(etag)
+        self.etag = etag
+
+
+def a_json(datos):
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespuestaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return a_json(content)
+
+
+def elegir_campos(fields):
+    """Campos pedidos en `fields` ("id,nombre,precio") en el orden del modelo; vacío son todos"""
+    if not fields:
+        return CAMPOS
+    pedidos = {campo.strip() for campo in fields.split(",") if campo.strip()}
+    desconocidos = pedidos.difference(CAMPOS)
+    if desconocidos:
+        raise CamposNoValidos(f"Campos no válidos: {', '.join(sorted(desconocidos))}. "
+                              f"Disponibles: {', '.join(CAMPOS)}")
+    return tuple(campo for campo in CAMPOS if campo in pedidos)
+
+
+def serializar(juego, campos=CAMPOS):
+    datos = {}
+    for campo in campos:
+        valor = getattr(juego, campo)
+        # MySQL devuelve DECIMAL para el precio y la valoración
+        datos[campo] = float(valor) if isinstance(valor, Decimal) else valor
+    return datos
+
+
+def serializar_pagina(pagina, campos=CAMPOS):
+    return {
+        "videojuegos": [serializar(juego, campos) for juego in pagina.juegos],
+        "total": pagina.total,
+        "limite": pagina.limite,
+        "siguiente": pagina.siguiente,
+        "anterior": pagina.anterior,
+    }
+
+
+def etag_catalogo(version):
+    """ETag de las respuestas del catálogo para la versión `version` del bus de cambios"""
+    franja = int(time.time() // CATALOGO_CACHE_TTL)
+    return f'W/"{version}-{franja}"'
+
+
+def cabeceras(etag):
+    # no-cache: el cliente puede guardar la respuesta pero la revalida siempre.
+    # Vary lo añade el middleware de compresión
+    return {"ETag": etag, "Cache-Control": "no-cache"}
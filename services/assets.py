@@ -0,0 +1,162 @@
+"""Manifiesto de archivos estáticos con URLs que incluyen el hash del contenido.
+
+/assets/<hash>/<nombre> cambia en cuanto cambia el archivo (por ejemplo al
+volver a subir una portada), así que se puede servir con caché inmutable de
+un año. Las plantillas obtienen la URL con asset_url("fondo-xbox.jpg").
+
+Precomprimir los archivos de texto (css, js, svg...) en .gz y .br:
+
+    python -m services.assets --comprimir
+"""
+import gzip
+import hashlib
+import os
+import stat
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from services.compresion import codificaciones_aceptadas
+
+try:
+    import brotli
+except ImportError:  # Sin brotli solo se precomprime en gzip
+    brotli = None
+
+
+DIRECTORIO_STATIC = Path(__file__).resolve().parent.parent / "static"
+# En desarrollo cada asset_url() comprueba el mtime del archivo para ver los
+# cambios al momento; en producción las URLs salen del manifiesto en memoria
+ASSETS_VIGILAR = os.getenv("ASSETS_VIGILAR", "0") == "1"
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+# Extensiones que merece la pena comprimir; las imágenes ya vienen comprimidas
+EXTENSIONES_TEXTO = (".css", ".js", ".svg", ".json", ".txt", ".html")
+# Codificación -> extensión del archivo precomprimido, por orden de preferencia
+PRECOMPRIMIDOS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class ManifiestoAssets:
+    """Nombre lógico (ruta dentro de static/) -> hash del contenido.
+
+    `refrescar` lo calcula entero al arrancar el worker (fuera del event loop)
+    y `url`, que las plantillas llaman varias veces por tarjeta, solo consulta
+    la memoria. El hash se guarda junto al mtime y el tamaño del archivo:
+    `hash` y `refrescar` lo recalculan si cambian, así cada worker ve una
+    portada resubida aunque la haya guardado otro proceso.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_STATIC, vigilar=ASSETS_VIGILAR):
+        self.directorio = Path(directorio).resolve()
+        self.vigilar = vigilar
+        self._hashes = {}  # nombre -> (mtime_ns, tamaño, hash)
+        self._lock = threading.Lock()
+
+    def ruta(self, nombre):
+        """Ruta del archivo dentro de static/, o None si se sale del directorio"""
+        ruta = (self.directorio / nombre).resolve()
+        if self.directorio not in ruta.parents:
+            return None
+        return ruta
+
+    def hash(self, nombre):
+        """Hash corto del contenido, o None si no es un archivo (no existe o es un directorio)"""
+        ruta = self.ruta(nombre)
+        try:
+            estado = ruta.stat() if ruta else None
+        except OSError:
+            estado = None
+        if estado is None or not stat.S_ISREG(estado.st_mode):
+            return None
+
+        with self._lock:
+            guardado = self._hashes.get(nombre)
+        if guardado and guardado[:2] == (estado.st_mtime_ns, estado.st_size):
+            return guardado[2]
+
+        resumen = hashlib.sha256()
+        try:
+            with open(ruta, "rb") as archivo:
+                for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+                    resumen.update(bloque)
+        except OSError:
+            return None  # Borrado entre el stat y la lectura
+        valor = resumen.hexdigest()[:16]
+        with self._lock:
+            self._hashes[nombre] = (estado.st_mtime_ns, estado.st_size, valor)
+        return valor
+
+    def refrescar(self):
+        """Recorre static/: calcula el hash de los archivos nuevos o cambiados y
+        olvida los borrados. Lee del disco: no llamar desde el event loop"""
+        vistos = set()
+        for ruta in self.directorio.rglob("*"):
+            nombre = ruta.relative_to(self.directorio).as_posix()
+            # Ni temporales a medio escribir ni variantes precomprimidas
+            if any(parte.startswith(".") for parte in ruta.relative_to(self.directorio).parts):
+                continue
+            if ruta.suffix in (".gz", ".br"):
+                continue
+            if self.hash(nombre) is not None:
+                vistos.add(nombre)
+        with self._lock:
+            for nombre in set(self._hashes) - vistos:
+                del self._hashes[nombre]
+        return len(vistos)
+
+    def url(self, nombre):
+        """URL con hash; si el archivo no está en el manifiesto se devuelve la ruta normal de /static"""
+        if self.vigilar:
+            valor = self.hash(nombre)
+        else:
+            with self._lock:
+                guardado = self._hashes.get(nombre)
+            valor = guardado[2] if guardado else None
+        if valor is None:
+            return "/static/" + quote(nombre)
+        return f"/assets/{valor}/" + quote(nombre)
+
+    def actualizar(self, *nombres):
+        """Recalcula el hash de los archivos indicados (p. ej. tras subir una portada)"""
+        with self._lock:
+            for nombre in nombres:
+                self._hashes.pop(nombre, None)
+        for nombre in nombres:
+            self.hash(nombre)
+
+    def precomprimido(self, ruta, accept_encoding):
+        """(ruta, codificación) de la mejor variante precomprimida que acepta el cliente"""
+        aceptadas = codificaciones_aceptadas(accept_encoding)
+        for codificacion, extension in PRECOMPRIMIDOS:
+            # "*" solo vale por gzip, como en compresion.elegir_codificacion
+            if codificacion in aceptadas or (codificacion == "gzip" and "*" in aceptadas):
+                variante = ruta.with_name(ruta.name + extension)
+                if variante.is_file():
+                    return variante, codificacion
+        return ruta, None
+
+
+manifiesto = ManifiestoAssets()
+
+
+def comprimir(directorio=DIRECTORIO_STATIC):
+    """Genera las variantes .gz (y .br si hay brotli) de los archivos de texto"""
+    for ruta in Path(directorio).rglob("*"):
+        if not ruta.is_file() or ruta.suffix.lower() not in EXTENSIONES_TEXTO:
+            continue
+        contenido = ruta.read_bytes()
+        ruta.with_name(ruta.name + ".gz").write_bytes(gzip.compress(contenido, 9))
+        if brotli is not None:
+            ruta.with_name(ruta.name + ".br").write_bytes(brotli.compress(contenido))
+        print(f"{ruta.relative_to(directorio)}: comprimido")
+
+
+if __name__ == "__main__":
+    if "--comprimir" in sys.argv[1:]:
+        comprimir()
+    else:
+        for ruta in sorted(DIRECTORIO_STATIC.rglob("*")):
+            if ruta.is_file():
+                nombre = ruta.relative_to(DIRECTORIO_STATIC).as_posix()
+                print(f"{manifiesto.url(nombre)}")
@@ -0,0 +1,129 @@
+import bisect
+import re
+import unicodedata
+
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto):
+    """Minúsculas sin tildes ni signos: 'Pokémon Escarlata' -> 'pokemon escarlata'"""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.casefold()).strip()
+
+
+class IndiceBusqueda:
+    """Índice invertido en memoria sobre los títulos del catálogo.
+
+    Cada palabra normalizada del título apunta a los ids que la contienen y el
+    vocabulario se guarda ordenado, así una búsqueda por prefijo es un bisect
+    en lugar de recorrer todos los juegos.
+    """
+
+    def __init__(self, juegos, version=0):
+        self.version = version
+        self._juegos = {}
+        self._titulos = {}
+        self._palabras_titulo = {}
+        self._generos = {}
+        self._palabras = {}  # palabra -> set(ids)
+
+        for juego in juegos:
+            videojuego_id = juego.id
+            titulo = normalizar(juego.nombre)
+            self._juegos[videojuego_id] = juego
+            self._titulos[videojuego_id] = titulo
+            self._generos[videojuego_id] = normalizar(juego.genero)
+            self._palabras_titulo[videojuego_id] = frozenset(titulo.split())
+            for palabra in self._palabras_titulo[videojuego_id]:
+                self._palabras.setdefault(palabra, set()).add(videojuego_id)
+
+        self._vocabulario = sorted(self._palabras)
+        # Títulos completos ordenados para autocompletar por el principio del título
+        self._titulos_ordenados = sorted((titulo, i) for i, titulo in self._titulos.items())
+
+    def __len__(self):
+        return len(self._juegos)
+
+    def generos(self):
+        """Géneros distintos del catálogo, tal y como están escritos"""
+        return sorted({juego.genero for juego in self._juegos.values() if juego.genero})
+
+    def _con_prefijo(self, prefijo):
+        """Ids de los juegos con alguna palabra que empieza por el prefijo"""
+        inicio = bisect.bisect_left(self._vocabulario, prefijo)
+        # Las palabras normalizadas son ASCII, así que prefijo + "~" acota el rango
+        fin = bisect.bisect_left(self._vocabulario, prefijo + "~", inicio)
+        ids = set()
+        for palabra in self._vocabulario[inicio:fin]:
+            ids |= self._palabras[palabra]
+        return ids
+
+    def _puntuacion(self, videojuego_id, consulta, palabras_consulta):
+        titulo = self._titulos[videojuego_id]
+        palabras_titulo = self._palabras_titulo[videojuego_id]
+        puntos = 0
+        for palabra in palabras_consulta:
+            # Coincidencia de palabra completa vale más que solo el prefijo
+            puntos += 2 if palabra in palabras_titulo else 1
+        if titulo == consulta:
+            puntos += 10
+        elif titulo.startswith(consulta):
+            puntos += 5
+        return puntos
+
+    def buscar(self, consulta="", genero=""):
+        """Juegos que contienen todas las palabras (por prefijo), por relevancia"""
+        consulta = normalizar(consulta)
+        genero = normalizar(genero)
+        palabras = consulta.split()
+
+        if palabras:
+            # Se empieza por el prefijo más largo, que suele dar menos candidatos
+            palabras_ordenadas = sorted(palabras, key=len, reverse=True)
+            candidatos = self._con_prefijo(palabras_ordenadas[0])
+            for palabra in palabras_ordenadas[1:]:
+                if not candidatos:
+                    break
+                candidatos &= self._con_prefijo(palabra)
+        else:
+            candidatos = set(self._juegos)
+
+        if genero:
+            candidatos = {i for i in candidatos if self._generos[i] == genero}
+
+        if not palabras:
+            return sorted((self._juegos[i] for i in candidatos), key=lambda j: (j.nombre, j.id))
+
+        puntuados = [(-self._puntuacion(i, consulta, palabras), self._juegos[i]) for i in candidatos]
+        puntuados.sort(key=lambda p: (p[0], p[1].nombre, p[1].id))
+        return [juego for _, juego in puntuados]
+
+    def sugerencias(self, prefijo, limite=8):
+        """Primeros juegos cuyo título, o alguna de sus palabras, empieza por el prefijo"""
+        prefijo = normalizar(prefijo)
+        if not prefijo:
+            return []
+
+        ids = []
+        inicio = bisect.bisect_left(self._titulos_ordenados, (prefijo,))
+        for titulo, videojuego_id in self._titulos_ordenados[inicio:inicio + limite]:
+            if not titulo.startswith(prefijo):
+                break
+            ids.append(videojuego_id)
+
+        if len(ids) < limite:
+            # Completar con títulos que tienen una palabra con ese prefijo
+            vistos = set(ids)
+            ultima = prefijo.split()[-1]
+            inicio = bisect.bisect_left(self._vocabulario, ultima)
+            fin = bisect.bisect_left(self._vocabulario, ultima + "~", inicio)
+            for palabra in self._vocabulario[inicio:fin]:
+                for videojuego_id in sorted(self._palabras[palabra] - vistos):
+                    if prefijo in self._titulos[videojuego_id]:
+                        ids.append(videojuego_id)
+                        vistos.add(videojuego_id)
+                        if len(ids) >= limite:
+                            return [self._juegos[i] for i in ids]
+        return [self._juegos[i] for i in ids]
@@ -0,0 +1,170 @@
+"""Compresión gzip/brotli y ETag para las páginas HTML y las respuestas JSON.
+
+Las páginas salen de TemplateResponse de una vez, así que el middleware
+acumula el cuerpo, calcula un ETag sobre el HTML sin comprimir y:
+
+- si el navegador ya tiene esa versión (If-None-Match) responde 304 sin cuerpo;
+- si no, comprime con la mejor codificación que acepte el cliente, siempre que
+  el cuerpo supere COMPRESION_MIN_BYTES.
+
+El ETag se calcula sobre el HTML y no sobre la versión del catálogo porque las
+páginas incluyen datos de la sesión (usuario, contador del carrito). La API
+JSON sí pone su propio ETag de versión y el middleware lo respeta.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Sin brotli se comprime solo en gzip
+    brotli = None
+
+
+COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+# Niveles pensados para contenido dinámico: buena relación a poco coste de CPU
+NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+CALIDAD_BROTLI = int(os.getenv("COMPRESION_CALIDAD_BROTLI", "5"))
+
+
+def codificaciones_aceptadas(accept_encoding):
+    """Codificaciones de Accept-Encoding con q > 0"""
+    aceptadas = set()
+    for parte in accept_encoding.split(","):
+        codificacion, _, parametros = parte.strip().partition(";")
+        parametros = parametros.replace(" ", "")
+        if parametros.startswith("q="):
+            try:
+                if float(parametros[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if codificacion:
+            aceptadas.add(codificacion.lower())
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding):
+    aceptadas = codificaciones_aceptadas(accept_encoding)
+    if brotli is not None and "br" in aceptadas:
+        return "br"
+    if "gzip" in aceptadas or "*" in aceptadas:
+        return "gzip"
+    return None
+
+
+def comprimir(cuerpo, codificacion):
+    if codificacion == "br":
+        return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return gzip.compress(cuerpo, NIVEL_GZIP, mtime=0)
+
+
+_lock = threading.Lock()
+_metricas = {
+    "respuestas": 0,
+    "comprimidas": 0,
+    "no_modificadas": 0,
+    "bytes_originales": 0,
+    "bytes_enviados": 0,
+    "segundos_compresion": 0.0,
+}
+
+
+def metricas():
+    """Contadores acumulados de todas las respuestas HTML y JSON del proceso"""
+    with _lock:
+        return dict(_metricas)
+
+
+def _contar(**valores):
+    with _lock:
+        for clave, valor in valores.items():
+            _metricas[clave] += valor
+
+
+def calcular_etag(cuerpo):
+    # Débil: el mismo HTML vale para cualquier codificación
+    return 'W/"' + hashlib.blake2b(cuerpo, digest_size=8).hexdigest() + '"'
+
+
+def coincide_etag(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    valor = etag[2:]
+    return any(parte.strip().removeprefix("W/") == valor for parte in if_none_match.split(","))
+
+
+class CompresionHTMLMiddleware:
+    """Middleware ASGI: ETag, 304 y compresión negociada para respuestas HTML y JSON"""
+
+    def __init__(self, app, min_bytes=COMPRESION_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        cabeceras_peticion = Headers(scope=scope)
+        inicio_respuesta = None
+        partes = []
+
+        async def enviar(mensaje):
+            nonlocal inicio_respuesta
+            if mensaje["type"] == "http.response.start":
+                cabeceras = Headers(raw=mensaje["headers"])
+                tipo = cabeceras.get("content-type", "")
+                comprimible = tipo.startswith("text/html") or tipo.startswith("application/json")
+                if mensaje["status"] != 200 or not comprimible or "content-encoding" in cabeceras:
+                    # Ni HTML ni JSON: se deja pasar tal cual
+                    inicio_respuesta = False
+                    await send(mensaje)
+                    return
+                inicio_respuesta = mensaje
+                return
+
+            if inicio_respuesta is False or mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            partes.append(mensaje.get("body", b""))
+            if mensaje.get("more_body", False):
+                return
+            await self._responder(inicio_respuesta, b"".join(partes), cabeceras_peticion, send)
+
+        await self.app(scope, receive, enviar)
+
+    async def _responder(self, inicio, cuerpo, cabeceras_peticion, send):
+        cabeceras = MutableHeaders(raw=list(inicio["headers"]))
+        etag = cabeceras.get("etag") or calcular_etag(cuerpo)
+        cabeceras["ETag"] = etag
+        cabeceras.add_vary_header("Accept-Encoding")
+
+        if coincide_etag(cabeceras_peticion.get("if-none-match", ""), etag):
+            del cabeceras["content-length"]
+            _contar(respuestas=1, no_modificadas=1, bytes_originales=len(cuerpo))
+            await send({"type": "http.response.start", "status": 304, "headers": cabeceras.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        original = len(cuerpo)
+        codificacion = None
+        if original >= self.min_bytes:
+            codificacion = elegir_codificacion(cabeceras_peticion.get("accept-encoding", ""))
+        segundos = 0.0
+        if codificacion:
+            inicio_compresion = time.perf_counter()
+            cuerpo = comprimir(cuerpo, codificacion)
+            segundos = time.perf_counter() - inicio_compresion
+            cabeceras["Content-Encoding"] = codificacion
+        cabeceras["Content-Length"] = str(len(cuerpo))
+
+        _contar(respuestas=1, comprimidas=1 if codificacion else 0, bytes_originales=original,
+                bytes_enviados=len(cuerpo), segundos_compresion=segundos)
+        await send({"type": "http.response.start", "status": 200, "headers": cabeceras.raw})
+        await send({"type": "http.response.body", "body": cuerpo})
@@ -0,0 +1,118 @@
+"""Cambios del catálogo en directo para las páginas abiertas (Server-Sent Events).
+
+Las páginas con tarjetas abren un EventSource contra /api/v1/cambios. El bus
+de cambios entrega cada Cambio desde el hilo que lo publicó o lo leyó; aquí
+se pasa al event loop del worker y se copia en la cola de cada conexión.
+
+Si una conexión no lee y su cola se llena, se vacía y recibe un evento
+"resincronizar": la página vuelve a pedir todas sus tarjetas. Cada conexión
+dura como mucho SSE_DURACION_SEG (el navegador se reconecta solo), así no
+retrasa indefinidamente el apagado del worker.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+
+SSE_MAX_CLIENTES = int(os.getenv("SSE_MAX_CLIENTES", "1000"))
+SSE_MAX_COLA = int(os.getenv("SSE_MAX_COLA", "100"))
+SSE_LATIDO_SEG = float(os.getenv("SSE_LATIDO_SEG", "15"))
+SSE_DURACION_SEG = float(os.getenv("SSE_DURACION_SEG", "300"))
+# Milisegundos que espera el navegador antes de reconectar
+SSE_REINTENTO_MS = int(os.getenv("SSE_REINTENTO_MS", "5000"))
+
+_RESINCRONIZAR = object()
+
+
+def evento(nombre, datos, id_evento=None):
+    """Texto de un evento SSE"""
+    texto = f"id: {id_evento}\n" if id_evento is not None else ""
+    return f"{texto}event: {nombre}\ndata: {json.dumps(datos)}\n\n"
+
+
+class DifusorCambios:
+    def __init__(self, max_clientes=SSE_MAX_CLIENTES, max_cola=SSE_MAX_COLA):
+        self.max_clientes = max_clientes
+        self.max_cola = max_cola
+        self._clientes = set()
+        self._loop = None
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.conexiones = 0
+        self.enviados = 0
+        self.desbordados = 0
+
+    def arrancar(self):
+        """Se llama desde el event loop del worker (en el arranque)"""
+        self._loop = asyncio.get_running_loop()
+
+    def lleno(self):
+        return len(self._clientes) >= self.max_clientes
+
+    def notificar(self, cambio):
+        """Suscriptor del bus; puede llamarse desde cualquier hilo"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._clientes:
+            return
+        try:
+            loop.call_soon_threadsafe(self._repartir, cambio)
+        except RuntimeError:
+            pass  # El loop se está cerrando
+
+    def _repartir(self, cambio):
+        for cola in list(self._clientes):
+            try:
+                cola.put_nowait(cambio)
+            except asyncio.QueueFull:
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait(_RESINCRONIZAR)
+                with self._lock:
+                    self.desbordados += 1
+
+    async def eventos(self, version, ultimo_id=None, latido=SSE_LATIDO_SEG, duracion=SSE_DURACION_SEG):
+        """Generador con el texto del flujo SSE de una conexión.
+
+        `version` es la del bus al conectar; si el navegador se reconecta con
+        otro Last-Event-ID se ha perdido algún cambio y se le pide resincronizar.
+        """
+        cola = asyncio.Queue(maxsize=self.max_cola)
+        self._clientes.add(cola)
+        with self._lock:
+            self.conexiones += 1
+        try:
+            yield f"retry: {SSE_REINTENTO_MS}\n\n"
+            if ultimo_id is not None and ultimo_id != str(version):
+                yield evento("resincronizar", {"version": version}, version)
+            fin = time.monotonic() + duracion
+            while True:
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    cambio = await asyncio.wait_for(cola.get(), min(latido, restante))
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": latido\n\n"
+                    continue
+                if cambio is _RESINCRONIZAR:
+                    yield evento("resincronizar", {})
+                    continue
+                with self._lock:
+                    self.enviados += 1
+                yield evento("cambio", cambio.a_dict(), cambio.version)
+        finally:
+            self._clientes.discard(cola)
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "clientes": len(self._clientes),
+                "max_clientes": self.max_clientes,
+                "conexiones": self.conexiones,
+                "enviados": self.enviados,
+                "desbordados": self.desbordados,
+            }
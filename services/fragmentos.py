@@ -0,0 +1,47 @@
+"""Caché de fragmentos HTML ya renderizados (la rejilla de tarjetas, la tabla de una consola).
+
+El fragmento solo depende de los juegos de la página, de si el usuario es
+admin y de si hay sesión iniciada; el resto de la página (cabecera, contador
+del carrito) se sigue renderizando en cada petición y el fragmento se inserta
+como Markup.
+
+La clave empieza por los ids de los juegos mostrados. Cuando el bus de
+cambios avisa de que un juego se ha editado o borrado solo se descartan los
+fragmentos que lo contienen; un juego nuevo no cambia ningún fragmento ya
+renderizado (las páginas que lo incluyen tienen otros ids).
+"""
+import os
+
+from markupsafe import Markup
+
+from data.cache import CacheLRU
+from data.cambios_catalogo import INSERTAR, IMPORTAR
+
+
+FRAGMENTOS_CACHE_MAX = int(os.getenv("FRAGMENTOS_CACHE_MAX", "256"))
+FRAGMENTOS_CACHE_TTL = float(os.getenv("FRAGMENTOS_CACHE_TTL", "600"))
+
+
+class CacheFragmentos:
+    def __init__(self, plantillas, max_entradas=FRAGMENTOS_CACHE_MAX, ttl=FRAGMENTOS_CACHE_TTL):
+        self.plantillas = plantillas  # Jinja2Templates de la aplicación
+        self.cache = CacheLRU(max_entradas=max_entradas, ttl=ttl)
+
+    def renderizar(self, plantilla, clave, **contexto):
+        """HTML del fragmento `plantilla` para `clave` = (ids, ...), renderizándolo solo si no está en caché"""
+        return self.cache.obtener(
+            (plantilla, clave),
+            lambda: Markup(self.plantillas.get_template(plantilla).render(**contexto))
+        )
+
+    def aplicar_cambio(self, cambio):
+        """Suscriptor del bus de cambios del catálogo"""
+        if cambio.tipo in (INSERTAR, IMPORTAR):
+            return
+        if cambio.videojuego_id is None:
+            self.cache.invalidar()
+            return
+        self.cache.invalidar(lambda clave: cambio.videojuego_id in clave[1][0])
+
+    def metricas(self):
+        return self.cache.metricas()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from services.metricas import metricas as registro_metricas
+
+
+# Factor de trabajo de bcrypt; al subirlo los hashes antiguos se rehacen en el login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Hashes que se calculan a la vez y cuántos más pueden esperar en cola
+BCRYPT_MAX_CONCURRENCIA = int(os.getenv("BCRYPT_MAX_CONCURRENCIA", str(os.cpu_count() or 2)))
+BCRYPT_MAX_COLA = int(os.getenv("BCRYPT_MAX_COLA", "64"))
+
+
+class ColaHashLlena(Exception):
+    """Hay demasiadas operaciones de bcrypt pendientes"""
+
+
+class ServicioHash:
+    """Cifrado y verificación de contraseñas con bcrypt fuera del event loop.
+
+    bcrypt libera el GIL, así que un pool de hilos acotado reparte el coste de
+    CPU sin congelar el resto de peticiones. Si la cola se llena se rechaza la
+    operación en lugar de acumular trabajo.
+    """
+
+    def __init__(self, rondas=BCRYPT_ROUNDS, max_concurrencia=BCRYPT_MAX_CONCURRENCIA,
+                 max_cola=BCRYPT_MAX_COLA):
+        self.rondas = rondas
+        self.max_concurrencia = max_concurrencia
+        self.max_cola = max_cola
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.pendientes = 0
+        self.completadas = 0
+        self.rechazadas = 0
+
+    def hashear_sync(self, contraseña):
+        """Cifra la contraseña con bcrypt"""
+        salt = bcrypt.gensalt(self.rondas)
+        return bcrypt.hashpw(contraseña.encode(), salt).decode()
+
+    def verificar_sync(self, contraseña, hash_guardado):
+        """Verifica si la contraseña coincide con el hash"""
+        return bcrypt.checkpw(contraseña.encode(), hash_guardado.encode())
+
+    def necesita_rehash(self, hash_guardado):
+        """True si el hash se generó con menos rondas que las configuradas"""
+        try:
+            # Formato: $2b$<rondas>$<salt+hash>
+            return int(hash_guardado.split("$")[2]) < self.rondas
+        except (IndexError, ValueError):
+            return True
+
+    async def _ejecutar(self, funcion, *args):
+        with self._lock:
+            if self.pendientes >= self.max_concurrencia + self.max_cola:
+                self.rechazadas += 1
+                raise ColaHashLlena(f"{self.pendientes} operaciones de bcrypt pendientes")
+            self.pendientes += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with registro_metricas.cronometro(registro_metricas.bcrypt, operacion=funcion.__name__):
+                return await loop.run_in_executor(self._executor, funcion, *args)
+        finally:
+            with self._lock:
+                self.pendientes -= 1
+                self.completadas += 1
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "max_concurrencia": self.max_concurrencia,
+                "pendientes": self.pendientes,
+                "completadas": self.completadas,
+                "rechazadas": self.rechazadas,
+            }
+
+    async def hashear(self, contraseña):
+        return await self._ejecutar(self.hashear_sync, contraseña)
+
+    async def verificar(self, contraseña, hash_guardado):
+        return await self._ejecutar(self.verificar_sync, contraseña, hash_guardado)
+
+
+servicio_hash = ServicioHash()
@@ -0,0 +1,190 @@
+"""Derivados de las portadas: miniaturas en WebP (y AVIF si Pillow lo soporta).
+
+Las portadas originales son PNG de 500-700 KB y una tarjeta del catálogo se
+muestra a unos 300 px de ancho. Para cada portada se generan varias anchuras
+en static/derivados/<nombre>-<ancho>.<formato> y las plantillas las ofrecen
+con srcset, dejando el PNG original como último recurso.
+
+Rellenar los derivados de las portadas que ya existen:
+
+    python -m services.imagenes             # genera los que falten
+    python -m services.imagenes --todas     # regenera todos
+    python -m services.imagenes --informe   # bytes ahorrados por página
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from services.assets import manifiesto
+
+try:
+    from PIL import Image, features
+except ImportError:  # Sin Pillow se sirven solo los PNG originales
+    Image = None
+
+
+DIRECTORIO_STATIC = Path(__file__).resolve().parent.parent / "static"
+DIRECTORIO_DERIVADOS = DIRECTORIO_STATIC / "derivados"
+
+ANCHOS = (160, 320, 480)
+CALIDAD = {"webp": 80, "avif": 55}
+# Imágenes de static/ que no son portadas de juegos
+PREFIJOS_NO_PORTADA = ("icono-", "nav-", "fondo-")
+
+
+def formatos_disponibles():
+    """Formatos que este Pillow sabe escribir, del más ligero al más pesado"""
+    if Image is None:
+        return ()
+    return tuple(formato for formato in ("avif", "webp") if features.check(formato))
+
+
+# {(nombre, formato): [anchos]} junto al mtime del directorio con el que se escaneó.
+# Otro worker puede generar derivados (subida de una portada); al crear o
+# renombrar un archivo cambia el mtime del directorio y se vuelve a escanear.
+_disponibles = None
+_mtime_escaneo = None
+_lock = threading.Lock()
+
+
+def _mtime_directorio():
+    try:
+        return DIRECTORIO_DERIVADOS.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _escanear():
+    disponibles = {}
+    if DIRECTORIO_DERIVADOS.is_dir():
+        for ruta in DIRECTORIO_DERIVADOS.iterdir():
+            if ruta.name.startswith("."):  # temporales a medio escribir
+                continue
+            nombre, _, ancho = ruta.stem.rpartition("-")
+            if nombre and ancho.isdigit():
+                disponibles.setdefault((nombre, ruta.suffix[1:]), []).append(int(ancho))
+    for anchos in disponibles.values():
+        anchos.sort()
+    return disponibles
+
+
+def anchos_disponibles(nombre, formato):
+    global _disponibles, _mtime_escaneo
+    mtime = _mtime_directorio()
+    with _lock:
+        if _disponibles is None or mtime != _mtime_escaneo:
+            _disponibles, _mtime_escaneo = _escanear(), mtime
+        return _disponibles.get((nombre, formato), [])
+
+
+def url_derivado(nombre, ancho, formato):
+    return manifiesto.url(f"derivados/{nombre}-{ancho}.{formato}")
+
+
+def srcset_portada(nombre, formato):
+    """Valor de srcset con todas las anchuras generadas, o "" si no hay derivados"""
+    return ", ".join(
+        f"{url_derivado(nombre, ancho, formato)} {ancho}w"
+        for ancho in anchos_disponibles(nombre, formato)
+    )
+
+
+def _guardar(imagen, destino, formato):
+    """Escribe en un temporal del mismo directorio y lo renombra sobre `destino`,
+    así nunca se sirve un derivado a medio escribir"""
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix=f".{destino.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            imagen.save(archivo, formato.upper(), quality=CALIDAD[formato])
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.unlink(temporal)
+        except OSError:
+            pass
+        raise
+
+
+def generar_derivados(ruta_png, formatos=None):
+    """Genera las miniaturas de una portada. Devuelve las rutas escritas"""
+    global _disponibles
+    if Image is None:
+        return []
+    formatos = formatos or formatos_disponibles()
+    ruta_png = Path(ruta_png)
+    DIRECTORIO_DERIVADOS.mkdir(exist_ok=True)
+
+    escritas = []
+    with Image.open(ruta_png) as original:
+        imagen = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+        # No se amplía: las anchuras mayores que el original se quedan en la del
+        # original, y el derivado se nombra (y se anuncia en srcset) con la real
+        for ancho in sorted({min(ancho, imagen.width) for ancho in ANCHOS}):
+            alto = round(imagen.height * ancho / imagen.width)
+            reducida = imagen.resize((ancho, alto), Image.LANCZOS)
+            for formato in formatos:
+                destino = DIRECTORIO_DERIVADOS / f"{ruta_png.stem}-{ancho}.{formato}"
+                _guardar(reducida, destino, formato)
+                escritas.append(destino)
+
+    # Derivados de una versión anterior de la portada con otras anchuras
+    for ruta in DIRECTORIO_DERIVADOS.iterdir():
+        nombre, _, ancho = ruta.stem.rpartition("-")
+        if nombre == ruta_png.stem and ancho.isdigit() and ruta.suffix[1:] in formatos and ruta not in escritas:
+            ruta.unlink(missing_ok=True)
+
+    with _lock:
+        _disponibles = None
+    return escritas
+
+
+def portadas():
+    """Portadas PNG de static/, sin iconos ni fondos"""
+    return sorted(
+        ruta for ruta in DIRECTORIO_STATIC.glob("*.PNG")
+        if not ruta.name.startswith(PREFIJOS_NO_PORTADA)
+    )
+
+
+def informe(juegos_por_pagina=24, ancho_tarjeta=320):
+    """Bytes de una página del catálogo con PNG frente a los derivados de la tarjeta"""
+    lista = portadas()
+    if not lista:
+        print("No hay portadas en static/")
+        return
+    total_png = sum(ruta.stat().st_size for ruta in lista)
+    print(f"{len(lista)} portadas, {total_png / 1e6:.1f} MB en PNG")
+    media_png = total_png / len(lista)
+
+    for formato in formatos_disponibles():
+        rutas = [DIRECTORIO_DERIVADOS / f"{ruta.stem}-{ancho_tarjeta}.{formato}" for ruta in lista]
+        existentes = [ruta for ruta in rutas if ruta.exists()]
+        if not existentes:
+            print(f"{formato}: sin derivados (ejecuta python -m services.imagenes)")
+            continue
+        media = sum(ruta.stat().st_size for ruta in existentes) / len(existentes)
+        print(f"{formato} {ancho_tarjeta}px: página de {juegos_por_pagina} juegos "
+              f"{media * juegos_por_pagina / 1e6:.2f} MB frente a {media_png * juegos_por_pagina / 1e6:.2f} MB "
+              f"en PNG ({100 * (1 - media / media_png):.0f}% menos)")
+
+
+def main(argumentos):
+    if "--informe" in argumentos:
+        informe()
+        return
+    if Image is None:
+        print("Pillow no está instalado")
+        return
+    todas = "--todas" in argumentos
+    for ruta in portadas():
+        existe = bool(anchos_disponibles(ruta.stem, "webp"))
+        if existe and not todas:
+            continue
+        escritas = generar_derivados(ruta)
+        print(f"{ruta.name}: {len(escritas)} derivados")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+from domain.model.videojuego import Videojuego
+
+
+CONSOLAS_VALIDAS = ("PlayStation", "Xbox", "Switch", "Steam")
+
+
+def _consolas(valor):
+    """Acepta una lista o un texto separado por | , o ;"""
+    if isinstance(valor, str):
+        for separador in ",;":
+            valor = valor.replace(separador, "|")
+        valor = valor.split("|")
+    return [consola.strip() for consola in valor or [] if consola and consola.strip()]
+
+
+def _videojuego(fila, numero):
+    try:
+        videojuego = Videojuego(
+            None,
+            str(fila["nombre"]).strip(),
+            float(fila["precio"]),
+            str(fila["genero"]).strip(),
+            float(fila["valoracion"])
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Fila {numero}: {e}")
+    if not videojuego.nombre:
+        raise ValueError(f"Fila {numero}: el nombre está vacío")
+
+    consolas = _consolas(fila.get("consolas", ""))
+    desconocidas = [consola for consola in consolas if consola not in CONSOLAS_VALIDAS]
+    if desconocidas:
+        raise ValueError(f"Fila {numero}: consolas desconocidas {desconocidas}")
+    return videojuego, consolas
+
+
+def leer_catalogo(nombre_archivo, contenido):
+    """Convierte un CSV o JSON en [(Videojuego, [consolas]), ...].
+
+    CSV con cabecera nombre,precio,genero,valoracion,consolas (consolas
+    separadas por |) o JSON con una lista de objetos con esas claves.
+    Lanza ValueError con el número de fila si alguna no es válida.
+    """
+    texto = contenido.decode("utf-8-sig")
+    if nombre_archivo.lower().endswith(".json"):
+        try:
+            filas = json.loads(texto)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON no válido: {e}")
+        if not isinstance(filas, list):
+            raise ValueError("El JSON debe ser una lista de videojuegos")
+    else:
+        filas = list(csv.DictReader(io.StringIO(texto)))
+
+    return [_videojuego(fila, numero) for numero, fila in enumerate(filas, start=1)]
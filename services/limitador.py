@@ -0,0 +1,183 @@
+"""Límite de intentos de /login y /registro por IP y por correo (token bucket).
+
+Cada clave tiene un cubo de `maximo` fichas que se rellena a razón de
+maximo / LIMITE_VENTANA_SEG por segundo; cada intento gasta una. Sin fichas
+la petición recibe un 429 antes de pedir conexión a la base de datos o de
+llegar a bcrypt.
+
+Backends:
+- "memoria" (por defecto): cubos en el proceso. Con varios workers cada uno
+  lleva su cuenta, así que el límite efectivo se multiplica por los workers.
+- "redis": cubos compartidos en REDIS_URL (necesita `pip install redis`).
+  Si Redis no responde se deja pasar la petición: el limitador no debe
+  tumbar el login.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+
+LIMITADOR_BACKEND = os.getenv("LIMITADOR_BACKEND", "memoria")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LIMITADOR_MAX_CLAVES = int(os.getenv("LIMITADOR_MAX_CLAVES", "100000"))
+LIMITE_VENTANA_SEG = float(os.getenv("LIMITE_VENTANA_SEG", "60"))
+# Intentos por ventana; 0 desactiva el límite
+LOGIN_MAX_POR_IP = int(os.getenv("LOGIN_MAX_POR_IP", "20"))
+LOGIN_MAX_POR_CORREO = int(os.getenv("LOGIN_MAX_POR_CORREO", "5"))
+REGISTRO_MAX_POR_IP = int(os.getenv("REGISTRO_MAX_POR_IP", "5"))
+REGISTRO_MAX_POR_CORREO = int(os.getenv("REGISTRO_MAX_POR_CORREO", "3"))
+
+
+class LimiteSuperado(Exception):
+    """Demasiados intentos; `espera` son los segundos hasta la siguiente ficha"""
+
+    def __init__(self, espera):
+        super().__init__(f"Reintentar en {espera:.1f}s")
+        self.espera = espera
+
+
+class BackendMemoria:
+    """Cubos en un dict del proceso, acotado con expulsión LRU"""
+
+    def __init__(self, max_claves=LIMITADOR_MAX_CLAVES, reloj=time.monotonic):
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self._cubos = OrderedDict()  # clave -> (fichas, instante)
+        self._lock = threading.Lock()
+
+    async def consumir(self, clave, capacidad, por_segundo):
+        """Gasta una ficha; devuelve (admitido, segundos hasta la siguiente ficha)"""
+        ahora = self.reloj()
+        with self._lock:
+            fichas, instante = self._cubos.get(clave, (capacidad, ahora))
+            fichas = min(capacidad, fichas + (ahora - instante) * por_segundo)
+            admitido = fichas >= 1
+            if admitido:
+                fichas -= 1
+            self._cubos[clave] = (fichas, ahora)
+            self._cubos.move_to_end(clave)
+            while len(self._cubos) > self.max_claves:
+                self._cubos.popitem(last=False)
+        return admitido, 0.0 if admitido else (1 - fichas) / por_segundo
+
+    async def olvidar(self, clave):
+        with self._lock:
+            self._cubos.pop(clave, None)
+
+
+# Rellena y gasta en una sola operación atómica; el reloj es el de Redis,
+# el mismo para todos los workers y máquinas
+_SCRIPT_CUBO = """
+local capacidad = tonumber(ARGV[1])
+local por_segundo = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local datos = redis.call('HMGET', KEYS[1], 'fichas', 'instante')
+local fichas = tonumber(datos[1]) or capacidad
+local instante = tonumber(datos[2]) or ahora
+fichas = math.min(capacidad, fichas + (ahora - instante) * por_segundo)
+local admitido = 0
+local espera = 0
+if fichas >= 1 then
+    fichas = fichas - 1
+    admitido = 1
+else
+    espera = (1 - fichas) / por_segundo
+end
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas), 'instante', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / por_segundo) + 1)
+return {admitido, tostring(espera)}
+"""
+
+
+class BackendRedis:
+    """Cubos compartidos entre workers en Redis"""
+
+    def __init__(self, url=REDIS_URL, prefijo="gameatlas:limite:"):
+        if redis_asyncio is None:
+            raise RuntimeError("LIMITADOR_BACKEND=redis necesita el paquete redis (pip install redis)")
+        self.prefijo = prefijo
+        self._cliente = redis_asyncio.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._script = self._cliente.register_script(_SCRIPT_CUBO)
+
+    async def consumir(self, clave, capacidad, por_segundo):
+        admitido, espera = await self._script(keys=[self.prefijo + clave], args=[capacidad, por_segundo])
+        return bool(admitido), float(espera)
+
+    async def olvidar(self, clave):
+        await self._cliente.delete(self.prefijo + clave)
+
+
+def crear_backend(nombre=LIMITADOR_BACKEND):
+    if nombre == "redis":
+        return BackendRedis()
+    return BackendMemoria()
+
+
+class Limitador:
+    """Reglas por acción: {"login": (max_por_ip, max_por_correo), ...}"""
+
+    def __init__(self, backend, reglas, ventana=LIMITE_VENTANA_SEG):
+        self.backend = backend
+        self.reglas = reglas
+        self.ventana = ventana
+        self._contadores = {}
+        self._lock = threading.Lock()
+        self.errores_backend = 0
+
+    def _contar(self, nombre):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + 1
+
+    async def _consumir(self, clave, maximo):
+        if not maximo:
+            return True, 0.0
+        try:
+            return await self.backend.consumir(clave, maximo, maximo / self.ventana)
+        except Exception as e:
+            # Sin backend se deja pasar: mejor sin límite que sin login
+            self.errores_backend += 1
+            print(f"Error en el limitador ({clave}): {e}")
+            return True, 0.0
+
+    async def admitir(self, accion, ip, correo):
+        """Gasta un intento de la IP y otro del correo; LimiteSuperado si alguno se agotó"""
+        max_ip, max_correo = self.reglas[accion]
+        admitido, espera = await self._consumir(f"{accion}:ip:{ip}", max_ip)
+        if not admitido:
+            self._contar(f"{accion}_rechazadas_ip")
+            raise LimiteSuperado(espera)
+        admitido, espera = await self._consumir(f"{accion}:correo:{correo.strip().lower()}", max_correo)
+        if not admitido:
+            self._contar(f"{accion}_rechazadas_correo")
+            raise LimiteSuperado(espera)
+        self._contar(f"{accion}_admitidas")
+
+    async def olvidar(self, accion, correo):
+        """Devuelve los intentos del correo (p. ej. tras un login correcto)"""
+        try:
+            await self.backend.olvidar(f"{accion}:correo:{correo.strip().lower()}")
+        except Exception as e:
+            self.errores_backend += 1
+            print(f"Error en el limitador ({accion}): {e}")
+
+    def metricas(self):
+        with self._lock:
+            valores = dict(self._contadores)
+        for accion in self.reglas:
+            for nombre in ("admitidas", "rechazadas_ip", "rechazadas_correo"):
+                valores.setdefault(f"{accion}_{nombre}", 0)
+        valores["errores_backend"] = self.errores_backend
+        return valores
+
+
+limitador = Limitador(crear_backend(), {
+    "login": (LOGIN_MAX_POR_IP, LOGIN_MAX_POR_CORREO),
+    "registro": (REGISTRO_MAX_POR_IP, REGISTRO_MAX_POR_CORREO),
+})
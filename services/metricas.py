@@ -0,0 +1,209 @@
+"""Métricas de la aplicación en formato Prometheus.
+
+Se recogen:
+- latencia por ruta (MetricasMiddleware) y tamaño de la cookie de sesión;
+- duración y filas devueltas de cada método de los repositorios (RepositorioAsync);
+- tiempo de renderizado de cada plantilla (PlantillasMedidas);
+- duración de bcrypt (ServicioHash) y de los cobros (ProcesadorPagos);
+- el estado del pool, las cachés y la compresión, que se leen al exportar.
+
+Las consultas que superan SLOW_QUERY_MS milisegundos se escriben en el log
+(0 lo desactiva). Se exportan en /metrics.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+from fastapi.templating import Jinja2Templates
+from starlette.datastructures import Headers
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+PREFIJO = "gameatlas"
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_FILAS = (0, 1, 10, 25, 100, 1000, 10000)
+BUCKETS_BYTES = (128, 256, 512, 1024, 2048, 4096)
+
+
+def nombre_metrica(texto):
+    """'tamaño' -> 'tamano': Prometheus solo admite [a-zA-Z0-9_]"""
+    ascii_ = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-zA-Z0-9_]", "_", ascii_)
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = ",".join(
+        f'{clave}="' + str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for clave, valor in etiquetas
+    )
+    return "{" + pares + "}"
+
+
+class Histograma:
+    """Histograma acumulado por combinación de etiquetas"""
+
+    def __init__(self, nombre, ayuda, buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exportar(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(clave, list(serie)) for clave, serie in self._series.items()]
+        for clave, serie in sorted(series):
+            for limite, conteo in zip(self.buckets, serie):
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', limite),))} {conteo}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', '+Inf'),))} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {serie[-1]}")
+        return lineas
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self.peticiones = Histograma(f"{PREFIJO}_peticion_segundos", "Latencia de las peticiones por ruta")
+        self.consultas = Histograma(f"{PREFIJO}_repositorio_segundos", "Duración de los métodos de los repositorios")
+        self.filas = Histograma(f"{PREFIJO}_repositorio_filas", "Filas devueltas por los métodos de los repositorios",
+                                BUCKETS_FILAS)
+        self.plantillas = Histograma(f"{PREFIJO}_plantilla_segundos", "Tiempo de renderizado de las plantillas")
+        self.bcrypt = Histograma(f"{PREFIJO}_bcrypt_segundos", "Duración de bcrypt, incluida la espera en cola")
+        self.pagos = Histograma(f"{PREFIJO}_pago_segundos", "Duración del cobro en la pasarela por resultado")
+        self.cookie_sesion = Histograma(f"{PREFIJO}_cookie_sesion_bytes", "Tamaño de la cookie de sesión recibida",
+                                        BUCKETS_BYTES)
+        self._fuentes = []  # (nombre, función que devuelve un dict de valores)
+        self.consultas_lentas = 0
+
+    def fuente(self, nombre, funcion):
+        """Registra un dict de valores (p. ej. pool.metricas) que se exporta como gauges"""
+        self._fuentes.append((nombre, funcion))
+
+    @contextmanager
+    def cronometro(self, histograma, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            histograma.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def observar_consulta(self, repositorio, metodo, segundos, resultado):
+        if resultado is None:
+            filas = 0
+        elif isinstance(resultado, list):
+            filas = len(resultado)
+        else:
+            filas = 1
+        self.consultas.observar(segundos, repositorio=repositorio, metodo=metodo)
+        self.filas.observar(filas, repositorio=repositorio, metodo=metodo)
+        if SLOW_QUERY_MS and segundos * 1000 >= SLOW_QUERY_MS:
+            self.consultas_lentas += 1
+            print(f"Consulta lenta: {repositorio}.{metodo} {segundos * 1000:.1f} ms, {filas} filas")
+
+    def exportar(self):
+        lineas = []
+        for histograma in (self.peticiones, self.consultas, self.filas, self.plantillas, self.bcrypt,
+                           self.pagos, self.cookie_sesion):
+            lineas += histograma.exportar()
+
+        nombre = f"{PREFIJO}_consultas_lentas_total"
+        lineas += [f"# TYPE {nombre} counter", f"{nombre} {self.consultas_lentas}"]
+
+        for fuente, funcion in self._fuentes:
+            try:
+                valores = funcion()
+            except Exception as e:
+                print(f"Error al leer las métricas de {fuente}: {e}")
+                continue
+            for clave, valor in valores.items():
+                if isinstance(valor, (int, float)):
+                    nombre = f"{PREFIJO}_{nombre_metrica(fuente)}_{nombre_metrica(clave)}"
+                    lineas += [f"# TYPE {nombre} gauge", f"{nombre} {float(valor)}"]
+        return "\n".join(lineas) + "\n"
+
+
+metricas = RegistroMetricas()
+
+
+class MetricasMiddleware:
+    """Middleware ASGI: latencia por ruta (la plantilla de la ruta, no la URL) y tamaño de la cookie"""
+
+    def __init__(self, app, registro=metricas, cookie="session"):
+        self.app = app
+        self.registro = registro
+        self.cookie = cookie
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookies = Headers(scope=scope).get("cookie", "")
+        for parte in cookies.split(";"):
+            nombre, _, valor = parte.strip().partition("=")
+            if nombre == self.cookie:
+                self.registro.cookie_sesion.observar(len(valor))
+
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # El router deja la ruta encontrada en el scope; los montajes (/static) su root_path
+            ruta = scope.get("route")
+            plantilla = getattr(ruta, "path", None) or scope.get("root_path") or "sin_ruta"
+            self.registro.peticiones.observar(
+                time.perf_counter() - inicio,
+                ruta=plantilla, metodo=scope["method"], estado=estado[0]
+            )
+
+
+class PlantillaMedida:
+    """Plantilla de Jinja2 que mide cuánto tarda render()"""
+
+    def __init__(self, plantilla, registro):
+        self._plantilla = plantilla
+        self._registro = registro
+
+    def __getattr__(self, nombre):
+        return getattr(self._plantilla, nombre)
+
+    def render(self, *args, **kwargs):
+        with self._registro.cronometro(self._registro.plantillas, plantilla=self._plantilla.name):
+            return self._plantilla.render(*args, **kwargs)
+
+
+class PlantillasMedidas(Jinja2Templates):
+    """Jinja2Templates que registra el tiempo de renderizado de cada TemplateResponse"""
+
+    def __init__(self, *args, registro=metricas, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.registro = registro
+
+    def get_template(self, name):
+        return PlantillaMedida(super().get_template(name), self.registro)
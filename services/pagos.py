@@ -0,0 +1,183 @@
+"""Cobro de los pedidos en segundo plano a través de una pasarela intercambiable.
+
+/procesar-pago solo guarda el pedido (pendiente) y lo encola; el procesador
+llama a la pasarela desde su propio pool de hilos y deja el pedido pagado,
+rechazado o fallido. La página del pedido consulta el estado mientras tanto.
+
+PASARELA_PAGO elige la pasarela: "falsa" (por defecto, para desarrollo y
+benchmarks) o la ruta "paquete.modulo:Clase" de una subclase de PasarelaPago.
+"""
+import asyncio
+import importlib
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+from domain.model.pedido import PAGADO, RECHAZADO, FALLIDO
+from services.metricas import metricas as registro_metricas
+
+
+PASARELA_PAGO = os.getenv("PASARELA_PAGO", "falsa")
+# Cobros en curso a la vez por worker y pedidos que pueden esperar en cola
+PAGOS_CONCURRENCIA = int(os.getenv("PAGOS_CONCURRENCIA", "4"))
+PAGOS_MAX_COLA = int(os.getenv("PAGOS_MAX_COLA", "1000"))
+# Segundos que se espera al parar a que terminen los cobros encolados
+PAGOS_ESPERA_CIERRE = float(os.getenv("PAGOS_ESPERA_CIERRE", "20"))
+PAGO_FALSO_LATENCIA = float(os.getenv("PAGO_FALSO_LATENCIA", "0.2"))
+
+
+class ColaPagosLlena(Exception):
+    """Hay demasiados cobros pendientes en este worker"""
+
+
+class ResultadoPago:
+    def __init__(self, aprobado, referencia=None, error=None):
+        self.aprobado = aprobado
+        self.referencia = referencia
+        self.error = error
+
+
+class PasarelaPago(ABC):
+    """Proveedor de pagos. cobrar() se llama desde un hilo y puede bloquear.
+
+    `clave` identifica el cobro: repetirlo con la misma clave no debe cobrar
+    dos veces (los proveedores reales aceptan una clave de idempotencia).
+    """
+
+    @abstractmethod
+    def cobrar(self, clave, importe, metodo_pago, datos):
+        """Devuelve un ResultadoPago; una excepción deja el pedido como fallido"""
+
+
+class PasarelaFalsa(PasarelaPago):
+    """Pasarela local: tarda `latencia` segundos y aprueba todo salvo las
+    tarjetas que terminan en 0002, como las de prueba de los proveedores"""
+
+    def __init__(self, latencia=PAGO_FALSO_LATENCIA):
+        self.latencia = latencia
+        self._cobros = {}  # clave -> ResultadoPago
+        self._lock = threading.Lock()
+
+    def cobrar(self, clave, importe, metodo_pago, datos):
+        with self._lock:
+            if clave in self._cobros:
+                return self._cobros[clave]
+        time.sleep(self.latencia)
+        numero = "".join(c for c in (datos.get("numero_tarjeta") or "") if c.isdigit())
+        if metodo_pago == "tarjeta" and numero.endswith("0002"):
+            resultado = ResultadoPago(False, error="Tarjeta rechazada")
+        else:
+            resultado = ResultadoPago(True, referencia=uuid.uuid4().hex[:16].upper())
+        with self._lock:
+            return self._cobros.setdefault(clave, resultado)
+
+
+def crear_pasarela(nombre=PASARELA_PAGO):
+    if nombre == "falsa":
+        return PasarelaFalsa()
+    modulo, _, clase = nombre.partition(":")
+    return getattr(importlib.import_module(modulo), clase)()
+
+
+class ProcesadorPagos:
+    """Cola de cobros del worker atendida por `concurrencia` tareas.
+
+    `guardar(pedido_id, estado, referencia, error)` es síncrona (escribe en la
+    base de datos) y se ejecuta en el mismo hilo que el cobro. Los datos de la
+    tarjeta solo viven en la cola, nunca se guardan.
+    """
+
+    def __init__(self, pasarela, guardar, concurrencia=PAGOS_CONCURRENCIA, max_cola=PAGOS_MAX_COLA,
+                 registro=registro_metricas):
+        self.pasarela = pasarela
+        self.guardar = guardar
+        self.concurrencia = concurrencia
+        self.max_cola = max_cola
+        self._registro = registro
+        self._executor = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="pagos")
+        self._cola = None
+        self._tareas = []
+        # Id de este worker en los pedidos que encola; se crea al arrancar, no
+        # al importar, para que cada worker tenga el suyo aunque se haga fork
+        self.propietario = None
+        self.en_curso = 0
+
+        # Métricas
+        self.encolados = 0
+        self.pagados = 0
+        self.rechazados = 0
+        self.fallidos = 0
+
+    def arrancar(self):
+        """Crea la cola y las tareas en el event loop del worker"""
+        self.propietario = uuid.uuid4().hex
+        self._cola = asyncio.Queue()
+        self._tareas = [asyncio.create_task(self._atender()) for _ in range(self.concurrencia)]
+
+    async def detener(self, espera=PAGOS_ESPERA_CIERRE):
+        """Espera a que se vacíe la cola (como mucho `espera` segundos) y para las tareas"""
+        if self._cola is None:
+            return
+        try:
+            await asyncio.wait_for(self._cola.join(), espera)
+        except asyncio.TimeoutError:
+            print(f"Quedan {self._cola.qsize()} cobros sin procesar al parar")
+        for tarea in self._tareas:
+            tarea.cancel()
+        self._executor.shutdown(wait=False)
+
+    def lleno(self):
+        return self._cola is not None and self._cola.qsize() >= self.max_cola
+
+    def encolar(self, pedido_id, importe, metodo_pago, datos):
+        if self._cola is None:
+            raise RuntimeError("El procesador de pagos no está arrancado")
+        if self.lleno():
+            raise ColaPagosLlena()
+        self._cola.put_nowait((pedido_id, importe, metodo_pago, datos))
+        self.encolados += 1
+        self.en_curso += 1
+
+    async def _atender(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            trabajo = await self._cola.get()
+            try:
+                await loop.run_in_executor(self._executor, self._procesar, *trabajo)
+            except Exception as e:
+                print(f"Error al guardar el cobro del pedido {trabajo[0]}: {e}")
+            finally:
+                self.en_curso -= 1
+                self._cola.task_done()
+
+    def _procesar(self, pedido_id, importe, metodo_pago, datos):
+        inicio = time.perf_counter()
+        try:
+            resultado = self.pasarela.cobrar(f"pedido-{pedido_id}", importe, metodo_pago, datos)
+            estado = PAGADO if resultado.aprobado else RECHAZADO
+        except Exception as e:
+            print(f"Error de la pasarela en el pedido {pedido_id}: {e}")
+            resultado = ResultadoPago(False, error="No se pudo contactar con la pasarela de pago")
+            estado = FALLIDO
+        self._registro.pagos.observar(time.perf_counter() - inicio, resultado=estado)
+        if estado == PAGADO:
+            self.pagados += 1
+        elif estado == RECHAZADO:
+            self.rechazados += 1
+        else:
+            self.fallidos += 1
+        self.guardar(pedido_id, estado, resultado.referencia, resultado.error)
+
+    def metricas(self):
+        return {
+            "en_cola": self._cola.qsize() if self._cola is not None else 0,
+            "en_curso": self.en_curso,
+            "max_cola": self.max_cola,
+            "encolados": self.encolados,
+            "pagados": self.pagados,
+            "rechazados": self.rechazados,
+            "fallidos": self.fallidos,
+        }
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import HTMLResponse
+
+
+# Tamaño máximo de una portada y tamaño de cada bloque que se escribe a disco
+PORTADA_MAX_BYTES = int(os.getenv("PORTADA_MAX_BYTES", str(5 * 1024 * 1024)))
+TAMAÑO_BLOQUE = 64 * 1024
+# Lo que ocupan en el cuerpo de la petición el resto de campos del formulario
+# y los separadores multipart, además de la propia portada
+MARGEN_FORMULARIO = 64 * 1024
+
+FIRMA_PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class PortadaNoValida(Exception):
+    """La portada no es un PNG o supera el tamaño máximo"""
+
+
+class CuerpoDemasiadoGrande(Exception):
+    """El cuerpo de la subida ya supera el máximo; se deja de leer"""
+
+
+class LimiteSubidaMiddleware:
+    """Middleware ASGI: 413 para las subidas de portadas mayores que el máximo.
+
+    Starlette recibe y guarda en un temporal el formulario entero antes de
+    llamar a la ruta, así que guardar_portada llega tarde para ahorrar red y
+    disco. Aquí se rechaza por Content-Length antes de leer nada y, si no lo
+    hay (chunked), en cuanto lo recibido supera el máximo.
+    """
+
+    def __init__(self, app, rutas, max_bytes=PORTADA_MAX_BYTES):
+        self.app = app
+        self.rutas = set(rutas)
+        self.limite = max_bytes + MARGEN_FORMULARIO
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.rutas:
+            await self.app(scope, receive, send)
+            return
+
+        longitud = Headers(scope=scope).get("content-length", "")
+        if longitud.isdigit() and int(longitud) > self.limite:
+            await self.rechazar(scope, receive, send)
+            return
+
+        recibidos, excedido = 0, False
+
+        async def recibir():
+            nonlocal recibidos, excedido
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > self.limite:
+                    excedido = True
+                    raise CuerpoDemasiadoGrande()
+            return mensaje
+
+        async def enviar(mensaje):
+            # Si el parser convirtió el corte en otro error, esa respuesta no sale
+            if not excedido:
+                await send(mensaje)
+
+        try:
+            await self.app(scope, recibir, enviar)
+        except CuerpoDemasiadoGrande:
+            pass
+        if excedido:
+            await self.rechazar(scope, receive, send)
+
+    async def rechazar(self, scope, receive, send):
+        respuesta = HTMLResponse(f"La portada supera el máximo de {self.max_bytes} bytes", status_code=413,
+                                 headers={"Connection": "close"})
+        await respuesta(scope, receive, send)
+
+
+async def guardar_portada(portada, destino, max_bytes=PORTADA_MAX_BYTES):
+    """Guarda la portada subida en `destino` por bloques y sin cargarla entera en memoria.
+
+    Se escribe en un temporal del mismo directorio y se renombra al final, así
+    nunca se sirve una portada a medio escribir. El tipo se comprueba por la
+    firma PNG del contenido, no por la extensión. Devuelve (bytes, segundos).
+    """
+    inicio = time.perf_counter()
+
+    # portada.size es lo que el parser ya ha recibido y guardado en un temporal:
+    # evita copiarlo al destino. LimiteSubidaMiddleware corta antes las subidas grandes
+    if portada.size is not None and portada.size > max_bytes:
+        raise PortadaNoValida(f"La portada ocupa {portada.size} bytes (máximo {max_bytes})")
+
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix=".subida-", suffix=".tmp")
+    escritos = 0
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            while True:
+                bloque = await portada.read(TAMAÑO_BLOQUE)
+                if not bloque:
+                    break
+                if escritos == 0 and not bloque.startswith(FIRMA_PNG):
+                    raise PortadaNoValida("El archivo no es un PNG")
+                escritos += len(bloque)
+                if escritos > max_bytes:
+                    raise PortadaNoValida(f"La portada supera el máximo de {max_bytes} bytes")
+                await run_in_threadpool(archivo.write, bloque)
+
+        if escritos == 0:
+            raise PortadaNoValida("La portada está vacía")
+        await run_in_threadpool(os.replace, temporal, destino)
+    except BaseException:
+        try:
+            os.unlink(temporal)
+        except OSError:
+            pass
+        raise
+
+    return escritos, time.perf_counter() - inicio